@@ -0,0 +1,139 @@
+import argparse
+import random
+import statistics
+import time
+from explanation.graph.graph_model import BundleGraphNode, GraphEdge, GraphNode, LabeledGraphNode
+from explanation.graph.graph_validation import BackgroundGraphValidator, should_validate, validate_graph_objects
+
+
+def build_synthetic_graph(bundles:int, artworks_per_bundle:int, artwork_pool:int, seed:int = 0):
+    """Explanation-shaped graph: query -> concept -> bundle -> artworks, with artworks shared between bundles."""
+    rng = random.Random(seed)
+    nodes = [LabeledGraphNode(node_id="q:0", node_type="query", ref_id=None, label="synthetic")]
+    edges = []
+    used_artworks = set()
+
+    for b in range(bundles):
+        concept_id, bundle_id = f"c:{b}", f"b:bundle__concept__{b}"
+        confidences = [round(rng.uniform(0.6, 1.0), 6) for _ in range(artworks_per_bundle)]
+        nodes.append(LabeledGraphNode(node_id=concept_id, node_type="concept", ref_id=b, label=f"concept {b}"))
+        nodes.append(BundleGraphNode(node_id=bundle_id, node_type="bundle", ref_id=bundle_id,
+                                     confidence=sum(confidences) / len(confidences)))
+        edges.append(GraphEdge("q:0", concept_id, "query_supports_concept", rng.uniform(0.7, 1.0), "v2_detected_concepts"))
+        edges.append(GraphEdge(concept_id, bundle_id, "concept_forms_bundle", 1.0, "bundle_construction"))
+        for artwork, confidence in zip(rng.sample(range(artwork_pool), artworks_per_bundle), confidences):
+            edges.append(GraphEdge(bundle_id, f"a:{artwork}", "bundle_supported_by_artwork", confidence, "embedding_similarity"))
+            used_artworks.add(artwork)
+
+    nodes.extend(GraphNode(node_id=f"a:{artwork}", node_type="artwork", ref_id=artwork) for artwork in sorted(used_artworks))
+    return nodes, edges
+
+
+def build_chain_graph(length:int):
+    """A deep path of bundles; invalid as an explanation, but it exercises the cycle check's depth."""
+    nodes = [LabeledGraphNode(node_id="q:0", node_type="query", ref_id=None, label="chain")]
+    nodes.extend(BundleGraphNode(node_id=f"b:{i}", node_type="bundle", ref_id=i, confidence=1.0) for i in range(length))
+    edges = [GraphEdge("q:0", "b:0", "concept_forms_bundle", 1.0, "bundle_construction")]
+    edges.extend(GraphEdge(f"b:{i}", f"b:{i + 1}", "concept_forms_bundle", 1.0, "bundle_construction") for i in range(length - 1))
+    return nodes, edges
+
+
+def caller_cost(nodes, edges, mode:str, sample_rate:float, validator:BackgroundGraphValidator | None, repeat:int) -> float:
+    """Mean time a request spends on validation under a given policy."""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        if should_validate(mode, sample_rate):
+            if validator is not None:
+                validator.submit(nodes, edges, label="benchmark")
+            else:
+                validate_graph_objects(nodes=nodes, edges=edges)
+    return (time.perf_counter() - started) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Time validate_graph_objects on synthetic explanation graphs.",
+        formatter_class=argparse.RawTextHelpFormatter
+    )
+
+    parser.add_argument(
+        "--bundles",
+        type=int,
+        nargs="+",
+        default=[10, 100, 1000, 5000],
+        help="Bundle counts to benchmark, one graph per value. (Default: 10 100 1000 5000)"
+    )
+
+    parser.add_argument(
+        "--artworks-per-bundle",
+        type=int,
+        default=20,
+        help="Support edges per bundle. (Default: 20)"
+    )
+
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=5,
+        help="Timed runs per graph; the median is reported. (Default: 5)"
+    )
+
+    parser.add_argument(
+        "--chain-length",
+        type=int,
+        default=20000,
+        help="Depth of the chain graph used to check the cycle detection. (Default: 20000)"
+    )
+
+    parser.add_argument(
+        "--policy-bundles",
+        type=int,
+        default=100,
+        help="Graph size used to compare validation modes. (Default: 100)"
+    )
+
+    parser.add_argument(
+        "--sample-rate",
+        type=float,
+        default=0.1,
+        help="Share of graphs validated in sampled mode. (Default: 0.1)"
+    )
+
+    args = parser.parse_args()
+
+    print(f"{'bundles':>8} {'nodes':>8} {'edges':>8} {'median ms':>10} {'edges/s':>12}")
+    for bundles in args.bundles:
+        nodes, edges = build_synthetic_graph(bundles, args.artworks_per_bundle, artwork_pool=max(bundles * 5, args.artworks_per_bundle))
+        timings = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            result = validate_graph_objects(nodes=nodes, edges=edges)
+            timings.append(time.perf_counter() - started)
+        if result.errors:
+            raise SystemExit(f"Synthetic graph failed validation: {result.errors[:3]}")
+        median = statistics.median(timings)
+        print(f"{bundles:>8} {len(nodes):>8} {len(edges):>8} {median * 1000:>10.2f} {len(edges) / median:>12,.0f}")
+
+    nodes, edges = build_chain_graph(args.chain_length)
+    started = time.perf_counter()
+    result = validate_graph_objects(nodes=nodes, edges=edges)
+    print(f"\nchain of {args.chain_length} bundles: {(time.perf_counter() - started) * 1000:.2f} ms, "
+          f"{len(result.errors)} errors (no recursion limit on the cycle check)")
+
+    nodes, edges = build_synthetic_graph(args.policy_bundles, args.artworks_per_bundle, artwork_pool=args.policy_bundles * 5)
+    print(f"\nper-request validation cost, {args.policy_bundles} bundles ({len(edges)} edges):")
+    validator = BackgroundGraphValidator(max_pending=args.repeat * 10)
+    policies = [
+        ("always", "always", 1.0, None),
+        (f"sampled {args.sample_rate:.0%}", "sampled", args.sample_rate, None),
+        ("always, async", "always", 1.0, validator),
+        ("off", "off", 0.0, None),
+    ]
+    for label, mode, sample_rate, background in policies:
+        cost = caller_cost(nodes, edges, mode, sample_rate, background, args.repeat * 10)
+        print(f"{label:>16}: {cost * 1000:8.3f} ms")
+    validator.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+import argparse
+import gzip
+import random
+import statistics
+import time
+from flask import Flask
+from explanation.evidence.evidence_model import ArtworkEvidence, EvidenceBundle
+from explanation.graph.build_explanation_graph import build_explanation_graph
+from explanation.graph.graph_wire import decode_columnar_graph, encode_columnar_graph
+from concept_data_pipeline.artwork_concept.prototypes import ConceptMatch
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def build_graph(concepts:int, artworks_per_concept:int, result_size:int, seed:int = 0):
+    """A graph as build_explanation_graph makes it, over a result list of `result_size` artworks."""
+    rng = random.Random(seed)
+    result_ids = rng.sample(range(100_000, 1_000_000), result_size)
+    detected = tuple(
+        ConceptMatch(concept_id=c, concept_name=f"Concept number {c}", confidence_score=rng.uniform(0.7, 1.0),
+                     normalized_score=1.0, similarity=rng.uniform(0.5, 0.9))
+        for c in range(concepts)
+    )
+    bundles = []
+    for match in detected:
+        support = [
+            ArtworkEvidence(artwork_id=artwork_id, mapping_confidence=rng.uniform(0.6, 1.0), provenance="embedding_similarity")
+            for artwork_id in rng.sample(result_ids, min(artworks_per_concept, result_size))
+        ]
+        bundles.append(EvidenceBundle(evidence_id=f"bundle__concept__{match.concept_id}", primary_concept=match.concept_id,
+                                      bundled_artworks=support,
+                                      evidence_confidence=sum(a.mapping_confidence for a in support) / len(support)))
+    nodes, edges = build_explanation_graph(query="woman with a lute by the window", detected_concepts=detected,
+                                           evidence_bundles=bundles)
+    return list(nodes.values()), edges
+
+
+def median_ms(fn, repeat:int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare explanation graph payloads: object format vs the columnar format, per JSON encoder.",
+        formatter_class=argparse.RawTextHelpFormatter
+    )
+
+    parser.add_argument(
+        "--concepts",
+        type=int,
+        nargs="+",
+        default=[2, 5, 10, 20],
+        help="Detected concepts per graph, one graph per value. (Default: 2 5 10 20)"
+    )
+
+    parser.add_argument(
+        "--artworks-per-concept",
+        type=int,
+        default=40,
+        help="Supporting artworks per bundle. (Default: 40)"
+    )
+
+    parser.add_argument(
+        "--result-size",
+        type=int,
+        default=300,
+        help="Artworks in the result list the bundles draw from. (Default: 300)"
+    )
+
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=50,
+        help="Timed runs per encoding; the median is reported. (Default: 50)"
+    )
+
+    args = parser.parse_args()
+    app = Flask(__name__)
+
+    encoders = [("objects", "flask", lambda nodes, edges: app.json.dumps({"nodes": nodes, "edges": edges}).encode("utf-8")),
+                ("compact", "flask", lambda nodes, edges: app.json.dumps(encode_columnar_graph(nodes, edges)).encode("utf-8"))]
+    if orjson is not None:
+        encoders += [("objects", "orjson", lambda nodes, edges: orjson.dumps({"nodes": nodes, "edges": edges})),
+                     ("compact", "orjson", lambda nodes, edges: orjson.dumps(encode_columnar_graph(nodes, edges)))]
+    else:
+        print("orjson is not installed; only the app's JSON provider is timed.")
+    if brotli is None:
+        print("brotli is not installed; br sizes are skipped.")
+
+    with app.app_context():
+        for concepts in args.concepts:
+            nodes, edges = build_graph(concepts, args.artworks_per_concept, args.result_size)
+            roundtrip = decode_columnar_graph(encode_columnar_graph(nodes, edges))
+            if len(roundtrip["nodes"]) != len(nodes) or len(roundtrip["edges"]) != len(edges):
+                raise SystemExit("Columnar round trip lost nodes or edges")
+
+            print(f"\n{concepts} concepts: {len(nodes)} nodes, {len(edges)} edges")
+            print(f"{'format':>8} {'encoder':>8} {'encode ms':>10} {'bytes':>9} {'gzip':>8} {'gzip ms':>8} {'br':>8}")
+            for graph_format, encoder_name, encode in encoders:
+                body = encode(nodes, edges)
+                encode_ms = median_ms(lambda: encode(nodes, edges), args.repeat)
+                gzipped = gzip.compress(body, compresslevel=6)
+                gzip_ms = median_ms(lambda: gzip.compress(body, compresslevel=6), args.repeat)
+                br_size = f"{len(brotli.compress(body, quality=5)):>8}" if brotli is not None else f"{'-':>8}"
+                print(f"{graph_format:>8} {encoder_name:>8} {encode_ms:>10.3f} {len(body):>9} {len(gzipped):>8} "
+                      f"{gzip_ms:>8.3f} {br_size}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,20 +2,30 @@
 
 from __future__ import annotations
 
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from dataclasses import dataclass
+import os
+import time
 from typing import Any, Iterable, Sequence
 
+import numpy as np
 import psycopg
 
-from db.db_pool import get_connection
+from db.db_pool import DATABASE_URL, get_connection
+from concept_data_pipeline.artwork_concept.generation import bump_mapping_generation, invalidate_mapping_generation
 from concept_data_pipeline.artwork_concept.prototypes import (
     ConceptPrototype,
+    PrototypeMatrix,
+    build_prototype_matrix,
     coerce_vector,
     load_concept_prototypes,
-    score_concepts_for_vector,
+    score_concepts_for_matrix,
 )
+from utils.config import INGESTION
+from utils.embedding_versions import get_active_embedding_version
 
 MIN_CONFIDENCE_SCORE = 0.7
+MAX_CONCEPTS_PER_ARTWORK = 2
 
 
 @dataclass(frozen=True)
@@ -31,6 +41,18 @@ class ArtworkConceptRecord:
     confidence_score: float
 
 
+@dataclass(frozen=True)
+class AffinityRangeReport:
+    """Outcome of scoring one artwork id range inside a worker process."""
+
+    start_id: int
+    end_id: int
+    artworks_scored: int
+    records_written: int
+    seconds: float
+    worker_pid: int
+
+
 def generate_artwork_concept_affinities(
     *,
     db_pool: Any | None = None,
@@ -39,10 +61,11 @@ def generate_artwork_concept_affinities(
     """
     Offline propagation of concepts from essays to artworks.
     """
+    embedding_column = get_active_embedding_version(db_pool=db_pool).column
     with (db_pool.connection() if db_pool else get_connection()) as conn:
-        artworks = _fetch_artwork_embeddings(conn)
+        artworks = _fetch_artwork_embeddings(conn, embedding_column)
 
-    prototypes = load_concept_prototypes(db_pool=db_pool)
+    prototypes = load_concept_prototypes(db_pool=db_pool, embedding_column=embedding_column)
 
     if not prototypes or not artworks:
         return ()
@@ -82,19 +105,21 @@ def insert_artwork_concepts(
             with conn.cursor() as cur:
                 for chunk in _chunked(payload, batch_size):
                     cur.executemany(sql, chunk)
+            bump_mapping_generation(conn)
             conn.commit()
         except psycopg.Error:
             conn.rollback()
             raise
+    invalidate_mapping_generation()
 
     return len(payload)
 
 
-def _fetch_artwork_embeddings(conn) -> tuple[ArtworkEmbedding, ...]:
-    sql = """
-        SELECT id, embedding::float4[]
+def _fetch_artwork_embeddings(conn, embedding_column: str = "embedding") -> tuple[ArtworkEmbedding, ...]:
+    sql = f"""
+        SELECT id, {embedding_column}::float4[]
         FROM artwork
-        WHERE embedding IS NOT NULL
+        WHERE {embedding_column} IS NOT NULL
     """
 
     artworks: list[ArtworkEmbedding] = []
@@ -119,28 +144,247 @@ def _score_artworks(
     artworks: Sequence[ArtworkEmbedding],
     prototypes: Sequence[ConceptPrototype],
     confidence_threshold: float,
-    max_concepts_per_artwork: int = 2,
+    max_concepts_per_artwork: int = MAX_CONCEPTS_PER_ARTWORK,
 ) -> tuple[ArtworkConceptRecord, ...]:
-    results: list[ArtworkConceptRecord] = []
-
-    for art in artworks:
-        matches = score_concepts_for_vector(
-            vector=art.vector,
-            prototypes=prototypes,
-            confidence_threshold=confidence_threshold,
-            max_concepts=max_concepts_per_artwork,
+    matches = score_concepts_for_matrix(
+        vectors=np.asarray([art.vector for art in artworks], dtype=np.float32),
+        matrix=build_prototype_matrix(prototypes),
+        confidence_threshold=confidence_threshold,
+        max_concepts=max_concepts_per_artwork,
+    )
+
+    return tuple(
+        ArtworkConceptRecord(
+            artwork_id=artworks[row].artwork_id,
+            concept_id=concept_id,
+            confidence_score=confidence,
         )
+        for row, concept_id, confidence in matches
+    )
+
+
+# Parallel scoring.
+#
+# The artwork id space is split into contiguous ranges and every range is scored
+# by a worker process. Workers open their own connection (pools do not survive a
+# fork), stream their slice through a server-side cursor, and upsert results with
+# COPY into a temp table. The prototype matrix is handed to each worker once via
+# the pool initializer and is only ever read.
+
+_worker_matrix: PrototypeMatrix | None = None
+_worker_settings: dict[str, Any] = {}
+
+
+def score_artwork_concepts_in_parallel(
+    *,
+    workers: int = INGESTION.affinity_workers,
+    range_size: int = INGESTION.affinity_range_size,
+    fetch_size: int = INGESTION.affinity_fetch_size,
+    confidence_threshold: float = MIN_CONFIDENCE_SCORE,
+    db_pool: Any | None = None,
+) -> tuple[AffinityRangeReport, ...]:
+    """
+    Score every artwork against the concept prototypes across a process pool
+    and upsert the matches into `artwork_concept`.
+    """
+    if workers <= 0:
+        raise ValueError("workers must be positive")
+
+    embedding_column = get_active_embedding_version(db_pool=db_pool).column
+    prototypes = load_concept_prototypes(db_pool=db_pool, embedding_column=embedding_column)
+    with (db_pool.connection() if db_pool else get_connection()) as conn:
+        id_ranges = _split_artwork_id_space(conn, range_size=range_size, embedding_column=embedding_column)
+
+    if not prototypes or not id_ranges:
+        return ()
+
+    matrix = build_prototype_matrix(prototypes)
+    settings = {
+        "fetch_size": fetch_size,
+        "confidence_threshold": confidence_threshold,
+        "embedding_column": embedding_column,
+    }
+
+    reports: list[AffinityRangeReport] = []
+    started = time.perf_counter()
+    print(
+        f"Scoring artwork affinities over {len(id_ranges)} ranges "
+        f"with {workers} workers and {len(prototypes)} prototypes."
+    )
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_affinity_worker,
+        initargs=(matrix, settings),
+    ) as executor:
+        futures = [
+            executor.submit(_score_artwork_range, start_id, end_id)
+            for start_id, end_id in id_ranges
+        ]
+        for future in as_completed(futures):
+            report = future.result()
+            reports.append(report)
+            _print_affinity_progress(reports, total_ranges=len(id_ranges), started=started)
+
+    _print_worker_timings(reports)
+    if any(rep.records_written for rep in reports):
+        # Ranges commit on their own; one bump once they are all in.
+        with (db_pool.connection() if db_pool else get_connection()) as conn:
+            try:
+                bump_mapping_generation(conn)
+                conn.commit()
+            except psycopg.Error:
+                conn.rollback()
+                raise
+        invalidate_mapping_generation()
+    return tuple(sorted(reports, key=lambda rep: rep.start_id))
+
+
+def _split_artwork_id_space(conn, *, range_size: int, embedding_column: str = "embedding") -> list[tuple[int, int]]:
+    """Return inclusive (start_id, end_id) ranges covering every embedded artwork."""
+    if range_size <= 0:
+        raise ValueError("range_size must be positive")
+
+    with conn.cursor() as cur:
+        cur.execute(f"SELECT min(id), max(id) FROM artwork WHERE {embedding_column} IS NOT NULL")
+        min_id, max_id = cur.fetchone()
+
+    if min_id is None:
+        return []
+
+    return [
+        (start, min(start + range_size - 1, int(max_id)))
+        for start in range(int(min_id), int(max_id) + 1, range_size)
+    ]
+
+
+def _init_affinity_worker(matrix: PrototypeMatrix, settings: dict[str, Any]) -> None:
+    global _worker_matrix, _worker_settings
+    _worker_matrix = matrix
+    _worker_settings = settings
+
 
-        for match in matches:
-            results.append(
-                ArtworkConceptRecord(
-                    artwork_id=art.artwork_id,
-                    concept_id=match.concept_id,
-                    confidence_score=match.confidence_score,
+def _score_artwork_range(start_id: int, end_id: int) -> AffinityRangeReport:
+    started = time.perf_counter()
+    fetch_size = int(_worker_settings["fetch_size"])
+    confidence_threshold = float(_worker_settings["confidence_threshold"])
+    embedding_column = _worker_settings["embedding_column"]
+
+    artworks_scored = 0
+    records_written = 0
+
+    with psycopg.connect(DATABASE_URL, autocommit=False) as conn:
+        try:
+            with conn.cursor(name=f"affinity_{start_id}_{end_id}") as read_cur:
+                read_cur.itersize = fetch_size
+                read_cur.execute(
+                    f"""
+                    SELECT id, {embedding_column}::float4[]
+                    FROM artwork
+                    WHERE {embedding_column} IS NOT NULL
+                      AND id BETWEEN %s AND %s
+                    ORDER BY id
+                    """,
+                    (start_id, end_id),
                 )
+                while True:
+                    rows = read_cur.fetchmany(fetch_size)
+                    if not rows:
+                        break
+                    payload = _score_rows(rows, confidence_threshold=confidence_threshold)
+                    artworks_scored += len(rows)
+                    records_written += _copy_upsert_artwork_concepts(conn, payload)
+            conn.commit()
+        except psycopg.Error:
+            conn.rollback()
+            raise
+
+    return AffinityRangeReport(
+        start_id=start_id,
+        end_id=end_id,
+        artworks_scored=artworks_scored,
+        records_written=records_written,
+        seconds=time.perf_counter() - started,
+        worker_pid=os.getpid(),
+    )
+
+
+def _score_rows(
+    rows: Sequence[tuple[int, Sequence[float]]],
+    *,
+    confidence_threshold: float,
+) -> list[tuple[int, int, float]]:
+    artwork_ids = [int(artwork_id) for artwork_id, _ in rows]
+    vectors = np.asarray([embedding for _, embedding in rows], dtype=np.float32)
+
+    matches = score_concepts_for_matrix(
+        vectors=vectors,
+        matrix=_worker_matrix,
+        confidence_threshold=confidence_threshold,
+        max_concepts=MAX_CONCEPTS_PER_ARTWORK,
+    )
+    return [(artwork_ids[row], concept_id, confidence) for row, concept_id, confidence in matches]
+
+
+def _copy_upsert_artwork_concepts(conn, payload: Sequence[tuple[int, int, float]]) -> int:
+    """Bulk writer: COPY into a temp table, then one upsert into `artwork_concept`."""
+    if not payload:
+        return 0
+
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            CREATE TEMP TABLE IF NOT EXISTS artwork_concept_stage (
+                artwork_id INT,
+                concept_id INT,
+                confidence_score REAL
             )
+            """
+        )
+        with cur.copy(
+            "COPY artwork_concept_stage (artwork_id, concept_id, confidence_score) FROM STDIN"
+        ) as copy:
+            for row in payload:
+                copy.write_row(row)
+        cur.execute(
+            """
+            INSERT INTO artwork_concept (artwork_id, concept_id, confidence_score)
+            SELECT artwork_id, concept_id, confidence_score
+            FROM artwork_concept_stage
+            ON CONFLICT (artwork_id, concept_id)
+            DO UPDATE SET confidence_score = EXCLUDED.confidence_score
+            """
+        )
+        cur.execute("TRUNCATE artwork_concept_stage")
 
-    return tuple(results)
+    return len(payload)
+
+
+def _print_affinity_progress(
+    reports: Sequence[AffinityRangeReport], *, total_ranges: int, started: float
+) -> None:
+    elapsed = max(time.perf_counter() - started, 1e-9)
+    scored = sum(rep.artworks_scored for rep in reports)
+    written = sum(rep.records_written for rep in reports)
+    print(
+        f"[{len(reports)}/{total_ranges} ranges] {scored} artworks scored, "
+        f"{written} records written, {scored / elapsed:.1f} artworks/s"
+    )
+
+
+def _print_worker_timings(reports: Sequence[AffinityRangeReport]) -> None:
+    per_worker: dict[int, list[AffinityRangeReport]] = {}
+    for rep in reports:
+        per_worker.setdefault(rep.worker_pid, []).append(rep)
+
+    for pid, worker_reports in sorted(per_worker.items()):
+        seconds = sum(rep.seconds for rep in worker_reports)
+        scored = sum(rep.artworks_scored for rep in worker_reports)
+        rate = scored / seconds if seconds else 0.0
+        print(
+            f"worker {pid}: {len(worker_reports)} ranges, {scored} artworks, "
+            f"{seconds:.2f}s busy, {rate:.1f} artworks/s"
+        )
 
 
 def _chunked(
@@ -0,0 +1,106 @@
+"""
+A counter bumped by every write to the artwork/concept mappings.
+
+Readers that derive state from `artwork_concept` or
+`artwork_concept_similarity` (the explanation graph cache) compare the
+generation they built with against the current one instead of diffing the
+tables:
+
+    CREATE TABLE concept_mapping_generation (
+        id          BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),   -- single row
+        generation  BIGINT NOT NULL,
+        changed_at  TIMESTAMPTZ NOT NULL
+    );
+
+Writers bump it inside their own transaction, so a reader never sees the
+new generation before the rows it stands for.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any
+
+import psycopg
+
+from db.db_pool import get_connection
+from utils.config import EXPLANATIONS
+
+
+def ensure_generation_table(conn) -> None:
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS concept_mapping_generation (
+                id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+                generation BIGINT NOT NULL,
+                changed_at TIMESTAMPTZ NOT NULL
+            )
+            """
+        )
+
+
+def bump_mapping_generation(conn) -> None:
+    """Record a mapping change; call before the writer's commit."""
+    ensure_generation_table(conn)
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO concept_mapping_generation (id, generation, changed_at)
+            VALUES (TRUE, 1, now())
+            ON CONFLICT (id) DO UPDATE SET
+                generation = concept_mapping_generation.generation + 1,
+                changed_at = now()
+            """
+        )
+
+
+def _load_generation(db_pool: Any | None) -> int:
+    connection_factory = db_pool.connection if db_pool else get_connection
+    with connection_factory() as conn:
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT generation FROM concept_mapping_generation")
+                row = cur.fetchone()
+        except psycopg.errors.UndefinedTable:
+            conn.rollback()
+            return 0
+    return int(row[0]) if row else 0
+
+
+class _GenerationCache:
+    """Per-process copy of the counter, re-read at most every `max_age_seconds`."""
+
+    def __init__(self, max_age_seconds: float) -> None:
+        self.max_age_seconds = max_age_seconds
+        self._generation: int | None = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, db_pool: Any | None, refresh: bool) -> int:
+        with self._lock:
+            fresh = time.monotonic() - self._loaded_at < self.max_age_seconds
+            if self._generation is not None and fresh and not refresh:
+                return self._generation
+        generation = _load_generation(db_pool)
+        with self._lock:
+            self._generation = generation
+            self._loaded_at = time.monotonic()
+        return generation
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._generation = None
+
+
+_cache = _GenerationCache(EXPLANATIONS.mapping_check_seconds)
+
+
+def get_mapping_generation(*, db_pool: Any | None = None, refresh: bool = False) -> int:
+    return _cache.get(db_pool, refresh)
+
+
+def invalidate_mapping_generation() -> None:
+    """Forget the cached counter, e.g. right after this process changed the mappings."""
+    _cache.invalidate()
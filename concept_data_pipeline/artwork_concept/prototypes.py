@@ -4,10 +4,14 @@ from __future__ import annotations
 
 from collections import defaultdict
 from dataclasses import dataclass
+import hashlib
 import math
 from typing import Any, Iterable, Sequence
 
+import numpy as np
+
 from db.db_pool import get_connection
+from utils.embedding_versions import get_active_embedding_version
 
 MIN_CONFIDENCE_SCORE = 0.7
 
@@ -35,12 +39,33 @@ class ConceptResponseForSearch(ConceptPrototype):
     concept_name: str
 
 
+@dataclass(frozen=True)
+class PrototypeMatrix:
+    """Row-aligned, unit-normalized prototype vectors for block scoring."""
+
+    concept_ids: np.ndarray  # (k,) int64
+    unit_vectors: np.ndarray  # (k, dim) float32
+    authority: np.ndarray  # (k,) float32
+
+
+@dataclass(frozen=True)
+class ConceptPrototypeSet:
+    """The prototypes one concept detection scored against, and the embedding column they came from."""
+
+    prototypes: tuple[ConceptResponseForSearch, ...]
+    matrix: PrototypeMatrix
+    embedding_column: str
+    version: str = ""  # prototype_set_version(prototypes, embedding_column)
+
+
 def get_concept_prototypes(
     db_pool: Any | None = None,
+    embedding_column: str | None = None,
 ) -> tuple[ConceptResponseForSearch, ...]:
     """Return concept prototypes with their human-readable names for search."""
+    embedding_column = embedding_column or get_active_embedding_version(db_pool=db_pool).column
     with (db_pool.connection() if db_pool else get_connection()) as conn:
-        concept_payload = _fetch_concept_vectors_with_names(conn)
+        concept_payload = _fetch_concept_vectors_with_names(conn, embedding_column)
 
     prototypes: list[ConceptResponseForSearch] = []
     for concept_id, payload in concept_payload.items():
@@ -62,11 +87,12 @@ def get_concept_prototypes(
 
 
 def load_concept_prototypes(
-    *, db_pool: Any | None = None
+    *, db_pool: Any | None = None, embedding_column: str | None = None
 ) -> tuple[ConceptPrototype, ...]:
     """Fetch concept prototypes without names (offline ingestion)."""
+    embedding_column = embedding_column or get_active_embedding_version(db_pool=db_pool).column
     with (db_pool.connection() if db_pool else get_connection()) as conn:
-        concept_vectors = _fetch_concept_vectors(conn)
+        concept_vectors = _fetch_concept_vectors(conn, embedding_column)
     return _build_concept_prototypes(concept_vectors)
 
 
@@ -113,6 +139,98 @@ def score_concepts_for_vector(
 
     return tuple(matches)
 
+def build_prototype_matrix(prototypes: Sequence[ConceptPrototype]) -> PrototypeMatrix:
+    """Stack prototypes into a matrix so many vectors can be scored in one matmul."""
+    vectors = np.asarray([proto.vector for proto in prototypes], dtype=np.float32)
+    return PrototypeMatrix(
+        concept_ids=np.asarray([proto.concept_id for proto in prototypes], dtype=np.int64),
+        unit_vectors=_unit_rows(vectors),
+        authority=np.asarray([proto.authority for proto in prototypes], dtype=np.float32),
+    )
+
+
+def score_concepts_for_matrix(
+    *,
+    vectors: np.ndarray,
+    matrix: PrototypeMatrix,
+    confidence_threshold: float = MIN_CONFIDENCE_SCORE,
+    max_concepts: int | None = None,
+) -> list[tuple[int, int, float]]:
+    """
+    Block equivalent of `score_concepts_for_vector`.
+
+    Returns (row_index, concept_id, confidence_score) for every kept match,
+    ordered by row and then by descending confidence.
+    """
+    if vectors.size == 0 or matrix.concept_ids.size == 0:
+        return []
+
+    _, _, confidence, order = _rank_block(vectors, matrix, confidence_threshold, max_concepts)
+    matches: list[tuple[int, int, float]] = []
+    for row, cols in enumerate(order):
+        for col in cols:
+            score = confidence[row, col]
+            if not np.isfinite(score):
+                break
+            matches.append((row, int(matrix.concept_ids[col]), float(score)))
+
+    return matches
+
+
+def concept_matches_for_matrix(
+    *,
+    vectors: np.ndarray,
+    matrix: PrototypeMatrix,
+    confidence_threshold: float = MIN_CONFIDENCE_SCORE,
+    max_concepts: int | None = None,
+    concept_lookup: dict[int, str] | None = None,
+) -> list[tuple[ConceptMatch, ...]]:
+    """`score_concepts_for_vector` for every row of `vectors` in one matmul, as full ConceptMatch tuples."""
+    if vectors.size == 0 or matrix.concept_ids.size == 0:
+        return [() for _ in range(len(vectors))]
+
+    similarities, normalized, confidence, order = _rank_block(vectors, matrix, confidence_threshold, max_concepts)
+    results: list[tuple[ConceptMatch, ...]] = []
+    for row, cols in enumerate(order):
+        matches = []
+        for col in cols:
+            if not np.isfinite(confidence[row, col]):
+                break
+            concept_id = int(matrix.concept_ids[col])
+            matches.append(ConceptMatch(
+                concept_id=concept_id,
+                concept_name=(concept_lookup or {}).get(concept_id),
+                confidence_score=float(confidence[row, col]),
+                normalized_score=float(normalized[row, col]),
+                similarity=float(similarities[row, col]),
+            ))
+        results.append(tuple(matches))
+    return results
+
+
+def _rank_block(vectors: np.ndarray, matrix: PrototypeMatrix, confidence_threshold: float,
+                max_concepts: int | None) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Similarities, normalized scores, thresholded confidences (-inf when dropped) and per-row column order."""
+    similarities = _unit_rows(vectors.astype(np.float32, copy=False)) @ matrix.unit_vectors.T
+    max_similarity = similarities.max(axis=1)
+    valid = max_similarity > 0
+
+    normalized = np.divide(
+        similarities,
+        max_similarity[:, None],
+        out=np.zeros_like(similarities),
+        where=valid[:, None],
+    )
+    confidence = normalized * matrix.authority[None, :]
+    confidence[~valid] = -np.inf
+    confidence[confidence < confidence_threshold] = -np.inf
+
+    order = np.argsort(-confidence, axis=1, kind="stable")
+    if max_concepts is not None:
+        order = order[:, :max_concepts]
+    return similarities, normalized, confidence, order
+
+
 """
     Compute cosine similarity between specific artworks and concept prototypes.
 
@@ -130,41 +248,79 @@ def compute_artwork_concept_similarities(
     if not artwork_ids or not concept_ids:
         return []
 
+    embedding_column = get_active_embedding_version(db_pool=db_pool).column
     prototypes = [
         proto
-        for proto in get_concept_prototypes(db_pool=db_pool)
+        for proto in get_concept_prototypes(db_pool=db_pool, embedding_column=embedding_column)
         if proto.concept_id in concept_ids
     ]
 
     if not prototypes:
         return []
 
-    artworks = _fetch_artwork_embeddings(artwork_ids, db_pool=db_pool)
+    artworks = _fetch_artwork_embeddings(artwork_ids, db_pool=db_pool, embedding_column=embedding_column)
 
     if not artworks:
         return []
 
-    similarities: list[tuple[int, int, float]] = []
+    return artwork_concept_similarities_for_block(
+        artwork_ids=[artwork_id for artwork_id, _ in artworks],
+        vectors=np.asarray([vector for _, vector in artworks], dtype=np.float32),
+        matrix=build_prototype_matrix(prototypes),
+        concept_ids=concept_ids,
+    )
+
+
+def artwork_concept_similarities_for_block(
+    *,
+    artwork_ids: Sequence[int],
+    vectors: np.ndarray,
+    matrix: PrototypeMatrix,
+    concept_ids: Iterable[int],
+    threshold: float = MAPPING_CONFIDENCE_THRESHOLD,
+) -> list[tuple[int, int, float]]:
+    """
+    Every artwork x concept cosine similarity in one matmul, for vectors the
+    caller already holds. Same output as `compute_artwork_concept_similarities`:
+    (artwork_id, concept_id, similarity) at or above `threshold`, ordered by
+    artwork and then by prototype.
+    """
+    columns = np.flatnonzero(np.isin(matrix.concept_ids, list(concept_ids)))
+    if vectors.size == 0 or columns.size == 0:
+        return []
+
+    similarities = _unit_rows(vectors.astype(np.float32, copy=False)) @ matrix.unit_vectors[columns].T
+    rows, cols = np.nonzero(similarities >= threshold)
+    return [
+        (int(artwork_ids[row]), int(matrix.concept_ids[columns[col]]), float(similarities[row, col]))
+        for row, col in zip(rows, cols)
+    ]
+
+
+def prototype_digest(prototype: ConceptPrototype) -> str:
+    # Rounded so that float summation order in the centroid does not count as a change.
+    vector = np.round(np.asarray(prototype.vector, dtype=np.float64), 5).astype(np.float32)
+    return hashlib.sha256(vector.tobytes()).hexdigest()
 
-    for artwork_id, art_vector in artworks:
-        for proto in prototypes:
-            similarity = _cosine_similarity(art_vector, proto.vector)
-            if similarity >= MAPPING_CONFIDENCE_THRESHOLD:
-                similarities.append((artwork_id, proto.concept_id, similarity))
 
-    return similarities
+def prototype_set_version(prototypes: Sequence[ConceptPrototype], embedding_column: str) -> str:
+    """Changes whenever any prototype, or the set of concepts, or the embedding column changes."""
+    digest = hashlib.sha256(embedding_column.encode("utf-8"))
+    for prototype in sorted(prototypes, key=lambda proto: proto.concept_id):
+        digest.update(f"{prototype.concept_id}:{prototype_digest(prototype)};".encode("ascii"))
+    return digest.hexdigest()[:16]
 
 
-def _fetch_concept_vectors_with_names(conn) -> dict[int, dict[str, Any]]:
+def _fetch_concept_vectors_with_names(conn, embedding_column: str = "embedding") -> dict[int, dict[str, Any]]:
     """
     Fetch concept names alongside their essay-derived embeddings.
     """
-    sql = """
-        SELECT ecc.concept_id, c.name, e.embedding::float4[]
+    sql = f"""
+        SELECT ecc.concept_id, c.name, e.{embedding_column}::float4[]
         FROM essay_concept ecc
         JOIN essay e ON e.id = ecc.essay_id
         JOIN concept c ON c.id = ecc.concept_id
-        WHERE e.embedding IS NOT NULL
+        WHERE e.{embedding_column} IS NOT NULL
     """
 
     concept_vectors: dict[int, dict[str, Any]] = {}
@@ -183,15 +339,15 @@ def _fetch_concept_vectors_with_names(conn) -> dict[int, dict[str, Any]]:
     return concept_vectors
 
 
-def _fetch_concept_vectors(conn) -> dict[int, list[list[float]]]:
+def _fetch_concept_vectors(conn, embedding_column: str = "embedding") -> dict[int, list[list[float]]]:
     """
     Fetch essay embeddings grouped by concept.
     """
-    sql = """
-        SELECT ecc.concept_id, e.embedding::float4[]
+    sql = f"""
+        SELECT ecc.concept_id, e.{embedding_column}::float4[]
         FROM essay_concept ecc
         JOIN essay e ON e.id = ecc.essay_id
-        WHERE e.embedding IS NOT NULL
+        WHERE e.{embedding_column} IS NOT NULL
     """
 
     concept_vectors: dict[int, list[list[float]]] = defaultdict(list)
@@ -230,13 +386,13 @@ def _build_concept_prototypes(
 
 
 def _fetch_artwork_embeddings(
-    artwork_ids: Sequence[int], *, db_pool: Any | None = None
+    artwork_ids: Sequence[int], *, db_pool: Any | None = None, embedding_column: str = "embedding"
 ) -> list[tuple[int, list[float]]]:
     with (db_pool.connection() if db_pool else get_connection()) as conn:
         with conn.cursor() as cur:
             cur.execute(
-                """
-                SELECT id, embedding::float4[]
+                f"""
+                SELECT id, {embedding_column}::float4[]
                 FROM artwork
                 WHERE id = ANY(%s)
                 """,
@@ -260,6 +416,11 @@ def _mean_vector(vectors: Sequence[Sequence[float]]) -> list[float]:
     return [value / count for value in sums]
 
 
+def _unit_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+
 def _authority(num_embeddings: int) -> float:
     return min(1.0, math.log(num_embeddings + 1))
 
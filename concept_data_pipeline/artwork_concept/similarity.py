@@ -0,0 +1,413 @@
+"""
+Materialized artwork-to-concept cosine similarities for explanations.
+
+`artwork_concept` keeps at most two authority-weighted concepts per artwork,
+which is right for ranking but too sparse for evidence bundles. This table
+keeps every raw prototype similarity at or above a floor:
+
+    CREATE TABLE artwork_concept_similarity (
+        artwork_id  INT REFERENCES artwork(id) ON DELETE CASCADE,
+        concept_id  INT,
+        similarity  REAL NOT NULL,
+        PRIMARY KEY (artwork_id, concept_id)       -- lookups by artwork
+    );
+    -- plus (concept_id, similarity DESC)          -- lookups by concept
+
+Refreshes are incremental. `artwork_concept_similarity_prototype` remembers
+the digest of every concept prototype a refresh scored with, and
+`artwork_concept_similarity_scored` the artworks it covered. A refresh
+rescores only concepts whose prototype changed (against every artwork) and
+artworks not scored yet (against every concept). A different floor or
+active embedding column rebuilds the table from scratch: into `*_next`
+copies of the three tables, swapped in by one short transaction, so
+explanations keep reading the old rows while the new ones are computed.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+import time
+from typing import Any, Sequence
+
+import numpy as np
+import psycopg
+
+from db.db_pool import get_connection
+from concept_data_pipeline.artwork_concept.generation import bump_mapping_generation, invalidate_mapping_generation
+from concept_data_pipeline.artwork_concept.prototypes import (
+    MAPPING_CONFIDENCE_THRESHOLD,
+    ConceptPrototype,
+    PrototypeMatrix,
+    artwork_concept_similarities_for_block,
+    build_prototype_matrix,
+    load_concept_prototypes,
+    prototype_digest,
+)
+from utils.config import INGESTION
+from utils.embedding_versions import get_active_embedding_version
+
+SIMILARITY_TABLE = "artwork_concept_similarity"
+SCORED_TABLE = "artwork_concept_similarity_scored"
+PROTOTYPE_TABLE = "artwork_concept_similarity_prototype"
+# In the order lookup_artwork_concept_similarities reads them, so the swap never deadlocks with a reader.
+SIMILARITY_TABLES = (PROTOTYPE_TABLE, SIMILARITY_TABLE, SCORED_TABLE)
+REBUILD_SUFFIX = "_next"
+
+
+@dataclass(frozen=True)
+class SimilarityRefreshReport:
+    embedding_column: str
+    rebuilt: bool
+    concepts_rescored: int
+    concepts_removed: int
+    artworks_scored: int
+    rows_written: int
+    seconds: float
+
+    def __str__(self) -> str:
+        mode = "rebuilt" if self.rebuilt else "refreshed"
+        return (
+            f"artwork_concept_similarity {mode} ({self.embedding_column}): "
+            f"{self.concepts_rescored} concepts rescored, {self.concepts_removed} removed, "
+            f"{self.artworks_scored} artworks scored, {self.rows_written} rows written in {self.seconds:.1f}s"
+        )
+
+
+def refresh_artwork_concept_similarities(
+    *,
+    floor: float = INGESTION.similarity_floor,
+    full: bool = False,
+    fetch_size: int = INGESTION.affinity_fetch_size,
+    db_pool: Any | None = None,
+) -> SimilarityRefreshReport:
+    """Bring `artwork_concept_similarity` up to date with the current prototypes and artworks."""
+    if fetch_size <= 0:
+        raise ValueError("fetch_size must be positive")
+    if floor > MAPPING_CONFIDENCE_THRESHOLD:
+        print(
+            f"Similarity floor {floor} is above the evidence threshold {MAPPING_CONFIDENCE_THRESHOLD}; "
+            "explanations will fall back to computing similarities at query time."
+        )
+
+    started = time.perf_counter()
+    embedding_column = get_active_embedding_version(db_pool=db_pool).column
+    prototypes = load_concept_prototypes(db_pool=db_pool, embedding_column=embedding_column)
+    digests = {proto.concept_id: prototype_digest(proto) for proto in prototypes}
+
+    connection_factory = db_pool.connection if db_pool else get_connection
+    with connection_factory() as conn:
+        try:
+            ensure_similarity_tables(conn)
+            conn.commit()
+            stored = _fetch_stored_prototypes(conn)
+            rebuilt = full or any(
+                column != embedding_column or abs(stored_floor - floor) > 1e-6
+                for column, _, stored_floor in stored.values()
+            )
+            suffix = ""
+            if rebuilt:
+                # Readers keep the live tables; everything below writes the staging copies.
+                suffix = REBUILD_SUFFIX
+                with conn.cursor() as cur:
+                    for table in SIMILARITY_TABLES:
+                        cur.execute(f"DROP TABLE IF EXISTS {table}{suffix}")
+                ensure_similarity_tables(conn, suffix=suffix)
+                stored = {}
+
+            changed = sorted(
+                concept_id for concept_id, digest in digests.items()
+                if stored.get(concept_id, (None, None, None))[1] != digest
+            )
+            removed = sorted(set(stored) - set(digests))
+            with conn.cursor() as cur:
+                if changed or removed:
+                    cur.execute(
+                        f"DELETE FROM {SIMILARITY_TABLE}{suffix} WHERE concept_id = ANY(%s)",
+                        (changed + removed,),
+                    )
+                    cur.execute(
+                        f"DELETE FROM {PROTOTYPE_TABLE}{suffix} WHERE concept_id = ANY(%s)",
+                        (removed,),
+                    )
+
+            artworks_scored, rows_written = 0, 0
+            if prototypes:
+                artworks_scored, rows_written = _score_pending_artworks(
+                    conn,
+                    prototypes=prototypes,
+                    changed_concept_ids=changed,
+                    embedding_column=embedding_column,
+                    floor=floor,
+                    fetch_size=fetch_size,
+                    suffix=suffix,
+                )
+
+            with conn.cursor() as cur:
+                cur.executemany(
+                    f"""
+                    INSERT INTO {PROTOTYPE_TABLE}{suffix}
+                        (concept_id, embedding_column, prototype_digest, floor, refreshed_at)
+                    VALUES (%s, %s, %s, %s, now())
+                    ON CONFLICT (concept_id) DO UPDATE SET
+                        embedding_column = EXCLUDED.embedding_column,
+                        prototype_digest = EXCLUDED.prototype_digest,
+                        floor = EXCLUDED.floor,
+                        refreshed_at = EXCLUDED.refreshed_at
+                    """,
+                    [(concept_id, embedding_column, digests[concept_id], floor) for concept_id in changed],
+                )
+            if rebuilt:
+                conn.commit()
+                _swap_in_rebuilt_tables(conn, suffix)
+            if rebuilt or changed or removed or rows_written:
+                bump_mapping_generation(conn)
+            conn.commit()
+        except psycopg.Error:
+            conn.rollback()
+            raise
+    invalidate_mapping_generation()
+
+    report = SimilarityRefreshReport(
+        embedding_column=embedding_column,
+        rebuilt=rebuilt,
+        concepts_rescored=len(changed),
+        concepts_removed=len(removed),
+        artworks_scored=artworks_scored,
+        rows_written=rows_written,
+        seconds=time.perf_counter() - started,
+    )
+    print(report)
+    return report
+
+
+def lookup_artwork_concept_similarities(
+    artwork_ids: Sequence[int],
+    concept_ids: Sequence[int],
+    *,
+    embedding_column: str,
+    threshold: float = MAPPING_CONFIDENCE_THRESHOLD,
+    db_pool: Any | None = None,
+) -> tuple[list[tuple[int, int, float]], set[int], set[int]]:
+    """
+    One indexed query for the materialized (artwork_id, concept_id, similarity)
+    rows at or above `threshold`. Also returns the concept ids the table
+    covers for `embedding_column` and the artwork ids a refresh has scored:
+    a covered concept says nothing about artworks ingested since the last
+    refresh, so the caller computes every pair outside (scored x covered).
+    """
+    if not artwork_ids or not concept_ids:
+        return [], set(), set()
+
+    sql = """
+        SELECT p.concept_id, s.artwork_id, s.similarity
+        FROM artwork_concept_similarity_prototype p
+        LEFT JOIN artwork_concept_similarity s
+               ON s.concept_id = p.concept_id
+              AND s.artwork_id = ANY(%s)
+              AND s.similarity >= %s
+        WHERE p.concept_id = ANY(%s)
+          AND p.embedding_column = %s
+          AND p.floor <= %s::real
+    """
+    connection_factory = db_pool.connection if db_pool else get_connection
+    with connection_factory() as conn:
+        try:
+            with conn.cursor() as cur:
+                cur.execute(sql, (list(artwork_ids), threshold, list(concept_ids), embedding_column, threshold))
+                rows = cur.fetchall()
+                cur.execute(
+                    "SELECT artwork_id FROM artwork_concept_similarity_scored WHERE artwork_id = ANY(%s)",
+                    (list(artwork_ids),),
+                )
+                scored = {int(artwork_id) for (artwork_id,) in cur.fetchall()}
+        except psycopg.errors.UndefinedTable:
+            # Never refreshed: nothing is materialized yet.
+            conn.rollback()
+            return [], set(), set()
+
+    covered = {int(concept_id) for concept_id, _, _ in rows}
+    similarities = [
+        (int(artwork_id), int(concept_id), float(similarity))
+        for concept_id, artwork_id, similarity in rows
+        if artwork_id is not None and int(artwork_id) in scored
+    ]
+    return similarities, covered, scored
+
+
+def ensure_similarity_tables(conn, suffix: str = "") -> None:
+    """The three similarity tables; `suffix` names the staging copies a rebuild fills."""
+    with conn.cursor() as cur:
+        cur.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {SIMILARITY_TABLE}{suffix} (
+                artwork_id INT NOT NULL,
+                concept_id INT NOT NULL,
+                similarity REAL NOT NULL,
+                CONSTRAINT {SIMILARITY_TABLE}{suffix}_pkey PRIMARY KEY (artwork_id, concept_id),
+                CONSTRAINT {SIMILARITY_TABLE}{suffix}_artwork_id_fkey
+                    FOREIGN KEY (artwork_id) REFERENCES artwork(id) ON DELETE CASCADE
+            )
+            """
+        )
+        cur.execute(
+            f"""
+            CREATE INDEX IF NOT EXISTS {SIMILARITY_TABLE}{suffix}_concept_idx
+            ON {SIMILARITY_TABLE}{suffix} (concept_id, similarity DESC)
+            """
+        )
+        cur.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {SCORED_TABLE}{suffix} (
+                artwork_id INT NOT NULL,
+                CONSTRAINT {SCORED_TABLE}{suffix}_pkey PRIMARY KEY (artwork_id),
+                CONSTRAINT {SCORED_TABLE}{suffix}_artwork_id_fkey
+                    FOREIGN KEY (artwork_id) REFERENCES artwork(id) ON DELETE CASCADE
+            )
+            """
+        )
+        cur.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {PROTOTYPE_TABLE}{suffix} (
+                concept_id INT NOT NULL,
+                embedding_column TEXT NOT NULL,
+                prototype_digest TEXT NOT NULL,
+                floor REAL NOT NULL,
+                refreshed_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                CONSTRAINT {PROTOTYPE_TABLE}{suffix}_pkey PRIMARY KEY (concept_id)
+            )
+            """
+        )
+
+
+def _swap_in_rebuilt_tables(conn, suffix: str) -> None:
+    """
+    Replace the live tables with their rebuilt copies in one short
+    transaction: a concurrent lookup sees either the old rows or the new.
+    """
+    with conn.cursor() as cur:
+        cur.execute(f"LOCK TABLE {', '.join(SIMILARITY_TABLES)} IN ACCESS EXCLUSIVE MODE")
+        for table in SIMILARITY_TABLES:
+            cur.execute(f"DROP TABLE {table}")
+            cur.execute(f"ALTER TABLE {table}{suffix} RENAME TO {table}")
+            cur.execute(f"ALTER INDEX {table}{suffix}_pkey RENAME TO {table}_pkey")
+        for table in (SIMILARITY_TABLE, SCORED_TABLE):
+            cur.execute(
+                f"ALTER TABLE {table} RENAME CONSTRAINT {table}{suffix}_artwork_id_fkey TO {table}_artwork_id_fkey"
+            )
+        cur.execute(f"ALTER INDEX {SIMILARITY_TABLE}{suffix}_concept_idx RENAME TO {SIMILARITY_TABLE}_concept_idx")
+
+
+def _fetch_stored_prototypes(conn) -> dict[int, tuple[str, str, float]]:
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT concept_id, embedding_column, prototype_digest, floor FROM artwork_concept_similarity_prototype"
+        )
+        return {int(concept_id): (column, digest, floor) for concept_id, column, digest, floor in cur.fetchall()}
+
+
+def _score_pending_artworks(
+    conn,
+    *,
+    prototypes: Sequence[ConceptPrototype],
+    changed_concept_ids: Sequence[int],
+    embedding_column: str,
+    floor: float,
+    fetch_size: int,
+    suffix: str = "",
+) -> tuple[int, int]:
+    """
+    Stream the artworks that need work: unscored ones against every concept,
+    and, if any prototype changed, the already scored ones against just those.
+    """
+    matrix = build_prototype_matrix(prototypes)
+    all_concept_ids = [int(concept_id) for concept_id in matrix.concept_ids]
+    artworks_scored, rows_written = 0, 0
+
+    with conn.cursor(name="artwork_concept_similarity_refresh") as read_cur:
+        read_cur.itersize = fetch_size
+        read_cur.execute(
+            f"""
+            SELECT a.id, a.{embedding_column}::float4[], s.artwork_id IS NOT NULL AS scored
+            FROM artwork a
+            LEFT JOIN {SCORED_TABLE}{suffix} s ON s.artwork_id = a.id
+            WHERE a.{embedding_column} IS NOT NULL
+              AND (s.artwork_id IS NULL OR %s)
+            ORDER BY a.id
+            """,
+            (bool(changed_concept_ids),),
+        )
+        while True:
+            rows = read_cur.fetchmany(fetch_size)
+            if not rows:
+                break
+            unscored = [(int(artwork_id), vector) for artwork_id, vector, scored in rows if not scored]
+            rescored = [(int(artwork_id), vector) for artwork_id, vector, scored in rows if scored]
+            payload = _score_block(unscored, matrix, all_concept_ids, floor)
+            payload += _score_block(rescored, matrix, changed_concept_ids, floor)
+            rows_written += _copy_upsert_similarities(
+                conn, payload, [artwork_id for artwork_id, _ in unscored], suffix=suffix
+            )
+            artworks_scored += len(rows)
+
+    return artworks_scored, rows_written
+
+
+def _score_block(
+    rows: Sequence[tuple[int, Sequence[float]]],
+    matrix: PrototypeMatrix,
+    concept_ids: Sequence[int],
+    floor: float,
+) -> list[tuple[int, int, float]]:
+    if not rows or not concept_ids:
+        return []
+    return artwork_concept_similarities_for_block(
+        artwork_ids=[artwork_id for artwork_id, _ in rows],
+        vectors=np.asarray([vector for _, vector in rows], dtype=np.float32),
+        matrix=matrix,
+        concept_ids=concept_ids,
+        threshold=floor,
+    )
+
+
+def _copy_upsert_similarities(
+    conn, payload: Sequence[tuple[int, int, float]], scored_artwork_ids: Sequence[int], suffix: str = ""
+) -> int:
+    """Bulk writer: COPY into a temp table, then one upsert; also marks the artworks as scored."""
+    with conn.cursor() as cur:
+        if payload:
+            cur.execute(
+                """
+                CREATE TEMP TABLE IF NOT EXISTS artwork_concept_similarity_stage (
+                    artwork_id INT,
+                    concept_id INT,
+                    similarity REAL
+                )
+                """
+            )
+            with cur.copy(
+                "COPY artwork_concept_similarity_stage (artwork_id, concept_id, similarity) FROM STDIN"
+            ) as copy:
+                for row in payload:
+                    copy.write_row(row)
+            cur.execute(
+                f"""
+                INSERT INTO {SIMILARITY_TABLE}{suffix} (artwork_id, concept_id, similarity)
+                SELECT artwork_id, concept_id, similarity
+                FROM artwork_concept_similarity_stage
+                ON CONFLICT (artwork_id, concept_id)
+                DO UPDATE SET similarity = EXCLUDED.similarity
+                """
+            )
+            cur.execute("TRUNCATE artwork_concept_similarity_stage")
+        if scored_artwork_ids:
+            cur.execute(
+                f"""
+                INSERT INTO {SCORED_TABLE}{suffix} (artwork_id)
+                SELECT unnest(%s::int[])
+                ON CONFLICT DO NOTHING
+                """,
+                (list(scored_artwork_ids),),
+            )
+
+    return len(payload)
+
@@ -8,7 +8,9 @@ from concept_data_pipeline.artwork_concept.affinity import (
     ArtworkConceptRecord,
     generate_artwork_concept_affinities,
     insert_artwork_concepts,
+    score_artwork_concepts_in_parallel,
 )
+from concept_data_pipeline.artwork_concept.similarity import refresh_artwork_concept_similarities
 from concept_data_pipeline.concept.insert_concept_data import (
     CURATED_CONCEPTS,
     ConceptRecord,
@@ -19,6 +21,7 @@ from concept_data_pipeline.essay_concept.insert_essay_concept_data import (
     EssayConceptRecord,
     insert_essay_concepts,
 )
+from utils.config import INGESTION
 
 
 def seed_concept_mappings(
@@ -26,6 +29,7 @@ def seed_concept_mappings(
     concepts: Iterable[ConceptRecord] | None = None,
     essay_concepts: Iterable[EssayConceptRecord] | None = None,
     artwork_concepts: Iterable[ArtworkConceptRecord] | None = None,
+    affinity_workers: int | None = None,
     db_pool=None,
 ) -> None:
     """
@@ -35,6 +39,10 @@ def seed_concept_mappings(
         concepts: Optional override for concept payload; defaults to CURATED_CONCEPTS.
         essay_concepts: Essay-chunk to concept associations (optional).
         artwork_concepts: Artwork to concept confidence mappings (optional).
+        affinity_workers: When > 1, score artwork affinities across a process
+            pool by artwork id range; each worker writes its own results.
+            Defaults to AFFINITY_WORKERS.
+            Either way the run ends by refreshing `artwork_concept_similarity`.
         db_pool: Optional psycopg_pool.ConnectionPool override.
     """
 
@@ -46,12 +54,19 @@ def seed_concept_mappings(
     if essay_payload:
         _safe_call(insert_essay_concepts, essay_payload, db_pool=db_pool)
 
-    if artwork_concepts is None:
-        artwork_payload = generate_artwork_concept_affinities(db_pool=db_pool)
+    workers = INGESTION.affinity_workers if affinity_workers is None else affinity_workers
+    if artwork_concepts is None and workers > 1:
+        score_artwork_concepts_in_parallel(workers=workers, db_pool=db_pool)
     else:
-        artwork_payload = _coerce_sequence(artwork_concepts)
-    if artwork_payload:
-        _safe_call(insert_artwork_concepts, artwork_payload, db_pool=db_pool)
+        if artwork_concepts is None:
+            artwork_payload = generate_artwork_concept_affinities(db_pool=db_pool)
+        else:
+            artwork_payload = _coerce_sequence(artwork_concepts)
+        if artwork_payload:
+            _safe_call(insert_artwork_concepts, artwork_payload, db_pool=db_pool)
+
+    # Essay mappings may have moved prototypes and new artworks may have arrived; both refresh incrementally.
+    refresh_artwork_concept_similarities(db_pool=db_pool)
 
 
 def _coerce_sequence(
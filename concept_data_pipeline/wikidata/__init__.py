@@ -0,0 +1 @@
+"""Wikidata artist/movement relations imported from a local dump."""
@@ -0,0 +1,443 @@
+"""
+Stream a local Wikidata JSON dump into `wikidata_entity` / `wikidata_relation`.
+
+The dump (latest-all.json.gz / .bz2, or plain .json) is one JSON array with
+one entity per line. The coordinator decompresses it line by line and hands
+fixed-size line batches to a process pool with at most `max_in_flight`
+batches outstanding, so memory stays bounded by a few batches whatever the
+dump size. Workers reject almost every line with one regex search before
+parsing any JSON, and keep:
+
+- humans (P31 Q5) whose English label or alias matches an `artwork.artist`
+  name, and
+- art movements, styles and genres. There are only a few thousand, so every
+  relation target of an artist resolves to a label. The ones named like a
+  curated `concept` get its `concept_id`.
+
+Matches are written through COPY into temp tables and upserted every
+`flush_rows` rows, so a rerun over a newer dump refreshes rows in place.
+
+    CREATE TABLE wikidata_entity (
+        qid           TEXT PRIMARY KEY,          -- 'Q5582'
+        kind          TEXT NOT NULL,             -- 'artist' | 'movement' | 'genre'
+        label         TEXT NOT NULL,
+        description   TEXT,
+        aliases       TEXT[] NOT NULL DEFAULT '{}',
+        artist_names  TEXT[] NOT NULL DEFAULT '{}',  -- artwork.artist values it matched
+        concept_id    INT REFERENCES concept(id)     -- curated concept it matched
+    );
+
+    CREATE TABLE wikidata_relation (
+        subject_qid   TEXT NOT NULL,
+        property      TEXT NOT NULL,             -- 'P135'
+        relation      TEXT NOT NULL,             -- 'movement'
+        object_qid    TEXT NOT NULL,
+        PRIMARY KEY (subject_qid, property, object_qid)
+    );
+"""
+
+from __future__ import annotations
+
+import bz2
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+import gzip
+import io
+import json
+from pathlib import Path
+import re
+import time
+import unicodedata
+from typing import Any, BinaryIO, Iterable, Iterator, Sequence
+
+import psycopg
+
+from db.db_pool import get_connection
+from utils.config import INGESTION
+
+HUMAN_CLASS = "Q5"
+# P31 (instance of) class -> wikidata_entity.kind
+CONCEPT_CLASSES = {
+    "Q968159": "movement",  # art movement
+    "Q1792644": "movement",  # art style
+    "Q1792379": "genre",  # art genre
+}
+
+ARTIST_PROPERTIES = {
+    "P135": "movement",
+    "P136": "genre",
+    "P737": "influenced_by",
+    "P1066": "student_of",
+    "P802": "student",
+}
+CONCEPT_PROPERTIES = {
+    "P155": "follows",
+    "P156": "followed_by",
+    "P279": "subclass_of",
+    "P361": "part_of",
+    "P737": "influenced_by",
+}
+
+# Entities point at a class as {"entity-type":"item",...,"id":"Q5"}; lines without
+# one of ours are dropped before json.loads.
+_CLASS_MARKER = re.compile(
+    '"id":"(?:' + "|".join(re.escape(qid) for qid in (HUMAN_CLASS, *CONCEPT_CLASSES)) + ')"'
+)
+
+_ENTITY_COLUMNS = ("qid", "kind", "label", "description", "aliases", "artist_names", "concept_id")
+_RELATION_COLUMNS = ("subject_qid", "property", "relation", "object_qid")
+
+
+@dataclass
+class WikidataImportStats:
+    total_bytes: int
+    lines: int = 0
+    bytes_read: int = 0
+    entities: dict[str, int] = field(default_factory=dict)
+    relations: int = 0
+    started: float = field(default_factory=time.perf_counter)
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def report(self) -> str:
+        elapsed = max(self.elapsed, 1e-9)
+        kinds = ", ".join(f"{count} {kind}" for kind, count in sorted(self.entities.items())) or "no entities"
+        progress = ""
+        if self.total_bytes:
+            fraction = self.bytes_read / self.total_bytes
+            eta = elapsed * (1 - fraction) / fraction if fraction > 0 else 0.0
+            progress = f" {fraction:.1%} of dump, ~{eta / 60:.0f} min left,"
+        return (
+            f"[wikidata]{progress} {self.lines} lines ({self.lines / elapsed:.0f} lines/s, "
+            f"{self.bytes_read / elapsed / 1e6:.1f} MB/s compressed), {kinds}, {self.relations} relations"
+        )
+
+
+def normalize_name(name: str) -> str:
+    """Case-, accent- and punctuation-insensitive key for matching names across sources."""
+    decomposed = unicodedata.normalize("NFKD", name)
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return " ".join(re.sub(r"[^\w]+", " ", stripped.casefold()).split())
+
+
+def artist_name_keys(display_name: str) -> set[str]:
+    """
+    Keys for a Met `artistDisplayName`: every "|"-separated artist, both with
+    and without its parenthetical, e.g. "Rembrandt (Rembrandt van Rijn)".
+    """
+    keys = set()
+    for artist in display_name.split("|"):
+        keys.add(normalize_name(re.sub(r"\([^)]*\)", " ", artist)))
+        keys.update(normalize_name(inner) for inner in re.findall(r"\(([^)]*)\)", artist))
+    keys.discard("")
+    return keys
+
+
+def import_wikidata_dump(
+    path: str | Path,
+    *,
+    workers: int = INGESTION.wikidata_workers,
+    batch_lines: int = INGESTION.wikidata_batch_lines,
+    max_in_flight: int | None = None,
+    flush_rows: int = INGESTION.wikidata_flush_rows,
+    max_lines: int | None = None,
+    replace: bool = False,
+    report_interval_seconds: float = INGESTION.pipeline_report_interval_seconds,
+    db_pool: Any | None = None,
+) -> WikidataImportStats:
+    """
+    Import the entities relevant to our artworks and concepts from a local
+    dump. `replace` empties both tables first; otherwise rows are upserted.
+    """
+    if workers <= 0 or batch_lines <= 0 or flush_rows <= 0:
+        raise ValueError("workers, batch_lines and flush_rows must be positive")
+    max_in_flight = max_in_flight or workers * 2
+    connection_factory = db_pool.connection if db_pool else get_connection
+
+    with connection_factory() as conn:
+        try:
+            ensure_wikidata_tables(conn, replace=replace)
+            artist_keys, concept_keys = _load_match_targets(conn)
+            conn.commit()
+        except psycopg.Error:
+            conn.rollback()
+            raise
+
+    print(f"Matching Wikidata against {len(artist_keys)} artist names and {len(concept_keys)} concepts "
+          f"with {workers} workers.")
+
+    path = Path(path)
+    stats = WikidataImportStats(total_bytes=path.stat().st_size)
+    writer = _RelationWriter(flush_rows)
+    last_report = time.monotonic()
+
+    with (
+        _open_dump(path) as (lines, raw),
+        connection_factory() as conn,
+        ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_wikidata_worker,
+            initargs=(artist_keys, concept_keys),
+        ) as executor,
+    ):
+        in_flight: deque[tuple[Future, int]] = deque()
+
+        def absorb(future: Future, line_count: int) -> None:
+            entities, relations = future.result()
+            stats.lines += line_count
+            for entity in entities:
+                stats.entities[entity[1]] = stats.entities.get(entity[1], 0) + 1
+            stats.relations += len(relations)
+            writer.add(conn, entities, relations)
+
+        try:
+            for batch in _iter_line_batches(lines, batch_lines, max_lines):
+                in_flight.append((executor.submit(_match_batch, batch), len(batch)))
+                if len(in_flight) >= max_in_flight:
+                    absorb(*in_flight.popleft())
+                stats.bytes_read = raw.tell()
+                if time.monotonic() - last_report >= report_interval_seconds:
+                    print(stats.report())
+                    last_report = time.monotonic()
+            while in_flight:
+                absorb(*in_flight.popleft())
+            writer.flush(conn)
+            stats.bytes_read = raw.tell()
+        except psycopg.Error:
+            conn.rollback()
+            for future, _ in in_flight:
+                future.cancel()
+            raise
+
+    print(stats.report())
+    print(f"Imported Wikidata relations in {stats.elapsed:.2f}s")
+    return stats
+
+
+def ensure_wikidata_tables(conn, *, replace: bool = False) -> None:
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS wikidata_entity (
+                qid           TEXT PRIMARY KEY,
+                kind          TEXT NOT NULL,
+                label         TEXT NOT NULL,
+                description   TEXT,
+                aliases       TEXT[] NOT NULL DEFAULT '{}',
+                artist_names  TEXT[] NOT NULL DEFAULT '{}',
+                concept_id    INT REFERENCES concept(id)
+            )
+            """
+        )
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS wikidata_relation (
+                subject_qid   TEXT NOT NULL,
+                property      TEXT NOT NULL,
+                relation      TEXT NOT NULL,
+                object_qid    TEXT NOT NULL,
+                PRIMARY KEY (subject_qid, property, object_qid)
+            )
+            """
+        )
+        cur.execute("CREATE INDEX IF NOT EXISTS wikidata_relation_object_idx ON wikidata_relation (object_qid)")
+        cur.execute("CREATE INDEX IF NOT EXISTS wikidata_entity_concept_idx ON wikidata_entity (concept_id)")
+        if replace:
+            cur.execute("TRUNCATE wikidata_relation, wikidata_entity")
+
+
+def _load_match_targets(conn) -> tuple[dict[str, tuple[str, ...]], dict[str, int]]:
+    artist_keys: dict[str, set[str]] = {}
+    with conn.cursor() as cur:
+        cur.execute("SELECT DISTINCT artist FROM artwork WHERE artist IS NOT NULL AND artist <> ''")
+        for (display_name,) in cur.fetchall():
+            for key in artist_name_keys(display_name):
+                artist_keys.setdefault(key, set()).add(display_name)
+
+        cur.execute("SELECT id, name FROM concept")
+        concept_keys = {normalize_name(name): int(concept_id) for concept_id, name in cur.fetchall()}
+
+    return {key: tuple(sorted(names)) for key, names in artist_keys.items()}, concept_keys
+
+
+@contextmanager
+def _open_dump(path: Path) -> Iterator[tuple[io.TextIOWrapper, BinaryIO]]:
+    """Yield (decoded lines, raw file); `raw.tell()` tracks progress through the compressed bytes."""
+    with open(path, "rb") as raw:
+        if path.suffix == ".gz":
+            stream: BinaryIO = gzip.GzipFile(fileobj=raw)
+        elif path.suffix == ".bz2":
+            stream = bz2.BZ2File(raw)
+        else:
+            stream = raw
+        with io.TextIOWrapper(stream, encoding="utf-8") as lines:
+            yield lines, raw
+
+
+def _iter_line_batches(lines: Iterable[str], batch_lines: int, max_lines: int | None) -> Iterator[list[str]]:
+    batch: list[str] = []
+    for count, line in enumerate(lines, start=1):
+        batch.append(line)
+        if len(batch) >= batch_lines:
+            yield batch
+            batch = []
+        if max_lines is not None and count >= max_lines:
+            break
+    if batch:
+        yield batch
+
+
+class _RelationWriter:
+    """Buffers matched rows and upserts them through COPY once `flush_rows` accumulate."""
+
+    def __init__(self, flush_rows: int) -> None:
+        self.flush_rows = flush_rows
+        self.entities: list[tuple] = []
+        self.relations: list[tuple] = []
+
+    def add(self, conn, entities: Sequence[tuple], relations: Sequence[tuple]) -> None:
+        self.entities.extend(entities)
+        self.relations.extend(relations)
+        if len(self.entities) + len(self.relations) >= self.flush_rows:
+            self.flush(conn)
+
+    def flush(self, conn) -> None:
+        if not self.entities and not self.relations:
+            return
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                CREATE TEMP TABLE IF NOT EXISTS wikidata_entity_stage
+                (LIKE wikidata_entity INCLUDING DEFAULTS)
+                """
+            )
+            cur.execute(
+                """
+                CREATE TEMP TABLE IF NOT EXISTS wikidata_relation_stage
+                (LIKE wikidata_relation INCLUDING DEFAULTS)
+                """
+            )
+            if self.entities:
+                with cur.copy(f"COPY wikidata_entity_stage ({', '.join(_ENTITY_COLUMNS)}) FROM STDIN") as copy:
+                    for row in self.entities:
+                        copy.write_row(row)
+                cur.execute(
+                    f"""
+                    INSERT INTO wikidata_entity ({', '.join(_ENTITY_COLUMNS)})
+                    SELECT DISTINCT ON (qid) {', '.join(_ENTITY_COLUMNS)}
+                    FROM wikidata_entity_stage
+                    ON CONFLICT (qid) DO UPDATE
+                    SET kind = EXCLUDED.kind,
+                        label = EXCLUDED.label,
+                        description = EXCLUDED.description,
+                        aliases = EXCLUDED.aliases,
+                        artist_names = EXCLUDED.artist_names,
+                        concept_id = EXCLUDED.concept_id
+                    """
+                )
+                cur.execute("TRUNCATE wikidata_entity_stage")
+            if self.relations:
+                with cur.copy(f"COPY wikidata_relation_stage ({', '.join(_RELATION_COLUMNS)}) FROM STDIN") as copy:
+                    for row in self.relations:
+                        copy.write_row(row)
+                cur.execute(
+                    f"""
+                    INSERT INTO wikidata_relation ({', '.join(_RELATION_COLUMNS)})
+                    SELECT {', '.join(_RELATION_COLUMNS)}
+                    FROM wikidata_relation_stage
+                    ON CONFLICT DO NOTHING
+                    """
+                )
+                cur.execute("TRUNCATE wikidata_relation_stage")
+        conn.commit()
+        self.entities.clear()
+        self.relations.clear()
+
+
+# Worker side. The match targets are handed over once through the pool
+# initializer; each task is a list of raw dump lines and returns only the
+# matched rows.
+
+_worker_artist_keys: dict[str, tuple[str, ...]] = {}
+_worker_concept_keys: dict[str, int] = {}
+
+
+def _init_wikidata_worker(artist_keys: dict[str, tuple[str, ...]], concept_keys: dict[str, int]) -> None:
+    global _worker_artist_keys, _worker_concept_keys
+    _worker_artist_keys = artist_keys
+    _worker_concept_keys = concept_keys
+
+
+def _match_batch(lines: Sequence[str]) -> tuple[list[tuple], list[tuple]]:
+    entities: list[tuple] = []
+    relations: list[tuple] = []
+    for line in lines:
+        matched = _match_line(line)
+        if matched is not None:
+            entity, entity_relations = matched
+            entities.append(entity)
+            relations.extend(entity_relations)
+    return entities, relations
+
+
+def _match_line(line: str) -> tuple[tuple, list[tuple]] | None:
+    if not _CLASS_MARKER.search(line):
+        return None
+    line = line.strip().rstrip(",")
+    if not line.startswith("{"):
+        return None
+    try:
+        entity = json.loads(line)
+    except json.JSONDecodeError:
+        return None
+    if entity.get("type") != "item":
+        return None
+
+    label = (entity.get("labels", {}).get("en") or {}).get("value")
+    if not label:
+        return None
+    aliases = [alias["value"] for alias in entity.get("aliases", {}).get("en", ())]
+    claims = entity.get("claims", {})
+    classes = set(_claim_targets(claims.get("P31", ())))
+    keys = {normalize_name(name) for name in (label, *aliases)}
+
+    artist_names: tuple[str, ...] = ()
+    concept_id = None
+    if HUMAN_CLASS in classes:
+        artist_names = tuple(sorted({name for key in keys for name in _worker_artist_keys.get(key, ())}))
+        if not artist_names:
+            return None
+        kind, properties = "artist", ARTIST_PROPERTIES
+    else:
+        kind = next((CONCEPT_CLASSES[qid] for qid in sorted(classes) if qid in CONCEPT_CLASSES), None)
+        if kind is None:
+            return None
+        properties = CONCEPT_PROPERTIES
+        # The label decides first, so "Baroque" is not claimed through another entity's alias.
+        concept_id = _worker_concept_keys.get(normalize_name(label))
+        if concept_id is None:
+            concept_id = next((_worker_concept_keys[key] for key in sorted(keys) if key in _worker_concept_keys), None)
+
+    qid = entity["id"]
+    description = (entity.get("descriptions", {}).get("en") or {}).get("value")
+    row = (qid, kind, label, description, aliases, list(artist_names), concept_id)
+    relations = [
+        (qid, prop, relation, target)
+        for prop, relation in properties.items()
+        for target in dict.fromkeys(_claim_targets(claims.get(prop, ())))
+    ]
+    return row, relations
+
+
+def _claim_targets(statements: Iterable[dict]) -> Iterator[str]:
+    """Item ids of the non-deprecated statements of one property."""
+    for statement in statements:
+        if statement.get("rank") == "deprecated":
+            continue
+        value = statement.get("mainsnak", {}).get("datavalue", {}).get("value")
+        if isinstance(value, dict) and value.get("entity-type") == "item" and "id" in value:
+            yield value["id"]
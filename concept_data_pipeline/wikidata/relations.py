@@ -0,0 +1,77 @@
+"""Read helpers over the imported Wikidata relations (see dump_importer)."""
+
+from __future__ import annotations
+
+from typing import Any, Iterable
+
+import psycopg
+
+from db.db_pool import get_connection
+
+# Artist -> concept properties that place an artist inside a movement/genre.
+MEMBERSHIP_PROPERTIES = ("P135", "P136")
+
+
+def fetch_concept_artists(
+    concept_ids: Iterable[int], *, db_pool: Any | None = None
+) -> dict[int, tuple[str, ...]]:
+    """`artwork.artist` values Wikidata places in each concept (movement or genre)."""
+    concept_ids = sorted({int(concept_id) for concept_id in concept_ids})
+    if not concept_ids:
+        return {}
+
+    sql = """
+        SELECT target.concept_id, array_agg(DISTINCT artist_name ORDER BY artist_name)
+        FROM wikidata_relation rel
+        JOIN wikidata_entity artist ON artist.qid = rel.subject_qid AND artist.kind = 'artist'
+        JOIN wikidata_entity target ON target.qid = rel.object_qid
+        CROSS JOIN LATERAL unnest(artist.artist_names) AS artist_name
+        WHERE target.concept_id = ANY(%s)
+          AND rel.property = ANY(%s)
+        GROUP BY target.concept_id
+    """
+    rows = _fetch(sql, (concept_ids, list(MEMBERSHIP_PROPERTIES)), db_pool)
+    return {int(concept_id): tuple(names) for concept_id, names in rows}
+
+
+def fetch_related_concepts(
+    concept_ids: Iterable[int], *, db_pool: Any | None = None
+) -> dict[int, tuple[tuple[int, str], ...]]:
+    """
+    Concept-to-concept edges where both Wikidata entities map to a curated
+    concept, e.g. Baroque -followed_by-> Rococo. Returns
+    {concept_id: ((related_concept_id, relation), ...)}.
+    """
+    concept_ids = sorted({int(concept_id) for concept_id in concept_ids})
+    if not concept_ids:
+        return {}
+
+    sql = """
+        SELECT DISTINCT subject.concept_id, target.concept_id, rel.relation
+        FROM wikidata_relation rel
+        JOIN wikidata_entity subject ON subject.qid = rel.subject_qid
+        JOIN wikidata_entity target ON target.qid = rel.object_qid
+        WHERE subject.concept_id = ANY(%s)
+          AND target.concept_id IS NOT NULL
+          AND target.concept_id <> subject.concept_id
+        ORDER BY 1, 2, 3
+    """
+    related: dict[int, list[tuple[int, str]]] = {}
+    for concept_id, related_id, relation in _fetch(sql, (concept_ids,), db_pool):
+        related.setdefault(int(concept_id), []).append((int(related_id), relation))
+    return {concept_id: tuple(edges) for concept_id, edges in related.items()}
+
+
+def _fetch(sql: str, params: tuple, db_pool: Any | None) -> list[tuple]:
+    connection_factory = db_pool.connection if db_pool else get_connection
+    with connection_factory() as conn:
+        try:
+            with conn.cursor() as cur:
+                cur.execute(sql, params)
+                rows = cur.fetchall()
+            conn.commit()
+        except psycopg.errors.UndefinedTable:
+            # No dump imported yet: callers behave as if Wikidata had no relations.
+            conn.rollback()
+            return []
+    return rows
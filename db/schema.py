@@ -0,0 +1,18 @@
+from contextlib import nullcontext
+
+from db.db_pool import get_connection
+
+
+def column_exists(table: str, column: str, conn=None) -> bool:
+    """Whether `table` in the current schema has `column`, for code that runs before and after a migration."""
+    with (nullcontext(conn) if conn is not None else get_connection()) as conn, conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT EXISTS(
+                SELECT 1 FROM information_schema.columns
+                WHERE table_schema = current_schema() AND table_name = %s AND column_name = %s
+            )
+            """,
+            (table, column),
+        )
+        return bool(cur.fetchone()[0])
@@ -0,0 +1,63 @@
+import argparse
+from met_data_collection.image_embeddings import embed_artwork_images
+from utils.config import IMAGE_EMBEDDINGS
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Embed artwork thumbnails on the CPU into artwork.image_embedding. Safe to interrupt and rerun.",
+        formatter_class=argparse.RawTextHelpFormatter
+    )
+
+    parser.add_argument(
+        "-l", "--limit",
+        type=int,
+        default=None,
+        help="Embed at most this many artworks, e.g. to measure images/s on this machine."
+    )
+
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=IMAGE_EMBEDDINGS.batch_size,
+        help=f"Images per model call and per committed page. (Default: {IMAGE_EMBEDDINGS.batch_size})"
+    )
+
+    parser.add_argument(
+        "--decode-workers",
+        type=int,
+        default=IMAGE_EMBEDDINGS.decode_workers,
+        help=f"Processes decoding and resizing thumbnails; the rest of the cores run the model. (Default: {IMAGE_EMBEDDINGS.decode_workers})"
+    )
+
+    parser.add_argument(
+        "--download-workers",
+        type=int,
+        default=IMAGE_EMBEDDINGS.download_workers,
+        help=f"Concurrent thumbnail downloads, capped at THUMBNAIL_DOWNLOADS_PER_SECOND. (Default: {IMAGE_EMBEDDINGS.download_workers})"
+    )
+
+    parser.add_argument(
+        "--retry-failed",
+        action="store_true",
+        help="Retry artworks whose thumbnail previously failed to download or decode."
+    )
+
+    parser.add_argument(
+        "--allow-local-paths",
+        action="store_true",
+        help="Read image_url values that are local paths or file:// URLs from disk (offline seeding)."
+    )
+
+    args = parser.parse_args()
+
+    embed_artwork_images(
+        batch_size=args.batch_size,
+        decode_workers=args.decode_workers,
+        download_workers=args.download_workers,
+        limit=args.limit,
+        retry_failed=args.retry_failed,
+        allow_local_paths=args.allow_local_paths,
+    )
+
+if __name__ == "__main__":
+    main()
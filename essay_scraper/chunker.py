@@ -0,0 +1,322 @@
+"""
+Streaming sentence splitter and chunker for essay sources.
+
+Text arrives as an iterable of pieces (DOM strings, file blocks, HTML parser
+data), so memory is bounded by the largest sentence plus one chunk, not by
+the document. Offsets are character positions in the concatenated stream.
+
+Sentence boundaries are terminal punctuation followed by whitespace (so
+decimals like 3.5 never split), except after known abbreviations and single
+initials ("St.", "c.", "J. M. W. Turner"), plus paragraph breaks and the
+"word.Next" run-ons that scraped HTML produces.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from html.parser import HTMLParser
+from pathlib import Path
+import re
+from typing import Callable, Iterable, Iterator, Sequence
+
+MAX_WORDS_PER_CHUNK = 150
+# A "sentence" with no boundary in this many characters is cut at whitespace.
+MAX_SENTENCE_CHARS = 8000
+
+ABBREVIATIONS = frozenset({
+    "mr", "mrs", "ms", "dr", "prof", "st", "ste", "mt", "jr", "sr", "sir", "rev", "fr", "gen", "col", "capt",
+    "vs", "etc", "e.g", "i.e", "cf", "al", "approx", "ca", "c", "fl", "b", "d", "r", "no", "nos", "vol", "vols",
+    "fig", "figs", "pl", "ed", "eds", "trans", "pp", "p", "ch", "cent", "jan", "feb", "mar", "apr", "jun",
+    "jul", "aug", "sep", "sept", "oct", "nov", "dec", "inc", "co", "ltd", "dept", "univ", "ave", "u.s", "u.k",
+})
+
+_BOUNDARY = re.compile(
+    r"""
+    (?P<punct>[.!?]+["'’”)\]]*)(?P<space>\s+)   # punctuation then whitespace
+    | (?<=[a-z]{2}[.!?])(?P<runon>)(?=[A-Z])             # "detailed.The" from scraped markup
+    | (?P<para>\n[ \t]*\n\s*)                            # paragraph break
+    """,
+    re.VERBOSE,
+)
+
+
+@dataclass(frozen=True)
+class Sentence:
+    text: str
+    start: int
+    end: int
+
+
+@dataclass(frozen=True)
+class Chunk:
+    """
+    `text` is whitespace-normalized; `start`/`end` delimit the raw span it came
+    from. `sentence_spans` are (start, end) offsets of each sentence in `text`.
+    """
+
+    index: int
+    text: str
+    start: int
+    end: int
+    sentence_spans: tuple[tuple[int, int], ...] = ()
+
+    @property
+    def word_count(self) -> int:
+        return len(self.text.split())
+
+
+def iter_sentences(pieces: Iterable[str], *, max_sentence_chars: int = MAX_SENTENCE_CHARS) -> Iterator[Sentence]:
+    buffer = ""
+    buffer_start = 0
+
+    for piece in pieces:
+        if not piece:
+            continue
+        buffer += piece
+        cut = 0
+        for match in _BOUNDARY.finditer(buffer):
+            # A boundary touching the end of the buffer may change with the next piece.
+            if match.end() >= len(buffer):
+                break
+            sentence_end = match.start("space") if match.group("space") is not None else match.start()
+            if match.group("para") is None and _is_abbreviation(buffer, sentence_end):
+                continue
+            yield from _emit(buffer, cut, sentence_end, buffer_start)
+            cut = match.end()
+
+        if cut:
+            buffer_start += cut
+            buffer = buffer[cut:]
+
+        while len(buffer) > max_sentence_chars:
+            split_at = buffer.rfind(" ", 0, max_sentence_chars)
+            split_at = split_at if split_at > 0 else max_sentence_chars
+            yield from _emit(buffer, 0, split_at, buffer_start)
+            buffer_start += split_at
+            buffer = buffer[split_at:]
+
+    yield from _emit(buffer, 0, len(buffer), buffer_start)
+
+
+def iter_chunks(
+    pieces: Iterable[str],
+    *,
+    max_words: int = MAX_WORDS_PER_CHUNK,
+    max_tokens: int | None = None,
+    token_counter: Callable[[str], int] | None = None,
+    overlap_sentences: int = 0,
+) -> Iterator[Chunk]:
+    """
+    Group streamed sentences into chunks of at most `max_words` words (and
+    `max_tokens` tokens when a `token_counter` is given). A sentence longer
+    than the limit is hard-split by words. With `overlap_sentences`, each
+    chunk starts with the trailing sentences of the previous one.
+    """
+    if max_tokens is not None and token_counter is None:
+        raise ValueError("max_tokens needs a token_counter")
+
+    current: list[tuple[Sentence, str, int, int]] = []  # sentence, normalized text, words, tokens
+    carried = 0  # leading entries of `current` repeated from the previous chunk
+    index = 0
+
+    def totals() -> tuple[int, int]:
+        return sum(part[2] for part in current), sum(part[3] for part in current)
+
+    def flush() -> Chunk:
+        nonlocal current, carried, index
+        chunk = _build_chunk(index, current)
+        index += 1
+        kept = current[-overlap_sentences:] if overlap_sentences else []
+        # Overlap never carries half a chunk's worth of text forward on its own.
+        while kept and sum(part[2] for part in kept) >= max_words // 2:
+            kept = kept[1:]
+        current, carried = list(kept), len(kept)
+        return chunk
+
+    for sentence in iter_sentences(pieces):
+        normalized = _normalize(sentence.text)
+        if not normalized:
+            continue
+        sentence_words = len(normalized.split())
+        sentence_tokens = token_counter(normalized) if token_counter else 0
+
+        if sentence_words > max_words or (max_tokens is not None and sentence_tokens > max_tokens):
+            if len(current) > carried:
+                yield flush()
+            current, carried = [], 0
+            for piece in _hard_split(sentence, max_words, max_tokens, token_counter):
+                yield _build_chunk(index, [(piece, _normalize(piece.text), 0, 0)])
+                index += 1
+            continue
+
+        words, tokens = totals()
+        over_limit = words + sentence_words > max_words or (
+            max_tokens is not None and tokens + sentence_tokens > max_tokens
+        )
+        if over_limit and len(current) > carried:
+            yield flush()
+            words, tokens = totals()
+            if words + sentence_words > max_words or (max_tokens is not None and tokens + sentence_tokens > max_tokens):
+                current, carried = [], 0
+
+        current.append((sentence, normalized, sentence_words, sentence_tokens))
+
+        if words + sentence_words >= max_words:
+            yield flush()
+
+    if len(current) > carried:
+        yield flush()
+
+
+def sentence_spans(text: str) -> tuple[tuple[int, int], ...]:
+    """(start, end) offsets of the sentences of an already chunked `text`, for chunks stored without them."""
+    return tuple((sentence.start, sentence.end) for sentence in iter_sentences([text]))
+
+
+def iter_dom_text(tag) -> Iterator[str]:
+    """The strings of a BeautifulSoup tag, in the order `get_text()` joins them."""
+    yield from tag.strings
+
+
+def iter_file_text(path: str | Path, *, block_chars: int = 64 * 1024, encoding: str = "utf-8") -> Iterator[str]:
+    with open(path, encoding=encoding) as fh:
+        while True:
+            block = fh.read(block_chars)
+            if not block:
+                return
+            yield block
+
+
+class _TextExtractor(HTMLParser):
+    _SKIPPED = {"script", "style", "noscript", "template"}
+    _BLOCKS = {"p", "div", "section", "article", "li", "h1", "h2", "h3", "h4", "h5", "h6", "blockquote", "br", "tr"}
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.pending: list[str] = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs) -> None:
+        if tag in self._SKIPPED:
+            self._skip_depth += 1
+        elif tag in self._BLOCKS:
+            self.pending.append("\n\n")
+
+    def handle_endtag(self, tag) -> None:
+        if tag in self._SKIPPED and self._skip_depth:
+            self._skip_depth -= 1
+        elif tag in self._BLOCKS:
+            self.pending.append("\n\n")
+
+    def handle_data(self, data) -> None:
+        if not self._skip_depth:
+            self.pending.append(data)
+
+
+def iter_html_file_text(path: str | Path, *, block_chars: int = 64 * 1024, encoding: str = "utf-8") -> Iterator[str]:
+    """Visible text of an HTML file, parsed incrementally; block elements become paragraph breaks."""
+    parser = _TextExtractor()
+    for block in iter_file_text(path, block_chars=block_chars, encoding=encoding):
+        parser.feed(block)
+        yield from parser.pending
+        parser.pending.clear()
+    parser.close()
+    yield from parser.pending
+
+
+def iter_path_chunks(path: str | Path, **chunk_options) -> Iterator[Chunk]:
+    """Chunk a local HTML or plain-text/markdown file without loading it whole."""
+    suffix = Path(path).suffix.lower()
+    pieces = iter_html_file_text(path) if suffix in {".html", ".htm"} else iter_file_text(path)
+    return iter_chunks(pieces, **chunk_options)
+
+
+def iter_blocks(blocks: Sequence[str]) -> Iterator[str]:
+    """Treat every string as its own paragraph."""
+    for block in blocks:
+        yield block
+        yield "\n\n"
+
+
+def iter_embedded_chunks(
+    chunks: Iterable[Chunk],
+    *,
+    batch_size: int = 64,
+    encoder: Callable[..., list[list[float]]] | None = None,
+    model_name: str | None = None,
+) -> Iterator[tuple[Chunk, list[float]]]:
+    """Pair chunks with embeddings, one `encode_batch` call per `batch_size` chunks."""
+    if encoder is None:
+        from utils.embeddings import encode_batch as encoder
+
+    batch: list[Chunk] = []
+    for chunk in chunks:
+        batch.append(chunk)
+        if len(batch) >= batch_size:
+            yield from zip(batch, encoder([c.text for c in batch], batch_size=batch_size, model_name=model_name))
+            batch = []
+    if batch:
+        yield from zip(batch, encoder([c.text for c in batch], batch_size=batch_size, model_name=model_name))
+
+
+def _is_abbreviation(buffer: str, punct_end: int) -> bool:
+    if buffer[punct_end - 1] != ".":
+        return False
+    start = punct_end - 1
+    while start > 0 and (buffer[start - 1].isalpha() or buffer[start - 1] == "."):
+        start -= 1
+    word = buffer[start : punct_end - 1]
+    if not word:
+        return False
+    if len(word) == 1 and word.isupper():
+        return True  # an initial
+    return word.lower() in ABBREVIATIONS
+
+
+def _emit(buffer: str, start: int, end: int, offset: int) -> Iterator[Sentence]:
+    text = buffer[start:end]
+    stripped = text.strip()
+    if stripped:
+        lead = len(text) - len(text.lstrip())
+        yield Sentence(stripped, offset + start + lead, offset + start + lead + len(stripped))
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.replace("\x00", "").split())
+
+
+def _hard_split(
+    sentence: Sentence,
+    max_words: int,
+    max_tokens: int | None,
+    token_counter: Callable[[str], int] | None,
+) -> Iterator[Sentence]:
+    spans = [match.span() for match in re.finditer(r"\S+", sentence.text)]
+    start = 0
+    while start < len(spans):
+        end = min(start + max_words, len(spans))
+        if max_tokens is not None and token_counter is not None:
+            while end - start > 1 and token_counter(sentence.text[spans[start][0] : spans[end - 1][1]]) > max_tokens:
+                end -= 1
+        piece_start, piece_end = spans[start][0], spans[end - 1][1]
+        yield Sentence(
+            sentence.text[piece_start:piece_end],
+            sentence.start + piece_start,
+            sentence.start + piece_end,
+        )
+        start = end
+
+
+def _build_chunk(index: int, parts: Sequence[tuple[Sentence, str, int, int]]) -> Chunk:
+    spans = []
+    cursor = 0
+    for _, normalized, _, _ in parts:
+        spans.append((cursor, cursor + len(normalized)))
+        cursor += len(normalized) + 1
+    return Chunk(
+        index=index,
+        text=" ".join(normalized for _, normalized, _, _ in parts),
+        start=parts[0][0].start,
+        end=parts[-1][0].end,
+        sentence_spans=tuple(spans),
+    )
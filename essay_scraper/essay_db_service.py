@@ -1,65 +1,270 @@
+import hashlib
+from typing import Sequence
+
 import psycopg
 from db.db_pool import get_connection
-from utils.embeddings import encode_text
+from db.schema import column_exists
+from utils.config import INGESTION
+from utils.embeddings import encode_batch
+from utils.embedding_versions import get_writable_embedding_versions
 
+from .chunker import Chunk, sentence_spans
+from .essay_model import EssayResponse
 
 
-def save_essay_response_to_db(essay_response):
-    TABLE_NAME = "essay"
-    
-    COLUMNS = [
-        "essay_title", 
-        "essay_type", 
-        "source", 
-        "source_url", 
-        "chunk_text", 
-        "chunk_index", 
-        "embedding"
-    ]    
+def chunk_content_hash(chunk_text:str)->str:
+    # Same digest as encode(sha256(convert_to(chunk_text, 'UTF8')), 'hex') in Postgres.
+    return hashlib.sha256(chunk_text.encode("utf-8")).hexdigest()
 
 
-    INSERT_SQL = f"""
-        INSERT INTO {TABLE_NAME} ({', '.join(COLUMNS)})
-        VALUES ({', '.join(['%s'] * len(COLUMNS))})
+def ensure_essay_chunk_keys(conn)->None:
     """
+    One-time migration to the unique (source_url, chunk_index, content_hash)
+    key that makes re-runs idempotent: adds `content_hash`, backfills it for
+    rows from older runs and folds exact duplicates into their oldest copy,
+    moving their concept mappings onto it first. Run by
+    migrate_essay_schema.py, or by the first save against an unmigrated table.
+    """
+    with conn.cursor() as cur:
+        cur.execute("ALTER TABLE essay ADD COLUMN IF NOT EXISTS content_hash TEXT")
+        cur.execute("""
+            UPDATE essay
+            SET content_hash = encode(sha256(convert_to(chunk_text, 'UTF8')), 'hex')
+            WHERE content_hash IS NULL
+        """)
+        cur.execute("""
+            CREATE TEMP TABLE essay_duplicate ON COMMIT DROP AS
+            SELECT duplicate.id AS duplicate_id, min(original.id) AS original_id
+            FROM essay duplicate
+            JOIN essay original
+              ON original.id < duplicate.id
+             AND original.source_url = duplicate.source_url
+             AND original.chunk_index = duplicate.chunk_index
+             AND original.content_hash = duplicate.content_hash
+            GROUP BY duplicate.id
+        """)
+        cur.execute("""
+            INSERT INTO essay_concept (essay_id, concept_id)
+            SELECT DISTINCT d.original_id, ec.concept_id
+            FROM essay_concept ec
+            JOIN essay_duplicate d ON d.duplicate_id = ec.essay_id
+            WHERE NOT EXISTS (
+                SELECT 1 FROM essay_concept kept WHERE kept.essay_id = d.original_id AND kept.concept_id = ec.concept_id
+            )
+        """)
+        cur.execute("DELETE FROM essay_concept WHERE essay_id IN (SELECT duplicate_id FROM essay_duplicate)")
+        cur.execute("DELETE FROM essay WHERE id IN (SELECT duplicate_id FROM essay_duplicate)")
+        cur.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS essay_chunk_key_idx
+            ON essay (source_url, chunk_index, content_hash)
+        """)
 
-    if not essay_response or len(essay_response['chunks']) == 0:
-        print("No essays to insert.")
-        return
+
+def essay_chunk_keys_ready(conn)->bool:
+    with conn.cursor() as cur:
+        cur.execute("SELECT to_regclass('essay_chunk_key_idx') IS NOT NULL")
+        return bool(cur.fetchone()[0])
+
+
+def flatten_sentence_spans(spans) -> list[int]:
+    """[(s0, e0), (s1, e1)] -> [s0, e0, s1, e1], the layout of `essay.sentence_spans`."""
+    return [offset for span in spans for offset in span]
+
+
+def ensure_essay_sentence_spans(conn, batch_size:int = 500) -> int:
+    """
+    Add `sentence_spans`, the sentence offsets into `chunk_text` that search
+    snippets are cut along, and fill it for chunks stored without it.
+    """
+    backfilled, last_id = 0, 0
+    with conn.cursor() as cur:
+        cur.execute("ALTER TABLE essay ADD COLUMN IF NOT EXISTS sentence_spans INT[]")
+        while True:
+            cur.execute(
+                "SELECT id, chunk_text FROM essay WHERE sentence_spans IS NULL AND id > %s ORDER BY id LIMIT %s",
+                (last_id, batch_size),
+            )
+            pending = cur.fetchall()
+            if not pending:
+                break
+            cur.executemany(
+                "UPDATE essay SET sentence_spans = %s WHERE id = %s",
+                [(flatten_sentence_spans(sentence_spans(chunk_text)), essay_id) for essay_id, chunk_text in pending],
+            )
+            backfilled += len(pending)
+            last_id = pending[-1][0]
+    return backfilled
 
 
+def _chunk_row_values(chunk:Chunk | str) -> tuple[str, list[int]]:
+    if isinstance(chunk, Chunk):
+        return chunk.text, flatten_sentence_spans(chunk.sentence_spans)
+    return chunk, flatten_sentence_spans(sentence_spans(chunk))
 
-    data_to_insert = []
-    i = 0
-    for chunk in essay_response['chunks']:
-        row_tuple = (
-            essay_response['essay_title'],
-            essay_response['essay_type'].value,
-            essay_response['source'],
-            essay_response['source_url'],
-            chunk,
-            i,
-            encode_text(chunk)
-        )
-        i+=1
-        
-        data_to_insert.append(row_tuple)
 
+def save_essay_responses_to_db(essay_responses:Sequence[EssayResponse],
+                               embed_batch_size:int = INGESTION.embed_batch_size):
+    """
+    Upsert the chunks of many essays in one transaction.
 
+    A chunk is identified by (source_url, chunk_index, content_hash): unchanged
+    chunks are neither duplicated nor re-embedded, only their metadata is
+    refreshed. New chunks, and stored chunks missing a writable embedding
+    version, are embedded with one `encode_batch` call per version across all
+    essays. Stored chunks of a re-saved source_url that this run no longer
+    produces (the text or the chunking changed) are deleted, their concept
+    mappings moved to the nearest current chunk of the same essay.
+    """
+    rows = [
+        {
+            'essay_title': essay_response['essay_title'],
+            'essay_type': essay_response['essay_type'].value,
+            'source': essay_response['source'],
+            'source_url': essay_response['source_url'],
+            'chunk_text': chunk_text,
+            'chunk_index': chunk_index,
+            'content_hash': chunk_content_hash(chunk_text),
+            'sentence_spans': spans,
+        }
+        for essay_response in essay_responses if essay_response
+        for chunk_index, (chunk_text, spans) in enumerate(map(_chunk_row_values, essay_response['chunks']))
+    ]
+
+    if not rows:
+        print("No essays to insert.")
+        return
+
+    # Several essays can share a URL; a repeated key within one run is stored once.
+    rows = list({(row['source_url'], row['chunk_index'], row['content_hash']): row for row in rows}.values())
+    versions = get_writable_embedding_versions()
+    columns = [version.column for version in versions]
 
     try:
         with get_connection() as conn:
-            with conn.cursor() as cur:
-                cur.executemany(INSERT_SQL, data_to_insert)
+            if not essay_chunk_keys_ready(conn):
+                print("essay table has no chunk key yet; migrating it first (see migrate_essay_schema.py).")
+                ensure_essay_chunk_keys(conn)
                 conn.commit()
-                print(f"Successfully inserted/updated {cur.rowcount} essays using executemany.")
+            if not column_exists("essay", "sentence_spans", conn):
+                print("essay table has no sentence_spans yet; migrating it first (see migrate_essay_schema.py).")
+                ensure_essay_sentence_spans(conn)
+                conn.commit()
+            existing = _fetch_existing_chunks(conn, rows, columns)
+            saved_keys = {(row['source_url'], row['chunk_index'], row['content_hash']) for row in rows}
+            stale_ids = [stored['id'] for key, stored in existing.items() if key not in saved_keys]
+
+            new_rows = []
+            for row in rows:
+                stored = existing.get((row['source_url'], row['chunk_index'], row['content_hash']))
+                if stored is None:
+                    row['missing'] = list(columns)
+                    new_rows.append(row)
+                else:
+                    row['id'] = stored['id']
+                    row['missing'] = [column for column in columns if not stored[column]]
+
+            for version in versions:
+                pending = [row for row in rows if version.column in row['missing']]
+                if not pending:
+                    continue
+                vectors = encode_batch([row['chunk_text'] for row in pending],
+                                       batch_size=embed_batch_size, model_name=version.model_name)
+                for row, vector in zip(pending, vectors):
+                    row[version.column] = vector
+
+            with conn.cursor() as cur:
+                _insert_new_chunks(cur, new_rows, columns)
+                _update_existing_chunks(cur, [row for row in rows if 'id' in row], columns)
+                _delete_stale_chunks(cur, stale_ids)
+            conn.commit()
+
     except psycopg.Error as e:
         conn.rollback()
-        print(f"Database error during executemany batch insert: {e}")
-        raise        
+        print(f"Database error during bulk essay upsert: {e}")
+        raise
+
+    re_embedded = sum(1 for row in rows if 'id' in row and row['missing'])
+    print(f"Essay chunks: {len(new_rows)} inserted, {len(rows) - len(new_rows)} unchanged "
+          f"({re_embedded} given missing embedding versions), {len(stale_ids)} stale removed "
+          f"across {len(essay_responses)} essays.")
+
 
+def save_essay_response_to_db(essay_response:EssayResponse):
+    save_essay_responses_to_db([essay_response])
 
 
+def _fetch_existing_chunks(conn, rows, columns)->dict:
+    source_urls = sorted({row['source_url'] for row in rows})
+    vector_flags = ", ".join(f"{column} IS NOT NULL" for column in columns)
+    existing = {}
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            SELECT id, source_url, chunk_index, content_hash, {vector_flags}
+            FROM essay
+            WHERE source_url = ANY(%s)
+        """, (source_urls,))
+        for essay_id, source_url, chunk_index, content_hash, *flags in cur.fetchall():
+            existing[(source_url, chunk_index, content_hash)] = {'id': essay_id, **dict(zip(columns, flags))}
+    return existing
+
+
+def _insert_new_chunks(cur, new_rows, columns)->None:
+    if not new_rows:
+        return
+    COLUMNS = ["essay_title", "essay_type", "source", "source_url", "chunk_text", "chunk_index", "content_hash",
+               "sentence_spans"] + columns
+    INSERT_SQL = f"""
+        INSERT INTO essay ({', '.join(COLUMNS)})
+        VALUES ({', '.join(['%s'] * len(COLUMNS))})
+        ON CONFLICT (source_url, chunk_index, content_hash) DO NOTHING
+    """
+    cur.executemany(INSERT_SQL, [tuple(row[column] for column in COLUMNS) for row in new_rows])
+
+
+def _update_existing_chunks(cur, stored_rows, columns)->None:
+    if not stored_rows:
+        return
+    cur.executemany("""
+        UPDATE essay
+        SET essay_title = %s, essay_type = %s, source = %s
+        WHERE id = %s
+          AND (essay_title, essay_type, source) IS DISTINCT FROM (%s, %s, %s)
+    """, [
+        (row['essay_title'], row['essay_type'], row['source'], row['id'],
+         row['essay_title'], row['essay_type'], row['source'])
+        for row in stored_rows
+    ])
+    for column in columns:
+        payload = [(row[column], row['id']) for row in stored_rows if column in row['missing']]
+        if payload:
+            cur.executemany(f"UPDATE essay SET {column} = %s::vector WHERE id = %s", payload)
+
+
+def _delete_stale_chunks(cur, stale_ids)->None:
+    if not stale_ids:
+        return
+    # Concepts of a replaced chunk move to the closest chunk_index still stored for the same essay.
+    cur.execute("""
+        INSERT INTO essay_concept (essay_id, concept_id)
+        SELECT DISTINCT replacement.id, ec.concept_id
+        FROM essay_concept ec
+        JOIN essay stale ON stale.id = ec.essay_id
+        JOIN LATERAL (
+            SELECT current.id
+            FROM essay current
+            WHERE current.source_url = stale.source_url
+              AND current.id <> ALL(%(stale)s)
+            ORDER BY abs(current.chunk_index - stale.chunk_index), current.chunk_index
+            LIMIT 1
+        ) replacement ON true
+        WHERE ec.essay_id = ANY(%(stale)s)
+          AND NOT EXISTS (
+              SELECT 1 FROM essay_concept kept WHERE kept.essay_id = replacement.id AND kept.concept_id = ec.concept_id
+          )
+    """, {'stale': stale_ids})
+    cur.execute("DELETE FROM essay_concept WHERE essay_id = ANY(%s)", (stale_ids,))
+    cur.execute("DELETE FROM essay WHERE id = ANY(%s)", (stale_ids,))
+
 
 """
 CREATE TABLE essay (
@@ -68,10 +273,13 @@ CREATE TABLE essay (
     -- logical grouping
     essay_title     TEXT NOT NULL,     -- e.g. "Dutch Still Life Painting"
     essay_type      TEXT NOT NULL,     -- 'movement' | 'technique' | 'genre'
-    
+
     -- chunk content
     chunk_index     INT NOT NULL,      -- order within essay
     chunk_text      TEXT NOT NULL,
+    content_hash    TEXT,              -- sha256(chunk_text); added by ensure_essay_chunk_keys
+    sentence_spans  INT[],             -- flattened (start, end) sentence offsets into chunk_text;
+                                       -- added by ensure_essay_sentence_spans
 
     -- search
     searchable_tsv  TSVECTOR NOT NULL,
@@ -81,4 +289,6 @@ CREATE TABLE essay (
     source          TEXT,              -- e.g. 'Met Essay', 'ArtHistory.org'
     source_url      TEXT
 );
+
+CREATE UNIQUE INDEX essay_chunk_key_idx ON essay (source_url, chunk_index, content_hash);
 """
@@ -2,6 +2,8 @@
 from enum import Enum
 from typing import TypedDict
 
+from .chunker import Chunk
+
 
 class EssayCategory(str, Enum):
     MOVEMENT = "movement"
@@ -9,7 +11,7 @@ class EssayCategory(str, Enum):
     GENRE = "genre"
 
 class EssayResponse(TypedDict):
-    chunks:list[str]
+    chunks:list[Chunk | str]  # plain strings get their sentence spans recomputed
     essay_type:EssayCategory
     essay_title:str
     source:str
@@ -1,5 +1,9 @@
 """Utilities for loading curated essays into the database."""
 
+from concurrent.futures import ThreadPoolExecutor
+import time
+from typing import Callable
+
 from .movements.dutch_golden_age import (
     get_dutch_history_data,
     get_genre_data,
@@ -7,7 +11,11 @@ from .movements.dutch_golden_age import (
     get_technique_data_2,
     get_materials_data,
 )
-from .essay_db_service import save_essay_response_to_db
+from .essay_db_service import save_essay_responses_to_db
+from .essay_model import EssayResponse
+from utils.config import INGESTION
+from utils.embedding_cache import describe_embedding_cache
+from utils.http_cache import get_http_cache
 
 from .movements.baroque import get_movement_essays
 
@@ -15,45 +23,40 @@ from .movements.impressionism import get_impressionism_essays
 
 from .movements.cubism import get_cubism_essays
 
+# Every source loader returns one essay or a list of essays.
+ESSAY_SOURCES: list[Callable[[], EssayResponse | list[EssayResponse]]] = [
+    get_dutch_history_data,
+    get_genre_data,
+    get_technique_data,
+    get_technique_data_2,
+    get_materials_data,
+    get_movement_essays,
+    get_impressionism_essays,
+    get_cubism_essays,
+]
 
-def get_dutch_golden_era_essays_and_save_to_db() -> None:
-    dutch_history_response = get_dutch_history_data()
-    save_essay_response_to_db(dutch_history_response)
-
-    genre_data_response = get_genre_data()
-    save_essay_response_to_db(genre_data_response)
-
-    technique_data_response = get_technique_data()
-    save_essay_response_to_db(technique_data_response)
-
-    technique_data_2_response = get_technique_data_2()
-    save_essay_response_to_db(technique_data_2_response)
-
-    materials_data_response = get_materials_data()
-    save_essay_response_to_db(materials_data_response)
-
-def get_baroque_essays_and_save_to_db() ->None :
-    baroque_essay_responses = get_movement_essays()
-    for baroque_essay_res in baroque_essay_responses:
-        save_essay_response_to_db(baroque_essay_res)
 
+def collect_essays(sources=ESSAY_SOURCES, workers:int = INGESTION.essay_fetch_workers) -> list[EssayResponse]:
+    """Fetch and chunk every source concurrently, keeping the source order."""
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="essay-fetch") as executor:
+        results = list(executor.map(lambda source: source(), sources))
 
-def get_impressionism_essay_and_save_to_db()->None:
-    impressionism_essay_responses = get_impressionism_essays()
-    for impressionism_essay_response in impressionism_essay_responses:
-        save_essay_response_to_db(impressionism_essay_response)
+    essays: list[EssayResponse] = []
+    for result in results:
+        essays.extend(result if isinstance(result, list) else [result])
+    return essays
 
-def get_cubism_essay_and_save_to_db()->None:
-    cubism_essay_responses = get_cubism_essays()
-    for cubism_essay_res in cubism_essay_responses:
-        save_essay_response_to_db(cubism_essay_res)
 
 def main() -> None:
     """CLI entry point to ingest all curated essays."""
-    get_dutch_golden_era_essays_and_save_to_db()
-    get_baroque_essays_and_save_to_db()
-    get_impressionism_essay_and_save_to_db()
-    get_cubism_essay_and_save_to_db()
+    started = time.perf_counter()
+    essays = collect_essays()
+    fetched = time.perf_counter()
+    save_essay_responses_to_db(essays)
+    print(f"{len(essays)} essays: fetched in {fetched - started:.2f}s, "
+          f"embedded and saved in {time.perf_counter() - fetched:.2f}s")
+    print(get_http_cache().stats)
+    print(describe_embedding_cache())
 
 
 if __name__ == "__main__":
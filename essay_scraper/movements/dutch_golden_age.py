@@ -1,7 +1,4 @@
-import requests
-from bs4 import BeautifulSoup
-
-from essay_scraper.movements.common import divide_into_managable_chunks
+from essay_scraper.movements.common import divide_into_managable_chunks, get_soup
 from essay_scraper.essay_model import EssayCategory, EssayResponse
 
 
@@ -9,10 +6,7 @@ from essay_scraper.essay_model import EssayCategory, EssayResponse
 def get_dutch_history_data()->EssayResponse:
     source_url = 'https://rauantiques.com/blogs/canvases-carats-and-curiosities/dutch-golden-age-dawn-new-art-market'
 
-    response = requests.get(source_url)
-    response.raise_for_status()
-
-    soup = BeautifulSoup(response.text, 'html.parser')
+    soup = get_soup(source_url)
 
     paragraphs = soup.select('.rte p')
 
@@ -33,10 +27,7 @@ Get Information about the styles popularized in the 16th - 17th Century, Can be
 """
 def get_technique_data()->EssayResponse:
     source_url = 'http://theartstory.org/definition/chiaroscuro-tenebrism-sfumato/'
-    response = requests.get(source_url)
-    response.raise_for_status()
-
-    soup = BeautifulSoup(response.text, 'html.parser')
+    soup = get_soup(source_url)
 
     summary_para = soup.find(class_='article-text summary-text')
     chunks = []
@@ -65,9 +56,7 @@ Has details about brushwork and technical details about the dutch artist' approa
 def get_technique_data_2()->EssayResponse:
     source_url = 'https://fiveable.me/art-in-the-dutch-golden-age/unit-13'
 
-    response = requests.get(source_url)
-    response.raise_for_status()
-    soup = BeautifulSoup(response.text, 'html.parser')
+    soup = get_soup(source_url)
     listOfDetails = soup.find_all(class_='MuiBox-root mui-19idom')
 
     chunks = []
@@ -82,10 +71,7 @@ Describes what materials were used
 def get_materials_data()->EssayResponse:
     source_url = 'https://fiveable.me/art-in-the-dutch-golden-age/unit-7'
 
-    response = requests.get(source_url)
-    response.raise_for_status()
-
-    soup = BeautifulSoup(response.text, 'html.parser')
+    soup = get_soup(source_url)
     listOfDetails = soup.find_all(class_='MuiBox-root mui-19idom')
     chunks = []
 
@@ -101,10 +87,7 @@ def get_materials_data()->EssayResponse:
 def get_genre_data()->EssayResponse:
     source_url = 'https://www.theartstory.org/movement/dutch-golden-age/'
 
-    response = requests.get(source_url)
-    response.raise_for_status()
-
-    soup = BeautifulSoup(response.text, 'html.parser')
+    soup = get_soup(source_url)
 
     articles = soup.find_all(class_='article-text')
 
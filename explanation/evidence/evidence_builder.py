@@ -1,9 +1,17 @@
 from collections import defaultdict
 from typing import Any
-from concept_data_pipeline.artwork_concept.prototypes import ConceptMatch, compute_artwork_concept_similarities
+from concept_data_pipeline.artwork_concept.prototypes import (
+    ConceptMatch,
+    ConceptPrototypeSet,
+    artwork_concept_similarities_for_block,
+    compute_artwork_concept_similarities,
+)
+from concept_data_pipeline.artwork_concept.similarity import lookup_artwork_concept_similarities
 from explanation.evidence.evidence_model import ArtworkEvidence, EvidenceBundle
+from search.hybrid_retriever import CandidateEmbeddings
 from search.search_model import SearchContext
 from db.db_pool import get_connection
+from utils.embedding_versions import get_active_embedding_version
 
 MAPPING_CONFIDENCE_THRESHOLD = 0.6
 
@@ -25,11 +33,35 @@ Did not choose to filter based on essay chunks because:
 Evidence Bundles are allowed to be purely visual when textual evidence does not exist — but they must never be purely textual.
 """
 
-def get_bundled_artworks_per_concept(artworks:list[dict], concepts:tuple[ConceptMatch])->defaultdict[Any, list[ArtworkEvidence]]:
+def get_bundled_artworks_per_concept(artworks:list[dict], concepts:tuple[ConceptMatch],
+                                     artwork_embeddings: CandidateEmbeddings | None = None,
+                                     concept_prototypes: ConceptPrototypeSet | None = None)->defaultdict[Any, list[ArtworkEvidence]]:
     artwork_ids : list[int] = [artwork["id"] for artwork in artworks]
+    concept_ids : list[int] = [concept.concept_id for concept in concepts]
+
+    embedding_column = (concept_prototypes.embedding_column if concept_prototypes is not None
+                        else get_active_embedding_version().column)
+    # Offline-materialized similarities: one indexed lookup for the result ids.
+    artwork_concept_similarities, covered_concept_ids, scored_artwork_ids = lookup_artwork_concept_similarities(
+        artwork_ids, concept_ids, embedding_column=embedding_column
+    )
+    missing_concept_ids = [concept_id for concept_id in concept_ids if concept_id not in covered_concept_ids]
+    if missing_concept_ids:
+        artwork_concept_similarities += _compute_similarities(
+            artwork_ids, missing_concept_ids, artwork_embeddings, concept_prototypes
+        )
+    # Artworks ingested after the last refresh have no rows even for covered concepts.
+    covered = [concept_id for concept_id in concept_ids if concept_id in covered_concept_ids]
+    unscored_artwork_ids = [artwork_id for artwork_id in artwork_ids if artwork_id not in scored_artwork_ids]
+    if covered and unscored_artwork_ids:
+        artwork_concept_similarities += _compute_similarities(
+            unscored_artwork_ids, covered, artwork_embeddings, concept_prototypes
+        )
+
+    artwork_position = {artwork_id: position for position, artwork_id in enumerate(artwork_ids)}
+    concept_position = {concept_id: position for position, concept_id in enumerate(concept_ids)}
+    artwork_concept_similarities.sort(key=lambda row: (artwork_position[row[0]], concept_position[row[1]]))
 
-    artwork_concept_similarities = compute_artwork_concept_similarities(artwork_ids=artwork_ids, concept_ids=[concept.concept_id for concept in concepts])
-    
     concept_artwork_support = defaultdict(list[ArtworkEvidence])
 
     for artwork_concept_similarity in artwork_concept_similarities:
@@ -38,6 +70,29 @@ def get_bundled_artworks_per_concept(artworks:list[dict], concepts:tuple[Concept
     return concept_artwork_support
 
 
+def _compute_similarities(artwork_ids: list[int], concept_ids: list[int],
+                          artwork_embeddings: CandidateEmbeddings | None,
+                          concept_prototypes: ConceptPrototypeSet | None) -> list[tuple[int, int, float]]:
+    """Query-time fallback for the concepts and artworks the similarity table does not cover yet."""
+    if _same_embedding_space(artwork_embeddings, concept_prototypes):
+        # Vectors the retriever and concept detection already loaded: one matmul, no database round trip.
+        block_ids, vectors = artwork_embeddings.rows_for(artwork_ids)
+        return artwork_concept_similarities_for_block(
+            artwork_ids=block_ids, vectors=vectors, matrix=concept_prototypes.matrix, concept_ids=concept_ids
+        )
+    return compute_artwork_concept_similarities(artwork_ids=artwork_ids, concept_ids=concept_ids)
+
+
+def _same_embedding_space(artwork_embeddings: CandidateEmbeddings | None,
+                          concept_prototypes: ConceptPrototypeSet | None) -> bool:
+    # The active embedding version can flip between retrieval and detection; mixed spaces must not be compared.
+    return (
+        artwork_embeddings is not None
+        and concept_prototypes is not None
+        and artwork_embeddings.embedding_column == concept_prototypes.embedding_column
+    )
+
+
 def calculate_evidence_bundle_confidence(concept_artwork_support: list[ArtworkEvidence])->float:
     sum_of_artwork_mapping_conf:float = 0.0
 
@@ -53,7 +108,11 @@ def build_evidence_bundle(search_context: SearchContext)->list[EvidenceBundle]:
     artworks:list[dict] = search_context.artworks
     concepts: tuple[ConceptMatch] =  search_context.detected_concepts
 
-    concept_artwork_support = get_bundled_artworks_per_concept(artworks, concepts)
+    concept_artwork_support = get_bundled_artworks_per_concept(
+        artworks, concepts,
+        artwork_embeddings=search_context.artwork_embeddings,
+        concept_prototypes=search_context.concept_prototypes,
+    )
     result:list[EvidenceBundle] = []
 
 
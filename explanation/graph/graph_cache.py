@@ -0,0 +1,208 @@
+"""
+Explanation subgraphs, cached by what they are built from.
+
+Below the query node an explanation graph depends only on the detected
+concept ids, the result's artwork ids, the concept prototypes and the
+artwork/concept mappings; not on the query text or on how strongly the
+query matched each concept. That part (concept, bundle and artwork nodes,
+their edges and the validation verdict) is cached under
+
+    (sorted concept ids, sorted artwork ids, prototype version)
+
+and each request only re-attaches its own query node and query -> concept
+edges, with supporting artworks put back in its own result order. The
+verdict covers the cached layers alone (see `anchored_graph`), so no one
+request's query edges decide it for the others.
+
+Entries are evicted least recently used first. Every entry belongs to one
+(prototype version, mapping generation) pair; a request that sees a
+different pair drops the whole cache, since prototypes and mappings change
+for every concept at once.
+"""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+import threading
+from typing import Any, Hashable, Sequence
+
+from concept_data_pipeline.artwork_concept.prototypes import ConceptMatch
+from utils.config import EXPLANATIONS
+
+from .graph_model import GraphEdge, GraphNode, LabeledGraphNode
+
+QUERY_NODE_ID = "q:0"
+
+
+@dataclass(frozen=True)
+class SubgraphKey:
+    concept_ids: tuple[int, ...]
+    artwork_ids: tuple[int, ...]
+    prototype_version: str
+
+    @classmethod
+    def of(cls, concept_ids: Sequence[int], artwork_ids: Sequence[int], prototype_version: str) -> "SubgraphKey":
+        return cls(tuple(sorted(set(concept_ids))), tuple(sorted(set(artwork_ids))), prototype_version)
+
+
+@dataclass(frozen=True)
+class CachedBundle:
+    concept_node: LabeledGraphNode
+    concept_edge: GraphEdge  # concept -> bundle
+    support_edges: tuple[tuple[int, GraphEdge], ...]  # (artwork_id, bundle -> artwork)
+
+
+@dataclass
+class CachedSubgraph:
+    nodes: tuple[GraphNode, ...]  # everything but the query node
+    bundles: tuple[CachedBundle, ...]
+    valid: bool | None = None  # None until a request validates `anchored_graph`
+
+    @classmethod
+    def from_graph(cls, nodes: dict[str, Any], edges: Sequence[GraphEdge]) -> "CachedSubgraph":
+        """Split a graph from build_explanation_graph into the cacheable part and its query layer."""
+        by_concept: dict[str, GraphEdge] = {}
+        support: dict[str, list[tuple[int, GraphEdge]]] = {}
+        for edge in edges:
+            if edge.edge_type == "concept_forms_bundle":
+                by_concept[edge.from_node] = edge
+            elif edge.from_node != QUERY_NODE_ID:
+                support.setdefault(edge.from_node, []).append((nodes[edge.to_node].ref_id, edge))
+
+        bundles = tuple(
+            CachedBundle(
+                concept_node=nodes[concept_node_id],
+                concept_edge=concept_edge,
+                support_edges=tuple(support.get(concept_edge.to_node, ())),
+            )
+            for concept_node_id, concept_edge in by_concept.items()
+        )
+        return cls(
+            nodes=tuple(node for node_id, node in nodes.items() if node_id != QUERY_NODE_ID),
+            bundles=bundles,
+        )
+
+    def attach_query(self, query: str, detected_concepts: Sequence[ConceptMatch],
+                     artwork_ids: Sequence[int]) -> tuple[list[GraphNode], list[GraphEdge], list[GraphEdge]]:
+        """Nodes and edges of the full graph for one request, plus its query -> concept edges on their own."""
+        concept_confidence = {c.concept_id: c.confidence_score for c in detected_concepts}
+        return self._assemble(query, concept_confidence, artwork_ids)
+
+    def anchored_graph(self) -> tuple[list[GraphNode], list[GraphEdge]]:
+        """The cached layers under a placeholder query whose edges all carry 1.0: what the verdict is about."""
+        nodes, edges, _ = self._assemble("", {bundle.concept_node.ref_id: 1.0 for bundle in self.bundles}, ())
+        return nodes, edges
+
+    def _assemble(self, query: str, concept_confidence: dict[int, float],
+                  artwork_ids: Sequence[int]) -> tuple[list[GraphNode], list[GraphEdge], list[GraphEdge]]:
+        artwork_position = {artwork_id: position for position, artwork_id in enumerate(artwork_ids)}
+
+        nodes: list[GraphNode] = [LabeledGraphNode(label=query, node_id=QUERY_NODE_ID, node_type="query", ref_id=None)]
+        nodes.extend(self.nodes)
+        edges: list[GraphEdge] = []
+        query_edges: list[GraphEdge] = []
+        for bundle in self.bundles:
+            query_edge = GraphEdge(from_node=QUERY_NODE_ID,
+                                   to_node=bundle.concept_node.node_id,
+                                   edge_type="query_supports_concept",
+                                   confidence=concept_confidence.get(bundle.concept_node.ref_id),
+                                   provenance="v2_detected_concepts")
+            query_edges.append(query_edge)
+            edges.append(query_edge)
+            edges.append(bundle.concept_edge)
+            edges.extend(edge for _, edge in sorted(
+                bundle.support_edges, key=lambda support: artwork_position.get(support[0], len(artwork_position))
+            ))
+        return nodes, edges, query_edges
+
+
+@dataclass
+class GraphCacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    invalidations: int = 0
+    entries: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def as_dict(self) -> dict:
+        return {**asdict(self), "hit_rate": round(self.hit_rate, 4)}
+
+    def __str__(self) -> str:
+        return (
+            f"explanation graph cache: {self.entries} entries, {self.hits} hits, {self.misses} misses "
+            f"({self.hit_rate:.1%} hit rate), {self.evictions} evicted, {self.invalidations} invalidations"
+        )
+
+
+class ExplanationGraphCache:
+    """Thread-safe LRU of SubgraphKey -> CachedSubgraph, tied to one (prototype version, mapping generation)."""
+
+    def __init__(self, max_entries: int = EXPLANATIONS.graph_cache_size) -> None:
+        self.max_entries = max_entries
+        self.stats = GraphCacheStats()
+        self._entries: OrderedDict[SubgraphKey, CachedSubgraph] = OrderedDict()
+        self._generation: Hashable | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def get(self, key: SubgraphKey, generation: Hashable) -> CachedSubgraph | None:
+        with self._lock:
+            self._check_generation(generation)
+            subgraph = self._entries.get(key)
+            if subgraph is None:
+                self.stats.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            return subgraph
+
+    def put(self, key: SubgraphKey, generation: Hashable, subgraph: CachedSubgraph) -> None:
+        with self._lock:
+            self._check_generation(generation)
+            self._entries[key] = subgraph
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats.evictions += 1
+            self.stats.entries = len(self._entries)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._drop()
+
+    def snapshot(self) -> GraphCacheStats:
+        with self._lock:
+            return GraphCacheStats(**asdict(self.stats))
+
+    def _check_generation(self, generation: Hashable) -> None:
+        if generation != self._generation:
+            if self._generation is not None:
+                self._drop()
+            self._generation = generation
+
+    def _drop(self) -> None:
+        if self._entries:
+            self._entries.clear()
+            self.stats.invalidations += 1
+        self.stats.entries = 0
+
+
+_graph_cache: ExplanationGraphCache | None = None
+_graph_cache_lock = threading.Lock()
+
+
+def get_graph_cache() -> ExplanationGraphCache:
+    global _graph_cache
+    with _graph_cache_lock:
+        if _graph_cache is None:
+            _graph_cache = ExplanationGraphCache()
+        return _graph_cache
@@ -2,9 +2,12 @@
 
 from __future__ import annotations
 
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import Any, Dict, List, Sequence
 import math
+import random
+import threading
+from typing import Any, Dict, List, Sequence
 
 from explanation.graph.graph_model import GraphEdge, GraphNode
 
@@ -52,6 +55,27 @@ def _mean(xs: Sequence[float]) -> float | None:
     return sum(xs) / len(xs)
 
 
+SUPPORT_EDGE_TYPES = {"bundle_supported_by_artwork", "bundle_supported_by_essay"}
+
+
+@dataclass(slots=True)
+class _NodeTally:
+    """Per-node edge counts gathered in the single edge pass."""
+
+    node: GraphNode
+    involved: bool = False
+    concept_forms_bundle_in: int = 0
+    concept_forms_bundle_out: int = 0
+    query_supports_concept_in: int = 0
+    query_supports_concept_out: int = 0
+    support_in: int = 0
+    support_out: int = 0
+    support_confidence_sum: float = 0.0
+    support_confidence_count: int = 0
+    in_degree: int = 0
+    successors: List[str] | None = None
+
+
 def validate_graph_objects(
     nodes: Sequence[GraphNode],
     edges: Sequence[GraphEdge],
@@ -61,14 +85,21 @@ def validate_graph_objects(
     confidence_eps: float = 1e-6,
     bundle_confidence_eps: float = 1e-4,
 ) -> ValidationResult:
-    """Validate a graph expressed as GraphNode/GraphEdge objects."""
+    """
+    Validate a graph expressed as GraphNode/GraphEdge objects.
+
+    Linear time: one pass over the nodes, one over the edges (tallying what
+    the per-node rules need), one over the tallies, and an iterative
+    topological sort for the cycle check.
+    """
     errors: List[str] = []
     warnings: List[str] = []
 
     # Index nodes
-    nodes_by_id: Dict[str, GraphNode] = {}
+    tallies: Dict[str, _NodeTally] = {}
+    query_node_ids: List[str] = []
     for node in nodes:
-        if node.node_id in nodes_by_id:
+        if node.node_id in tallies:
             errors.append(f"Duplicate node_id: '{node.node_id}'.")
             continue
         if node.node_type not in ALLOWED_NODE_TYPES:
@@ -76,39 +107,42 @@ def validate_graph_objects(
                 f"Node '{node.node_id}' has invalid node_type '{node.node_type}'. "
                 f"Allowed: {sorted(ALLOWED_NODE_TYPES)}"
             )
-        nodes_by_id[node.node_id] = node
-
-    node_ids = set(nodes_by_id.keys())
-    query_nodes = [nid for nid, n in nodes_by_id.items() if n.node_type == "query"]
-    if len(query_nodes) != 1:
-        errors.append(f"Graph must contain exactly 1 query node; found {len(query_nodes)}.")
-    query_node_id = query_nodes[0] if len(query_nodes) == 1 else None
+        if node.node_type == "query":
+            query_node_ids.append(node.node_id)
+        tallies[node.node_id] = _NodeTally(node=node)
 
-    involved_node_ids = set()
-    incoming: Dict[str, List[GraphEdge]] = {nid: [] for nid in node_ids}
-    outgoing: Dict[str, List[GraphEdge]] = {nid: [] for nid in node_ids}
+    if len(query_node_ids) != 1:
+        errors.append(f"Graph must contain exactly 1 query node; found {len(query_node_ids)}.")
+    query_node_id = query_node_ids[0] if len(query_node_ids) == 1 else None
 
+    constrained_edge_types = EDGE_TYPE_CONSTRAINTS
     for i, edge in enumerate(edges):
         if edge.edge_type not in ALLOWED_EDGE_TYPES:
             errors.append(
                 f"Edge[{i}] has invalid edge_type '{edge.edge_type}'. "
                 f"Allowed: {sorted(ALLOWED_EDGE_TYPES)}"
             )
-        if edge.from_node not in node_ids:
+        source = tallies.get(edge.from_node)
+        if source is None:
             errors.append(f"Edge[{i}] has invalid from_node '{edge.from_node}'.")
             continue
-        if edge.to_node not in node_ids:
+        target = tallies.get(edge.to_node)
+        if target is None:
             errors.append(f"Edge[{i}] has invalid to_node '{edge.to_node}'.")
             continue
 
-        involved_node_ids.update([edge.from_node, edge.to_node])
-        incoming[edge.to_node].append(edge)
-        outgoing[edge.from_node].append(edge)
-
-        if edge.edge_type in EDGE_TYPE_CONSTRAINTS:
-            expected_from, expected_to = EDGE_TYPE_CONSTRAINTS[edge.edge_type]
-            actual_from = nodes_by_id[edge.from_node].node_type
-            actual_to = nodes_by_id[edge.to_node].node_type
+        source.involved = target.involved = True
+        if source.successors is None:
+            source.successors = [edge.to_node]
+        else:
+            source.successors.append(edge.to_node)
+        target.in_degree += 1
+
+        expected = constrained_edge_types.get(edge.edge_type)
+        if expected is not None:
+            expected_from, expected_to = expected
+            actual_from = source.node.node_type
+            actual_to = target.node.node_type
             if actual_from != expected_from or actual_to != expected_to:
                 errors.append(
                     f"Edge[{i}] '{edge.edge_type}' must connect {expected_from}→{expected_to}, "
@@ -117,14 +151,29 @@ def validate_graph_objects(
 
         # Confidence checks
         conf = edge.confidence
+        conf_is_number = _is_number(conf)
         if conf is None:
             errors.append(f"Edge[{i}] '{edge.edge_type}' missing confidence.")
-        elif not _is_number(conf) or not (-confidence_eps <= float(conf) <= 1.0 + confidence_eps):
+        elif not conf_is_number or not (-confidence_eps <= float(conf) <= 1.0 + confidence_eps):
             errors.append(f"Edge[{i}] '{edge.edge_type}' confidence out of range [0,1]: {conf}.")
-        if edge.edge_type == "concept_forms_bundle" and conf is not None and abs(float(conf) - 1.0) > confidence_eps:
-            errors.append(
-                f"Edge[{i}] 'concept_forms_bundle' confidence must be 1.0; got {conf}."
-            )
+
+        if edge.edge_type == "concept_forms_bundle":
+            # Non-numeric confidences were already reported as out of range above.
+            if isinstance(conf, (int, float)) and abs(float(conf) - 1.0) > confidence_eps:
+                errors.append(
+                    f"Edge[{i}] 'concept_forms_bundle' confidence must be 1.0; got {conf}."
+                )
+            source.concept_forms_bundle_out += 1
+            target.concept_forms_bundle_in += 1
+        elif edge.edge_type == "query_supports_concept":
+            source.query_supports_concept_out += 1
+            target.query_supports_concept_in += 1
+        elif edge.edge_type in SUPPORT_EDGE_TYPES:
+            source.support_out += 1
+            target.support_in += 1
+            if conf_is_number:
+                source.support_confidence_sum += float(conf)
+                source.support_confidence_count += 1
 
         prov = edge.provenance
         if prov is None or not isinstance(prov, str) or not prov:
@@ -138,99 +187,163 @@ def validate_graph_objects(
                 f"Edge[{i}] provenance '{prov}' is non-standard."
             )
 
-    if require_no_orphans:
-        for nid, node in nodes_by_id.items():
-            if node.node_type == "query":
-                continue
-            if nid not in involved_node_ids:
-                errors.append(
-                    f"Orphan node '{nid}' (node_type={node.node_type}) has no incident edges."
-                )
-
-    bundle_nodes = [nid for nid, n in nodes_by_id.items() if n.node_type == "bundle"]
-    for b in bundle_nodes:
-        inc_cf = [e for e in incoming[b] if e.edge_type == "concept_forms_bundle"]
-        if len(inc_cf) != 1:
-            errors.append(
-                f"Bundle '{b}' must have exactly 1 incoming 'concept_forms_bundle' edge; found {len(inc_cf)}."
+    # One pass over the nodes; per-rule lists keep the errors grouped by rule.
+    orphan_errors: List[str] = []
+    bundle_errors: List[str] = []
+    concept_errors: List[str] = []
+    evidence_errors: List[str] = []
+    for nid, tally in tallies.items():
+        node_type = tally.node.node_type
+        if require_no_orphans and node_type != "query" and not tally.involved:
+            orphan_errors.append(
+                f"Orphan node '{nid}' (node_type={node_type}) has no incident edges."
             )
-        out_support = [
-            e for e in outgoing[b]
-            if e.edge_type in {"bundle_supported_by_artwork", "bundle_supported_by_essay"}
-        ]
-        if len(out_support) < 1:
-            errors.append(
-                f"Bundle '{b}' must have at least 1 outgoing support edge to artwork/essay."
-            )
-        bnode = nodes_by_id[b]
-        bconf = getattr(bnode, "confidence", None)
-        if bconf is None:
-            errors.append(f"Bundle node '{b}' missing 'confidence'.")
-        elif not _is_number(bconf):
-            errors.append(f"Bundle node '{b}' has non-numeric confidence: {bconf!r}.")
-        else:
-            edge_confs = [float(e.confidence) for e in out_support if _is_number(e.confidence)]
-            m = _mean(edge_confs)
-            if m is not None and abs(float(bconf) - m) > bundle_confidence_eps:
-                errors.append(
-                    f"Bundle '{b}' confidence ({float(bconf):.6f}) must equal mean of its "
-                    f"support edge confidences ({m:.6f})."
-                )
 
-    concept_nodes = [nid for nid, n in nodes_by_id.items() if n.node_type == "concept"]
-    for c in concept_nodes:
-        inc_qc = [e for e in incoming[c] if e.edge_type == "query_supports_concept"]
-        out_cb = [e for e in outgoing[c] if e.edge_type == "concept_forms_bundle"]
-        if len(inc_qc) != 1:
-            errors.append(
-                f"Concept '{c}' must have exactly 1 incoming 'query_supports_concept' edge; found {len(inc_qc)}."
-            )
-        if len(out_cb) != 1:
-            errors.append(
-                f"Concept '{c}' must have exactly 1 outgoing 'concept_forms_bundle' edge; found {len(out_cb)}."
-            )
+        if node_type == "bundle":
+            if tally.concept_forms_bundle_in != 1:
+                bundle_errors.append(
+                    f"Bundle '{nid}' must have exactly 1 incoming 'concept_forms_bundle' edge; "
+                    f"found {tally.concept_forms_bundle_in}."
+                )
+            if tally.support_out < 1:
+                bundle_errors.append(
+                    f"Bundle '{nid}' must have at least 1 outgoing support edge to artwork/essay."
+                )
+            bconf = getattr(tally.node, "confidence", None)
+            if bconf is None:
+                bundle_errors.append(f"Bundle node '{nid}' missing 'confidence'.")
+            elif not _is_number(bconf):
+                bundle_errors.append(f"Bundle node '{nid}' has non-numeric confidence: {bconf!r}.")
+            elif tally.support_confidence_count:
+                m = tally.support_confidence_sum / tally.support_confidence_count
+                if abs(float(bconf) - m) > bundle_confidence_eps:
+                    bundle_errors.append(
+                        f"Bundle '{nid}' confidence ({float(bconf):.6f}) must equal mean of its "
+                        f"support edge confidences ({m:.6f})."
+                    )
+
+        elif node_type == "concept":
+            if tally.query_supports_concept_in != 1:
+                concept_errors.append(
+                    f"Concept '{nid}' must have exactly 1 incoming 'query_supports_concept' edge; "
+                    f"found {tally.query_supports_concept_in}."
+                )
+            if tally.concept_forms_bundle_out != 1:
+                concept_errors.append(
+                    f"Concept '{nid}' must have exactly 1 outgoing 'concept_forms_bundle' edge; "
+                    f"found {tally.concept_forms_bundle_out}."
+                )
 
-    evidence_nodes = [nid for nid, n in nodes_by_id.items() if n.node_type in {"artwork", "essay"}]
-    for ev in evidence_nodes:
-        inc_support = [
-            e for e in incoming[ev]
-            if e.edge_type in {"bundle_supported_by_artwork", "bundle_supported_by_essay"}
-        ]
-        if len(inc_support) < 1:
-            errors.append(
-                f"Evidence node '{ev}' must have at least 1 incoming support edge."
+        elif node_type in {"artwork", "essay"} and tally.support_in < 1:
+            evidence_errors.append(
+                f"Evidence node '{nid}' must have at least 1 incoming support edge."
             )
 
-    def _has_cycle() -> bool:
-        adj: Dict[str, List[str]] = {nid: [] for nid in node_ids}
-        for edge in edges:
-            if edge.from_node in node_ids and edge.to_node in node_ids:
-                adj[edge.from_node].append(edge.to_node)
-
-        WHITE, GRAY, BLACK = 0, 1, 2
-        color: Dict[str, int] = {nid: WHITE for nid in node_ids}
+    errors.extend(orphan_errors)
+    errors.extend(bundle_errors)
+    errors.extend(concept_errors)
+    errors.extend(evidence_errors)
 
-        def dfs(u: str) -> bool:
-            color[u] = GRAY
-            for v in adj[u]:
-                if color[v] == GRAY:
-                    return True
-                if color[v] == WHITE and dfs(v):
-                    return True
-            color[u] = BLACK
-            return False
-
-        return any(color[nid] == WHITE and dfs(nid) for nid in node_ids)
-
-    if _has_cycle():
+    if _has_cycle(tallies):
         errors.append("Graph must be acyclic, but a cycle was detected.")
 
-    if query_node_id is not None:
-        out_qc = [
-            e for e in outgoing[query_node_id]
-            if e.edge_type == "query_supports_concept"
-        ]
-        if len(out_qc) < 1:
-            warnings.append("Query node has no outgoing 'query_supports_concept' edges.")
+    if query_node_id is not None and tallies[query_node_id].query_supports_concept_out < 1:
+        warnings.append("Query node has no outgoing 'query_supports_concept' edges.")
 
     return ValidationResult(errors=errors, warnings=warnings)
+
+
+def _has_cycle(tallies: Dict[str, _NodeTally]) -> bool:
+    """Kahn's algorithm: iterative, so deep graphs cannot hit the recursion limit."""
+    remaining = {nid: tally.in_degree for nid, tally in tallies.items()}
+    ready = [nid for nid, degree in remaining.items() if degree == 0]
+    visited = 0
+    while ready:
+        nid = ready.pop()
+        visited += 1
+        for successor in tallies[nid].successors or ():
+            remaining[successor] -= 1
+            if remaining[successor] == 0:
+                ready.append(successor)
+    return visited < len(tallies)
+
+
+def query_layer_errors(edges: Sequence[GraphEdge], *, confidence_eps: float = 1e-6) -> List[str]:
+    """
+    The per-edge checks for `query_supports_concept` edges alone, for graphs
+    whose layers below the query were already validated as a whole.
+    """
+    errors: List[str] = []
+    for i, edge in enumerate(edges):
+        conf = edge.confidence
+        if conf is None:
+            errors.append(f"Edge[{i}] '{edge.edge_type}' missing confidence.")
+        elif not _is_number(conf) or not (-confidence_eps <= float(conf) <= 1.0 + confidence_eps):
+            errors.append(f"Edge[{i}] '{edge.edge_type}' confidence out of range [0,1]: {conf}.")
+    return errors
+
+
+# Production policy: `should_validate` decides per graph: "always", never
+# ("off"), or for a `sample_rate` share of graphs ("sampled").
+# BackgroundGraphValidator runs the check on a worker thread so it stays off
+# the response path; violations are printed, the graph has already been served.
+VALIDATION_MODES = ("off", "sampled", "always")
+
+
+def should_validate(mode: str, sample_rate: float) -> bool:
+    if mode not in VALIDATION_MODES:
+        raise ValueError(f"Graph validation mode must be one of {VALIDATION_MODES}; got '{mode}'")
+    if mode == "sampled":
+        return random.random() < sample_rate
+    return mode == "always"
+
+
+class BackgroundGraphValidator:
+    """Never blocks the caller: once `max_pending` graphs are queued, further ones are skipped."""
+
+    def __init__(self, *, workers: int = 1, max_pending: int = 64) -> None:
+        self.max_pending = max_pending
+        self.validated = 0
+        self.invalid = 0
+        self.skipped = 0
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="graph-validation")
+
+    def submit(self, nodes: Sequence[GraphNode], edges: Sequence[GraphEdge], *, label: str = "") -> bool:
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.skipped += 1
+                return False
+            self._pending += 1
+        self._executor.submit(self._validate, list(nodes), list(edges), label)
+        return True
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+
+    def _validate(self, nodes: List[GraphNode], edges: List[GraphEdge], label: str) -> None:
+        try:
+            result = validate_graph_objects(nodes=nodes, edges=edges)
+            if result.errors:
+                print(f"Graph Errors ({label}): ", result.errors)
+            with self._lock:
+                self.validated += 1
+                self.invalid += bool(result.errors)
+        except Exception as e:
+            print(f"Graph validation failed ({label}): ", e)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+
+_background_validator: BackgroundGraphValidator | None = None
+_background_validator_lock = threading.Lock()
+
+
+def get_background_validator() -> BackgroundGraphValidator:
+    global _background_validator
+    with _background_validator_lock:
+        if _background_validator is None:
+            _background_validator = BackgroundGraphValidator()
+        return _background_validator
@@ -0,0 +1,152 @@
+"""
+Columnar wire format for explanation graphs.
+
+The default format sends every node and edge as an object, so each edge
+repeats its `edge_type` and `provenance` strings and the full node ids of
+both ends. The compact format sends parallel arrays instead:
+
+    {
+      "format": "columnar/1",
+      "strings": ["q:0", "woman with a lute", "c:31", "Portrait", ...],
+      "codes": {"node_type": ["query", "concept", ...],
+                "edge_type": ["query_supports_concept", ...],
+                "provenance": ["v2_detected_concepts", ...]},
+      "nodes": {"id": [0, 2, ...],          # index into strings
+                "type": [0, 1, ...],        # index into codes.node_type
+                "ref": [null, 31, ...],     # ref_id; an index into strings for the
+                "ref_interned": [...],      #   node positions listed here
+                "label": [1, 3, ...],       # index into strings, null if unlabeled
+                "confidence": [null, ...]},
+      "edges": {"from": [0, ...],           # node positions, not ids
+                "to": [1, ...],
+                "type": [0, ...],
+                "confidence": [0.91, ...],
+                "provenance": [0, ...]}
+    }
+
+Node ids, labels and string refs share one interned table, so a bundle id
+such as `b:bundle__concept__31` is sent once however many edges touch it.
+`decode_columnar_graph` turns a payload back into the default format; the
+frontend has its own decoder in transform.api.response.ts.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Sequence
+
+from .graph_model import GraphEdge, GraphNode
+
+COLUMNAR_GRAPH_FORMAT = "columnar/1"
+GRAPH_FORMATS = ("objects", "compact")
+
+
+class _Interner:
+    def __init__(self) -> None:
+        self.values: list[str] = []
+        self._index: dict[str, int] = {}
+
+    def __call__(self, value: str) -> int:
+        index = self._index.get(value)
+        if index is None:
+            index = self._index[value] = len(self.values)
+            self.values.append(value)
+        return index
+
+
+def encode_columnar_graph(nodes: Sequence[GraphNode], edges: Sequence[GraphEdge] | None) -> dict:
+    strings, node_types, edge_types, provenances = _Interner(), _Interner(), _Interner(), _Interner()
+
+    node_position: dict[str, int] = {}
+    ids, types, refs, ref_interned, labels, node_confidences = [], [], [], [], [], []
+    for position, node in enumerate(nodes):
+        node_position[node.node_id] = position
+        ids.append(strings(node.node_id))
+        types.append(node_types(node.node_type))
+        ref = node.ref_id
+        if isinstance(ref, str):
+            ref_interned.append(position)
+            ref = strings(ref)
+        refs.append(ref)
+        label = getattr(node, "label", None)
+        labels.append(strings(label) if label is not None else None)
+        node_confidences.append(getattr(node, "confidence", None))
+
+    edge_from, edge_to, edge_type_codes, edge_confidences, provenance_codes = [], [], [], [], []
+    for edge in edges or ():
+        edge_from.append(node_position[edge.from_node])
+        edge_to.append(node_position[edge.to_node])
+        edge_type_codes.append(edge_types(edge.edge_type))
+        edge_confidences.append(edge.confidence)
+        provenance_codes.append(provenances(edge.provenance))
+
+    return {
+        "format": COLUMNAR_GRAPH_FORMAT,
+        "strings": strings.values,
+        "codes": {
+            "node_type": node_types.values,
+            "edge_type": edge_types.values,
+            "provenance": provenances.values,
+        },
+        "nodes": {
+            "id": ids,
+            "type": types,
+            "ref": refs,
+            "ref_interned": ref_interned,
+            "label": labels,
+            "confidence": node_confidences,
+        },
+        "edges": {
+            "from": edge_from,
+            "to": edge_to,
+            "type": edge_type_codes,
+            "confidence": edge_confidences,
+            "provenance": provenance_codes,
+        },
+    }
+
+
+def decode_columnar_graph(payload: dict) -> dict[str, list[dict[str, Any]]]:
+    """The default format (as JSON objects) for a columnar payload."""
+    if payload.get("format") != COLUMNAR_GRAPH_FORMAT:
+        raise ValueError(f"Unsupported graph format '{payload.get('format')}'")
+    strings, codes, columns = payload["strings"], payload["codes"], payload["nodes"]
+    interned_refs = set(columns["ref_interned"])
+
+    nodes: list[dict[str, Any]] = []
+    for position, (node_id, node_type, ref, label, confidence) in enumerate(zip(
+        columns["id"], columns["type"], columns["ref"], columns["label"], columns["confidence"]
+    )):
+        node: dict[str, Any] = {
+            "node_id": strings[node_id],
+            "node_type": codes["node_type"][node_type],
+            "ref_id": strings[ref] if position in interned_refs else ref,
+        }
+        if label is not None:
+            node["label"] = strings[label]
+        if confidence is not None:
+            node["confidence"] = confidence
+        nodes.append(node)
+
+    columns = payload["edges"]
+    edges = [
+        {
+            "from_node": nodes[from_position]["node_id"],
+            "to_node": nodes[to_position]["node_id"],
+            "edge_type": codes["edge_type"][edge_type],
+            "confidence": confidence,
+            "provenance": codes["provenance"][provenance],
+        }
+        for from_position, to_position, edge_type, confidence, provenance in zip(
+            columns["from"], columns["to"], columns["type"], columns["confidence"], columns["provenance"]
+        )
+    ]
+    return {"nodes": nodes, "edges": edges}
+
+
+def graph_for_wire(graph: dict | None, graph_format: str) -> dict | None:
+    """`explanation_graph` as the client asked for it; "objects" leaves it untouched."""
+    if graph_format not in GRAPH_FORMATS:
+        raise ValueError(f"Graph format must be one of {GRAPH_FORMATS}; got '{graph_format}'")
+    if graph is None or graph_format == "objects":
+        return graph
+    return encode_columnar_graph(graph.get("nodes") or (), graph.get("edges"))
@@ -1,5 +1,5 @@
 import argparse
-from met_data_collection.load_data import save_batched_list_of_artworks
+from met_data_collection.load_data import BATCH_SIZE, EMBED_BATCH_SIZE, save_batched_list_of_artworks
 
 def main():
     parser = argparse.ArgumentParser(
@@ -20,11 +20,42 @@ def main():
         help="The maximum number of artworks to fetch. (Default: 3000)"
     )
 
+    parser.add_argument(
+        "--fetch-workers",
+        type=int,
+        default=None,
+        help="Concurrent Met API requests in the fetch stage. (Default: FETCH_MAX_IN_FLIGHT)"
+    )
+
+    parser.add_argument(
+        "--embed-batch-size",
+        type=int,
+        default=EMBED_BATCH_SIZE,
+        help=f"Artworks per encode_batch call in the embed stage. (Default: {EMBED_BATCH_SIZE})"
+    )
+
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=BATCH_SIZE,
+        help=f"Artworks per insert in the write stage. (Default: {BATCH_SIZE})"
+    )
+
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue from this department's checkpoint manifest, retrying failed ids first."
+    )
+
     args = parser.parse_args()
 
     save_batched_list_of_artworks(
         dept_id=args.dept_id,
-        limit=args.limit
+        limit=args.limit,
+        fetch_workers=args.fetch_workers,
+        embed_batch_size=args.embed_batch_size,
+        batch_size=args.batch_size,
+        resume=args.resume,
     )
 
 if __name__ == "__main__":
@@ -1,6 +1,6 @@
-import { type FormEvent, useState } from 'react'
+import { type FormEvent, useRef, useState } from 'react'
 import './App.css'
-import { getQueryResponse } from './search.service'
+import { streamQueryResponse } from './search.service'
 import { FullResultsPanel } from './components/FullResultsPanel'
 import { ExplanationPanel } from './components/ExplanationPanel'
 import type { UIModel } from './transform.api.response'
@@ -12,6 +12,7 @@ function App() {
   const [error, setError] = useState<string | null>(null)
   const [hasSearched, setHasSearched] = useState(false)
   const [activeTab, setActiveTab] = useState<'full' | 'explanation'>('full')
+  const latestSearch = useRef(0)
 
 
   const handleSubmit = async (event: FormEvent<HTMLFormElement>) => {
@@ -26,8 +27,13 @@ function App() {
     setLoading(true)
     setHasSearched(true)
 
+    const searchId = ++latestSearch.current
     try {
-      const response = await getQueryResponse(trimmedQuery)
+      // Results render stage by stage and the explanation arrives last; drop updates once a newer search has started.
+      const response = await streamQueryResponse(trimmedQuery, (partial) => {
+        if (searchId === latestSearch.current) setUIModel(partial)
+      })
+      if (searchId !== latestSearch.current) return
       setUIModel(response)
     } catch (err) {
       console.error('Search failed', err)
@@ -0,0 +1,4 @@
+export const API_BASE_URL:string = 'http://localhost:8080/api'
+
+// Served from the API's local thumbnail cache instead of the Met on every render.
+export const thumbnailUrl = (artworkId:number):string => `${API_BASE_URL}/thumb/${artworkId}`
@@ -1,3 +1,4 @@
+import type { ReactNode } from 'react'
 import type { ArtworkResultModel, EssayResultModel } from '../full-result/full.result.response'
 
 type ArtworkCardProps = {
@@ -42,7 +43,9 @@ export function EssayResultCard({ essay }: EssayCardProps) {
       <div className="card-section">
         <p className="eyebrow">{essay.confidenceLabel} relevance</p>
         <p className="lead">{essay.essayTitle}</p>
-        <p className="body">{essay.essayText}</p>
+        <p className="body">
+          <EssayText essay={essay} />
+        </p>
         <p className="meta">
           Source: {essay.source} · Score: {score.toFixed(2)}
         </p>
@@ -55,6 +58,29 @@ export function EssayResultCard({ essay }: EssayCardProps) {
   )
 }
 
+function EssayText({ essay }: EssayCardProps) {
+  const snippet = essay.snippet
+  if (!snippet) return <>{essay.essayText}</>
+
+  const parts: ReactNode[] = []
+  let cursor = 0
+  snippet.highlights.forEach(([start, end], index) => {
+    if (start < cursor) return
+    parts.push(essay.essayText.slice(cursor, start))
+    parts.push(<mark key={index}>{essay.essayText.slice(start, end)}</mark>)
+    cursor = end
+  })
+  parts.push(essay.essayText.slice(cursor))
+
+  return (
+    <>
+      {snippet.truncatedStart && '… '}
+      {parts}
+      {snippet.truncatedEnd && ' …'}
+    </>
+  )
+}
+
 type WhyTraceProps = {
   trace: ArtworkResultModel['retrievalTrace'] | EssayResultModel['retrievalTrace']
   fallbackLabel: string
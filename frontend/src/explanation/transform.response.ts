@@ -1,3 +1,4 @@
+import { thumbnailUrl } from "../api.config";
 import type { Artwork, Concept, ExplanationBlock, ExplanationModel } from "./explanation.model";
 
 export const transformResponseToExplanation = (apiResponse: any): ExplanationModel => {
@@ -66,7 +67,7 @@ const buildExplanationBlocks = (edges: any[], nodes: any[], results: any[]): Exp
                 const art = allArtworks.find((item) => toNumber(item?.id, NaN) === artworkRefId);
                 if (!art) return null;
 
-                const imageUrl = safeString(art.image_url);
+                const imageUrl = safeString(art.image_url) ? thumbnailUrl(artworkRefId) : "";
                 const title = safeString(art.title, "Untitled artwork");
 
 
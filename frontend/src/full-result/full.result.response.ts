@@ -1,3 +1,4 @@
+import { thumbnailUrl } from "../api.config"
 import { transformConfidenceToString } from "../explanation/transform.response"
 
 export type FullResultModel = {
@@ -30,10 +31,17 @@ export type ArtworkResultModel = {
 }
 
 
+export type EssaySnippet = {
+    highlights: [number, number][] // offsets into essayText
+    truncatedStart: boolean
+    truncatedEnd: boolean
+}
+
 export type EssayResultModel = {
     essayId:number
     essayTitle:string
-    essayText:string
+    essayText:string // the whole chunk when requested with text=full, the snippet otherwise
+    snippet ?: EssaySnippet
     source:string
     confidenceValue:number
     confidenceLabel: string,
@@ -72,7 +80,12 @@ export const getEssayModel = (essayResponses: any[]): EssayResultModel[]=>{
 
         return {
             essayId : essay.id, 
-            essayText: essay.text,
+            essayText: essay.text ?? essay.snippet?.text ?? '',
+            snippet : (essay.snippet && essay.text === undefined) ? {
+                highlights: essay.snippet.highlights,
+                truncatedStart: essay.snippet.truncated_start,
+                truncatedEnd: essay.snippet.truncated_end
+            } : undefined,
             essayTitle: essay.title,
             source: essay.source, 
             confidenceValue: essay.score.final_score,
@@ -106,7 +119,7 @@ export const getArtworkModel = (artworkResponses:any[]):ArtworkResultModel[]=>{
             artworkTitle: artwork.title,
             confidenceLabel: transformConfidenceToString(artwork.score.final_score),
             confidenceValue: artwork.score.final_score,
-            imageUrl: artwork.image_url,
+            imageUrl: artwork.image_url ? thumbnailUrl(artwork.id) : '',
             retrievalTrace : {
                 lexicalMatch : (artwork.retrieval_trace.lexical_match) ? {
                     matchedLexemes: artwork.retrieval_trace.lexical_match.matched_lexemes,
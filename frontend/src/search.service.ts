@@ -1,11 +1,107 @@
+import { API_BASE_URL } from "./api.config"
 import { transformApiResponse, type UIModel } from "./transform.api.response"
 
-const URL:string = 'http://localhost:8080/api/search'
+const URL:string = `${API_BASE_URL}/search`
+const EXPLAIN_URL:string = `${API_BASE_URL}/explain`
 
-export const getQueryResponse = async (query:string):Promise<UIModel>=>{
+// Resolves with the results as soon as the search returns. When the API defers the
+// explanation graph, it is fetched afterwards and handed to `onExplanation` merged with those results.
+export const getQueryResponse = async (query:string, onExplanation?:(model:UIModel)=>void):Promise<UIModel>=>{
 
-   const response =  await fetch(`${URL}?q=${query}`)
+   const response =  await fetch(`${URL}?q=${encodeURIComponent(query)}`)
 
     const searchResponse = await response.json()
+
+    const handle:string | undefined = searchResponse?.explanation?.handle
+    if (handle && onExplanation) {
+        getExplanation(handle)
+            .then((explanationResponse)=> onExplanation(transformApiResponse({
+                ...searchResponse,
+                explanation_graph: explanationResponse.explanation_graph,
+            })))
+            .catch((err)=> console.error('Explanation failed', err))
+    }
+
     return transformApiResponse(searchResponse);
-}
\ No newline at end of file
+}
+
+export const getExplanation = async (handle:string):Promise<any>=>{
+
+    const response = await fetch(`${EXPLAIN_URL}/${handle}?graph=compact`)
+    if (!response.ok) {
+        throw new Error(`Explanation request failed with ${response.status}`)
+    }
+    return response.json()
+}
+
+type StreamState = {
+    query: string
+    essays: any[]
+    artworks: any[]
+    ranked: any[] | null
+    explanationGraph: any
+}
+
+// Reads `/search?stream=ndjson`: essay and artwork hits render as soon as their retriever
+// finishes, then the merged ranking replaces them, and the explanation arrives last.
+export const streamQueryResponse = async (query:string, onUpdate:(model:UIModel)=>void):Promise<UIModel>=>{
+
+    const response = await fetch(`${URL}?q=${encodeURIComponent(query)}&stream=ndjson&graph=compact`)
+    if (!response.body) {
+        const model = await getQueryResponse(query, onUpdate)
+        onUpdate(model)
+        return model
+    }
+
+    const state:StreamState = { query, essays: [], artworks: [], ranked: null, explanationGraph: undefined }
+    let model:UIModel = toUIModel(state)
+    const reader = response.body.getReader()
+    const decoder = new TextDecoder()
+    let buffered = ""
+
+    for (;;) {
+        const { done, value } = await reader.read()
+        buffered += decoder.decode(value, { stream: !done })
+        const lines = buffered.split("\n")
+        buffered = done ? "" : lines.pop() ?? ""
+
+        for (const line of lines) {
+            if (!line.trim()) continue
+            const event = JSON.parse(line)
+            if (event.event === "error") {
+                throw new Error(event.data?.message ?? "Search failed")
+            }
+            if (applyStreamEvent(state, event)) {
+                model = toUIModel(state)
+                onUpdate(model)
+            }
+        }
+        if (done) return model
+    }
+}
+
+const applyStreamEvent = (state:StreamState, event:any):boolean=>{
+    const data = event?.data ?? {}
+    switch (event?.event) {
+        case "essays":
+            state.essays = data.results ?? []
+            return true
+        case "artworks":
+            state.artworks = data.results ?? []
+            return true
+        case "ranking":
+            state.ranked = data.results ?? []
+            return true
+        case "explanation":
+            state.explanationGraph = data.explanation_graph
+            return true
+        default:
+            return false
+    }
+}
+
+const toUIModel = (state:StreamState):UIModel=> transformApiResponse({
+    query: state.query,
+    results: state.ranked ?? [...state.essays, ...state.artworks],
+    explanation_graph: state.explanationGraph,
+})
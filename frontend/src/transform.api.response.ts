@@ -12,10 +12,51 @@ export type UIModel = {
 
 
 export const transformApiResponse = (searchResponse:any):UIModel=>{
-    const explanationModel: ExplanationModel  =  transformResponseToExplanation(searchResponse)
+    const explanationModel: ExplanationModel  =  transformResponseToExplanation({
+      ...searchResponse,
+      explanation_graph: decodeExplanationGraph(searchResponse?.explanation_graph),
+    })
     const fullResultModel : FullResultModel   = transformResponseToFullResult(searchResponse.results); 
   return {
     explanationModel,
     fullResultModel
   }
-}
\ No newline at end of file
+}
+
+
+const COLUMNAR_GRAPH_FORMAT = "columnar/1"
+
+// `?graph=compact` sends the graph as parallel arrays over an interned string table
+// (explanation/graph/graph_wire.py); expand it back into node and edge objects.
+export const decodeExplanationGraph = (graph:any):any=>{
+  if (graph?.format !== COLUMNAR_GRAPH_FORMAT) return graph
+
+  const strings:string[] = graph.strings ?? []
+  const codes = graph.codes ?? {}
+  const nodeColumns = graph.nodes ?? {}
+  const edgeColumns = graph.edges ?? {}
+  const internedRefs = new Set<number>(nodeColumns.ref_interned ?? [])
+
+  const nodes = (nodeColumns.id ?? []).map((id:number, position:number)=>{
+    const node:any = {
+      node_id: strings[id],
+      node_type: codes.node_type?.[nodeColumns.type[position]],
+      ref_id: internedRefs.has(position) ? strings[nodeColumns.ref[position]] : nodeColumns.ref[position],
+    }
+    const label = nodeColumns.label?.[position]
+    if (label !== null && label !== undefined) node.label = strings[label]
+    const confidence = nodeColumns.confidence?.[position]
+    if (confidence !== null && confidence !== undefined) node.confidence = confidence
+    return node
+  })
+
+  const edges = (edgeColumns.from ?? []).map((from:number, index:number)=>({
+    from_node: nodes[from]?.node_id,
+    to_node: nodes[edgeColumns.to[index]]?.node_id,
+    edge_type: codes.edge_type?.[edgeColumns.type[index]],
+    confidence: edgeColumns.confidence[index],
+    provenance: codes.provenance?.[edgeColumns.provenance[index]],
+  }))
+
+  return { nodes, edges }
+}
@@ -0,0 +1,54 @@
+import argparse
+from concept_data_pipeline.wikidata.dump_importer import import_wikidata_dump
+from utils.config import INGESTION
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Import artist/movement relations for our artworks and concepts from a local Wikidata JSON dump.",
+        formatter_class=argparse.RawTextHelpFormatter
+    )
+
+    parser.add_argument(
+        "dump",
+        help="Path to latest-all.json.gz, .json.bz2 or an uncompressed .json dump"
+    )
+
+    parser.add_argument(
+        "-w", "--workers",
+        type=int,
+        default=INGESTION.wikidata_workers,
+        help=f"Processes matching dump lines. (Default: {INGESTION.wikidata_workers})"
+    )
+
+    parser.add_argument(
+        "--batch-lines",
+        type=int,
+        default=INGESTION.wikidata_batch_lines,
+        help=f"Dump lines handed to a worker per task. (Default: {INGESTION.wikidata_batch_lines})"
+    )
+
+    parser.add_argument(
+        "--max-lines",
+        type=int,
+        default=None,
+        help="Stop after this many dump lines, e.g. to try settings on a prefix."
+    )
+
+    parser.add_argument(
+        "--replace",
+        action="store_true",
+        help="Empty wikidata_entity and wikidata_relation before importing."
+    )
+
+    args = parser.parse_args()
+
+    import_wikidata_dump(
+        args.dump,
+        workers=args.workers,
+        batch_lines=args.batch_lines,
+        max_lines=args.max_lines,
+        replace=args.replace,
+    )
+
+if __name__ == "__main__":
+    main()
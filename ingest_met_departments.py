@@ -0,0 +1,87 @@
+import argparse
+from met_data_collection.load_data import BATCH_SIZE, EMBED_BATCH_SIZE
+from met_data_collection.orchestrator import DepartmentJob, MultiDepartmentIngestion
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Ingest several departments at once, sharing one API rate budget, one embedding model and the DB pool.",
+        formatter_class=argparse.RawTextHelpFormatter
+    )
+
+    parser.add_argument(
+        "departments",
+        nargs="+",
+        help="Departments as <dept_id>[:<limit>], e.g. 11:2000 21 45:500"
+    )
+
+    parser.add_argument(
+        "-l", "--limit",
+        type=int,
+        default=3000,
+        help="Limit for departments given without one. (Default: 3000)"
+    )
+
+    parser.add_argument(
+        "-p", "--parallel",
+        type=int,
+        default=2,
+        help="Departments ingested concurrently. (Default: 2)"
+    )
+
+    parser.add_argument(
+        "--fetch-workers",
+        type=int,
+        default=None,
+        help="Concurrent Met API requests per department; the global rate budget still applies. (Default: FETCH_MAX_IN_FLIGHT)"
+    )
+
+    parser.add_argument(
+        "--embed-batch-size",
+        type=int,
+        default=EMBED_BATCH_SIZE,
+        help=f"Texts per call of the shared embedding worker. (Default: {EMBED_BATCH_SIZE})"
+    )
+
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=BATCH_SIZE,
+        help=f"Artworks per insert in the write stage. (Default: {BATCH_SIZE})"
+    )
+
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue every department from its checkpoint manifest."
+    )
+
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Only estimate pending objects, cache hits and fetch time; nothing is written."
+    )
+
+    args = parser.parse_args()
+
+    try:
+        jobs = [DepartmentJob.parse(spec, args.limit) for spec in args.departments]
+    except ValueError as e:
+        parser.error(str(e))
+
+    ingestion = MultiDepartmentIngestion(
+        jobs,
+        parallel=args.parallel,
+        fetch_workers=args.fetch_workers,
+        embed_batch_size=args.embed_batch_size,
+        batch_size=args.batch_size,
+        resume=args.resume,
+    )
+
+    if args.dry_run:
+        print(ingestion.estimate().report())
+        return
+
+    ingestion.run()
+
+if __name__ == "__main__":
+    main()
@@ -2,8 +2,8 @@
 
 # Check if the required argument (dept_id) is provided
 if [ -z "$1" ]; then
-    echo "Usage: $0 <dept_id> [limit]"
-    echo "Example: $0 45 1000"
+    echo "Usage: $0 <dept_id> [limit] [extra fetch_met_museum_data.py options]"
+    echo "Example: $0 45 1000 --fetch-workers 16 --embed-batch-size 128"
     exit 1
 fi
 
@@ -17,6 +17,7 @@ echo "Running script for Department ID: $DEPT_ID"
 echo "Using Limit: $LIMIT"
 
 # Execute the command
-python "$PYTHON_SCRIPT" "$DEPT_ID" -l "$LIMIT"
+# Ingestion runs as a staged fetch -> transform -> embed -> write pipeline
+python "$PYTHON_SCRIPT" "$DEPT_ID" -l "$LIMIT" "${@:3}"
 
 echo "Script execution complete."
\ No newline at end of file
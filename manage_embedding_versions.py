@@ -0,0 +1,78 @@
+import argparse
+from utils.config import EMBEDDING_VERSIONS
+from utils.embedding_versions import (
+    activate_embedding_version,
+    count_missing_embeddings,
+    ensure_embedding_registry,
+    ensure_embedding_version_index,
+    find_embedding_version,
+    list_embedding_versions,
+    missing_embedding_indexes,
+    register_embedding_version,
+)
+from utils.embeddings import embedding_dimensions
+from utils.reembedding import reembed_corpus
+
+def show_status():
+    ensure_embedding_registry()
+    for version in list_embedding_versions(refresh=True):
+        missing = count_missing_embeddings(version)
+        missing_text = ", ".join(f"{table} {count}" for table, count in missing.items())
+        unindexed = missing_embedding_indexes(version)
+        index_text = f"no ANN index on {', '.join(unindexed)}" if unindexed else "indexed"
+        print(f"{version.version}: {version.status}, model {version.model_name} ({version.dimensions}d), "
+              f"column {version.column}, missing vectors: {missing_text}, {index_text}")
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Manage embedding versions: register a new model, backfill it in the background, then flip search to it.",
+        formatter_class=argparse.RawTextHelpFormatter
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("status", help="List versions and how many rows still miss each one.")
+
+    register = subparsers.add_parser("register", help="Add a building version and its shadow columns.")
+    register.add_argument("version", help="Version tag, e.g. v2 (stored in column embedding_<version>).")
+    register.add_argument("model_name", help="sentence-transformers model that produces this version.")
+    register.add_argument("--dimensions", type=int, default=None,
+                          help="Vector size. (Default: read from the model)")
+
+    backfill = subparsers.add_parser("backfill", help="Re-embed rows missing this version, throttled.")
+    backfill.add_argument("version")
+    backfill.add_argument("--batch-size", type=int, default=EMBEDDING_VERSIONS.reembed_batch_size,
+                          help=f"Rows per encode_batch call and UPDATE transaction. (Default: {EMBEDDING_VERSIONS.reembed_batch_size})")
+    backfill.add_argument("--rows-per-second", type=float, default=EMBEDDING_VERSIONS.reembed_rows_per_second,
+                          help=f"Throughput cap protecting live search. (Default: {EMBEDDING_VERSIONS.reembed_rows_per_second:g})")
+
+    index = subparsers.add_parser("index", help="Build the HNSW index on this version's column (backfill does it too).")
+    index.add_argument("version")
+
+    activate = subparsers.add_parser("activate", help="Atomically switch search to this version; needs its index.")
+    activate.add_argument("version")
+    activate.add_argument("--allow-incomplete", action="store_true",
+                          help="Flip even though some rows have no vector for this version yet.")
+
+    args = parser.parse_args()
+
+    if args.command == "status":
+        show_status()
+    elif args.command == "register":
+        dimensions = args.dimensions or embedding_dimensions(args.model_name)
+        version = register_embedding_version(args.version, args.model_name, dimensions)
+        print(f"Registered {version.version} ({version.model_name}, {dimensions}d) in column {version.column}; "
+              "new rows are written to it from now on.")
+    elif args.command == "backfill":
+        reembed_corpus(find_embedding_version(args.version),
+                       batch_size=args.batch_size, rows_per_second=args.rows_per_second)
+    elif args.command == "index":
+        version = find_embedding_version(args.version)
+        ensure_embedding_version_index(version)
+        print(f"ANN index on {version.column} ready.")
+    elif args.command == "activate":
+        version = activate_embedding_version(args.version, allow_incomplete=args.allow_incomplete)
+        print(f"Search now uses {version.version} ({version.model_name}); "
+              f"running APIs pick it up within {EMBEDDING_VERSIONS.cache_seconds:g}s.")
+
+if __name__ == "__main__":
+    main()
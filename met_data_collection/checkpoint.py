@@ -0,0 +1,155 @@
+"""Durable checkpoint manifests for resumable department ingestion."""
+
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass, field
+import json
+import os
+from pathlib import Path
+import threading
+import time
+from typing import Iterable
+
+from utils.config import INGESTION
+
+
+def checkpoint_path_for(dept_id: int, checkpoint_dir: str = INGESTION.checkpoint_dir) -> Path:
+    return Path(checkpoint_dir) / f"dept_{dept_id}.json"
+
+
+@dataclass
+class IngestionCheckpoint:
+    """
+    Progress of one department run over a fixed, ordered snapshot of object ids.
+
+    `cursor` is the length of the snapshot prefix in which every id is resolved
+    (written, skipped as invalid, or failed). Because fetches complete out of
+    order, ids resolved beyond the cursor are kept in `resolved_ahead` so a
+    resume neither refetches them nor skips anything still in flight.
+    """
+
+    dept_id: int
+    object_ids: list[int]
+    limit: int
+    cursor: int = 0
+    resolved_ahead: list[int] = field(default_factory=list)
+    failed_ids: list[int] = field(default_factory=list)
+    written: int = 0
+    skipped: int = 0
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+    path: str | None = None
+
+    def __post_init__(self) -> None:
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._positions = {object_id: pos for pos, object_id in enumerate(self.object_ids)}
+        self._ahead = {self._positions[oid] for oid in self.resolved_ahead if oid in self._positions}
+        self._failed = set(self.failed_ids)
+
+    @classmethod
+    def start(cls, dept_id: int, object_ids: Iterable[int], *, limit: int, path: Path | None) -> "IngestionCheckpoint":
+        checkpoint = cls(dept_id=dept_id, object_ids=list(object_ids), limit=limit,
+                         path=str(path) if path else None)
+        checkpoint.save()
+        return checkpoint
+
+    @classmethod
+    def load(cls, path: Path) -> "IngestionCheckpoint":
+        with open(path, encoding="utf-8") as fh:
+            payload = json.load(fh)
+        payload["path"] = str(path)
+        return cls(**payload)
+
+    def resume(self, *, limit: int | None = None) -> "IngestionCheckpoint":
+        """
+        Start the next leg of this run: previously failed ids first, then every
+        unresolved id from the snapshot. Counts carry over.
+        """
+        with self._lock:
+            remaining = [
+                object_id
+                for pos, object_id in enumerate(self.object_ids[self.cursor:], start=self.cursor)
+                if pos not in self._ahead
+            ]
+            pending = set(remaining)
+            retry = [object_id for object_id in self.failed_ids if object_id not in pending]
+
+        resumed = IngestionCheckpoint(
+            dept_id=self.dept_id,
+            object_ids=retry + remaining,
+            limit=self.limit if limit is None else limit,
+            written=self.written,
+            skipped=self.skipped,
+            created_at=self.created_at,
+            path=self.path,
+        )
+        resumed.save()
+        return resumed
+
+    @property
+    def remaining_budget(self) -> int:
+        return max(0, self.limit - self.written)
+
+    @property
+    def completed(self) -> bool:
+        return self.cursor >= len(self.object_ids)
+
+    def mark_written(self, object_ids: Iterable[int]) -> None:
+        with self._lock:
+            count = self._resolve(object_ids)
+            self.written += count
+
+    def mark_skipped(self, object_ids: Iterable[int]) -> None:
+        with self._lock:
+            self.skipped += self._resolve(object_ids)
+
+    def mark_failed(self, object_ids: Iterable[int]) -> None:
+        object_ids = list(object_ids)
+        with self._lock:
+            for object_id in object_ids:
+                if object_id not in self._failed:
+                    self._failed.add(object_id)
+                    self.failed_ids.append(object_id)
+            self._resolve(object_ids)
+
+    def save(self) -> None:
+        """Atomically replace the manifest on disk (write temp file, fsync, rename)."""
+        if not self.path:
+            return
+
+        with self._lock:
+            self.updated_at = time.time()
+            self.resolved_ahead = [self.object_ids[pos] for pos in sorted(self._ahead)]
+            payload = {
+                key: value for key, value in asdict(self).items() if key != "path"
+            }
+
+        target = Path(self.path)
+        tmp = target.with_suffix(target.suffix + ".tmp")
+        with self._save_lock:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp, "w", encoding="utf-8") as fh:
+                json.dump(payload, fh)
+                fh.flush()
+                os.fsync(fh.fileno())
+            os.replace(tmp, target)
+
+    def summary(self) -> str:
+        return (
+            f"dept {self.dept_id}: cursor {self.cursor}/{len(self.object_ids)}, "
+            f"{self.written} written, {self.skipped} skipped, {len(self.failed_ids)} failed"
+        )
+
+    def _resolve(self, object_ids: Iterable[int]) -> int:
+        count = 0
+        for object_id in object_ids:
+            pos = self._positions.get(object_id)
+            if pos is None or pos < self.cursor or pos in self._ahead:
+                continue
+            self._ahead.add(pos)
+            count += 1
+        while self.cursor in self._ahead:
+            self._ahead.remove(self.cursor)
+            self.cursor += 1
+        return count
@@ -1,15 +1,19 @@
 from typing import List
-import requests
 import time
 
+from utils.config import INGESTION
+from utils.http_cache import get_http_cache
+
 from .met_data_model import ObjectIdResponse, ObjectResponse
 
+MET_API_BASE_URL = INGESTION.met_api_base_url.rstrip("/")
+
 
 
 
 def get_object_ids_by_department(department_id: int)-> List[int]:
 
-    response = requests.get('https://collectionapi.metmuseum.org/public/collection/v1/objects', params={"departmentIds" : department_id})
+    response = get_http_cache().get(f'{MET_API_BASE_URL}/objects', params={"departmentIds" : department_id})
 
     object_ids:ObjectIdResponse = response.json()
 
@@ -20,9 +24,9 @@ def get_object_ids_by_department(department_id: int)-> List[int]:
 
 def get_objects_by_object_id(object_id:int, retry_times:int = 0)-> ObjectResponse:
 
-    url = f"https://collectionapi.metmuseum.org/public/collection/v1/objects/{object_id}"
+    url = f"{MET_API_BASE_URL}/objects/{object_id}"
 
-    response = requests.get(url)
+    response = get_http_cache().get(url)
 
     if response.status_code == 200:
             
@@ -37,7 +41,7 @@ def get_objects_by_object_id(object_id:int, retry_times:int = 0)-> ObjectRespons
     elif response.status_code == 403 and retry_times <= 4:
         time.sleep(30*(retry_times+1))
         print('RETRYING ....')
-        get_objects_by_object_id(object_id, retry_times+1)
+        return get_objects_by_object_id(object_id, retry_times+1)
 
     print("Failed to process the request for " , object_id, " API responded with: ",response)
     return {}
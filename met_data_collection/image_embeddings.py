@@ -0,0 +1,277 @@
+"""
+Offline image embeddings for artworks, CPU only.
+
+Thumbnails (`artwork.image_url`, i.e. the Met's `primaryImageSmall`) go
+through three overlapping stages:
+
+    download   thread pool into the content-addressed ThumbnailCache
+               (rate limited, skipped for cached or local files)
+    decode     process pool: JPEG draft-mode decode, RGB, shrink so the short
+               side equals the model input size; only small uint8 arrays
+               travel back
+    embed      one encode_images call per batch on the main process, whose
+               torch threads get the cores the decoders leave free
+
+While page N is embedded, page N+1 is being decoded and page N+2
+downloaded. Vectors land in `artwork.image_embedding` (its own HNSW index,
+built once the backfill is done), unusable images in
+`image_embedding_error`. Each page is committed on its own, so an
+interrupted run resumes with whatever is still NULL.
+"""
+
+from __future__ import annotations
+
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+import time
+from typing import Any, Callable, Iterator, List, Sequence
+
+import numpy as np
+import psycopg
+
+from db.db_pool import get_connection
+from utils.config import IMAGE_EMBEDDINGS, INGESTION, THUMBNAILS
+from utils.thumbnail_cache import ThumbnailCache
+
+from .met_fetcher import TokenBucket
+
+IMAGE_COLUMN = IMAGE_EMBEDDINGS.column
+_PENDING_CLAUSE = f"{IMAGE_COLUMN} IS NULL AND {IMAGE_COLUMN}_error IS NULL AND image_url IS NOT NULL"
+
+
+@dataclass
+class ImageEmbeddingProgress:
+    total: int
+    embedded: int = 0
+    failed: int = 0
+    waited: dict[str, float] = field(default_factory=lambda: {"download": 0.0, "decode": 0.0})
+    embed_seconds: float = 0.0
+    write_seconds: float = 0.0
+    started: float = field(default_factory=time.perf_counter)
+
+    @property
+    def images_per_second(self) -> float:
+        elapsed = time.perf_counter() - self.started
+        return self.embedded / elapsed if elapsed > 0 else 0.0
+
+    def report(self) -> str:
+        done = self.embedded + self.failed
+        rate = self.images_per_second
+        eta = f"{(self.total - done) / rate / 60:.1f} min" if rate > 0 else "n/a"
+        model_rate = self.embedded / self.embed_seconds if self.embed_seconds > 0 else 0.0
+        return (
+            f"[image embeddings] {done}/{self.total} ({self.failed} failed), {rate:.1f} images/s, ETA {eta}; "
+            f"model {model_rate:.1f} images/s, waited {self.waited['download']:.1f}s on downloads, "
+            f"{self.waited['decode']:.1f}s on decoding, {self.write_seconds:.1f}s writing"
+        )
+
+
+def embed_artwork_images(
+    *,
+    batch_size: int = IMAGE_EMBEDDINGS.batch_size,
+    decode_workers: int = IMAGE_EMBEDDINGS.decode_workers,
+    download_workers: int = IMAGE_EMBEDDINGS.download_workers,
+    image_size: int = IMAGE_EMBEDDINGS.image_size,
+    limit: int | None = None,
+    retry_failed: bool = False,
+    allow_local_paths: bool = False,
+    report_interval_seconds: float = INGESTION.pipeline_report_interval_seconds,
+    cache: ThumbnailCache | None = None,
+    encoder: Callable[..., List[List[float]]] | None = None,
+    db_pool: Any | None = None,
+) -> ImageEmbeddingProgress:
+    """
+    Embed the thumbnail of every artwork without an image embedding (at most
+    `limit`). `allow_local_paths` lets image_url values that are local paths
+    seed the cache from disk.
+    """
+    if batch_size <= 0 or decode_workers <= 0 or download_workers <= 0:
+        raise ValueError("batch_size, decode_workers and download_workers must be positive")
+    if encoder is None:
+        from utils.embeddings import encode_images as encoder
+
+    connection_factory = db_pool.connection if db_pool else get_connection
+    with connection_factory() as conn:
+        try:
+            ensure_image_embedding_column(conn)
+            with conn.cursor() as cur:
+                if retry_failed:
+                    cur.execute(f"UPDATE artwork SET {IMAGE_COLUMN}_error = NULL WHERE {IMAGE_COLUMN}_error IS NOT NULL")
+                cur.execute(f"SELECT count(*) FROM artwork WHERE {_PENDING_CLAUSE}")
+                pending = int(cur.fetchone()[0])
+            conn.commit()
+        except psycopg.Error:
+            conn.rollback()
+            raise
+
+    owns_cache = cache is None
+    if cache is None:
+        limiter = TokenBucket(THUMBNAILS.downloads_per_second)
+        cache = ThumbnailCache(max_connections=download_workers, before_request=limiter.acquire,
+                               allow_local_paths=allow_local_paths)
+
+    progress = ImageEmbeddingProgress(total=min(pending, limit) if limit is not None else pending)
+    print(progress.report())
+    stage = _ImageStages(progress, batch_size=batch_size, image_size=image_size, encoder=encoder,
+                         connection_factory=connection_factory)
+    next_report = time.monotonic() + report_interval_seconds
+
+    try:
+        with (
+            ThreadPoolExecutor(max_workers=download_workers, thread_name_prefix="thumb") as downloads,
+            ProcessPoolExecutor(max_workers=decode_workers) as decoders,
+        ):
+            downloading: list[tuple[int, Future]] | None = None
+            decoding: list[tuple[int, Future | None, str | None]] | None = None
+            for page in _iter_pending_pages(connection_factory, batch_size, limit):
+                next_downloading = [(artwork_id, downloads.submit(cache.fetch, url)) for artwork_id, url in page]
+                next_decoding = stage.decode(decoders, downloading) if downloading else None
+                if decoding:
+                    stage.embed_and_write(decoding)
+                downloading, decoding = next_downloading, next_decoding
+
+                if time.monotonic() >= next_report:
+                    print(progress.report())
+                    print(cache.stats)
+                    next_report += report_interval_seconds
+
+            if decoding:
+                stage.embed_and_write(decoding)
+            if downloading:
+                stage.embed_and_write(stage.decode(decoders, downloading))
+    finally:
+        if owns_cache:
+            cache.close()
+
+    ensure_image_embedding_index(db_pool=db_pool)
+    print(progress.report())
+    print(cache.stats)
+    return progress
+
+
+def ensure_image_embedding_column(conn) -> None:
+    with conn.cursor() as cur:
+        cur.execute(
+            f"ALTER TABLE artwork ADD COLUMN IF NOT EXISTS {IMAGE_COLUMN} vector({int(IMAGE_EMBEDDINGS.dimensions)})"
+        )
+        cur.execute(f"ALTER TABLE artwork ADD COLUMN IF NOT EXISTS {IMAGE_COLUMN}_error TEXT")
+
+
+def ensure_image_embedding_index(*, db_pool: Any | None = None) -> None:
+    """HNSW cosine index for image ANN search; built after the bulk load rather than maintained during it."""
+    connection_factory = db_pool.connection if db_pool else get_connection
+    with connection_factory() as conn:
+        try:
+            with conn.cursor() as cur:
+                cur.execute(
+                    f"""
+                    CREATE INDEX IF NOT EXISTS artwork_{IMAGE_COLUMN}_hnsw_idx
+                    ON artwork USING hnsw ({IMAGE_COLUMN} vector_cosine_ops)
+                    """
+                )
+            conn.commit()
+        except psycopg.Error:
+            conn.rollback()
+            raise
+
+
+def _iter_pending_pages(connection_factory, batch_size: int, limit: int | None) -> Iterator[list[tuple[int, str]]]:
+    # Keyset pagination: pages still in flight are NULL too, `id > last_id` keeps them from repeating.
+    last_id = 0
+    remaining = limit
+    while remaining is None or remaining > 0:
+        page_size = batch_size if remaining is None else min(batch_size, remaining)
+        with connection_factory() as conn, conn.cursor() as cur:
+            cur.execute(
+                f"SELECT id, image_url FROM artwork WHERE id > %s AND {_PENDING_CLAUSE} ORDER BY id LIMIT %s",
+                (last_id, page_size),
+            )
+            page = [(int(artwork_id), url) for artwork_id, url in cur.fetchall()]
+        if not page:
+            return
+        yield page
+        last_id = page[-1][0]
+        if remaining is not None:
+            remaining -= len(page)
+
+
+class _ImageStages:
+    def __init__(self, progress: ImageEmbeddingProgress, *, batch_size: int, image_size: int,
+                 encoder: Callable[..., List[List[float]]], connection_factory) -> None:
+        self.progress = progress
+        self.batch_size = batch_size
+        self.image_size = image_size
+        self.encoder = encoder
+        self.connection_factory = connection_factory
+
+    def decode(self, decoders: ProcessPoolExecutor,
+               downloading: Sequence[tuple[int, Future]]) -> list[tuple[int, Future | None, str | None]]:
+        started = time.perf_counter()
+        decoding = []
+        for artwork_id, download in downloading:
+            try:
+                path = download.result()
+            except Exception as exc:
+                decoding.append((artwork_id, None, f"download: {exc}"))
+                continue
+            decoding.append((artwork_id, decoders.submit(decode_thumbnail, str(path), self.image_size), None))
+        self.progress.waited["download"] += time.perf_counter() - started
+        return decoding
+
+    def embed_and_write(self, decoding: Sequence[tuple[int, Future | None, str | None]]) -> None:
+        from PIL import Image
+
+        started = time.perf_counter()
+        ids, images, failures = [], [], []
+        for artwork_id, decoded, error in decoding:
+            if decoded is not None:
+                try:
+                    images.append(Image.fromarray(decoded.result()))
+                    ids.append(artwork_id)
+                    continue
+                except Exception as exc:
+                    error = f"decode: {exc}"
+            failures.append((str(error)[:500], artwork_id))
+        self.progress.waited["decode"] += time.perf_counter() - started
+
+        vectors: list[list[float]] = []
+        if images:
+            started = time.perf_counter()
+            vectors = self.encoder(images, batch_size=self.batch_size, model_name=IMAGE_EMBEDDINGS.model_name)
+            self.progress.embed_seconds += time.perf_counter() - started
+
+        started = time.perf_counter()
+        with self.connection_factory() as conn:
+            try:
+                with conn.cursor() as cur:
+                    if ids:
+                        cur.executemany(
+                            f"UPDATE artwork SET {IMAGE_COLUMN} = %s::vector WHERE id = %s",
+                            list(zip(vectors, ids)),
+                        )
+                    if failures:
+                        cur.executemany(f"UPDATE artwork SET {IMAGE_COLUMN}_error = %s WHERE id = %s", failures)
+                conn.commit()
+            except psycopg.Error:
+                conn.rollback()
+                raise
+        self.progress.write_seconds += time.perf_counter() - started
+        self.progress.embedded += len(ids)
+        self.progress.failed += len(failures)
+
+
+def decode_thumbnail(path: str, size: int) -> np.ndarray:
+    """
+    Decode and shrink one image so its short side is `size` (the model
+    center-crops the rest). Runs in decoder processes.
+    """
+    from PIL import Image
+
+    with Image.open(path) as image:
+        image.draft("RGB", (size, size))  # JPEG: let libjpeg decode at 1/2, 1/4 or 1/8 scale
+        image = image.convert("RGB")
+        scale = size / min(image.size)
+        if scale < 1:
+            new_size = (max(size, round(image.width * scale)), max(size, round(image.height * scale)))
+            image = image.resize(new_size, Image.Resampling.BICUBIC)
+        return np.asarray(image, dtype=np.uint8)
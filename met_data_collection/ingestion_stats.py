@@ -0,0 +1,76 @@
+"""Per-stage throughput counters for ingestion jobs."""
+
+from __future__ import annotations
+
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+import threading
+import time
+from typing import Iterable, Iterator, TypeVar
+
+T = TypeVar("T")
+
+
+@dataclass
+class StageCounter:
+    objects: int = 0
+    seconds: float = 0.0
+
+    @property
+    def objects_per_second(self) -> float:
+        return self.objects / self.seconds if self.seconds > 0 else 0.0
+
+
+@dataclass
+class IngestionStats:
+    """
+    Accumulates busy time and object counts per stage (fetch, embed, write, ...).
+
+    Stages may run on different threads, so updates are lock protected.
+    """
+
+    stages: dict[str, StageCounter] = field(default_factory=dict)
+    started: float = field(default_factory=time.perf_counter)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def add(self, stage: str, objects: int, seconds: float) -> None:
+        with self._lock:
+            counter = self.stages.setdefault(stage, StageCounter())
+            counter.objects += objects
+            counter.seconds += seconds
+
+    @contextmanager
+    def stage(self, stage: str, objects: int) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, objects, time.perf_counter() - started)
+
+    def timed_iter(self, stage: str, items: Iterable[T]) -> Iterator[T]:
+        """Attribute the time spent waiting on `items` to `stage`, one object per item."""
+        iterator = iter(items)
+        try:
+            while True:
+                started = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                self.add(stage, 1, time.perf_counter() - started)
+                yield item
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+
+    def report(self, label: str = "ingestion") -> str:
+        elapsed = time.perf_counter() - self.started
+        with self._lock:
+            parts = [
+                f"{name}: {counter.objects} objects, {counter.seconds:.2f}s busy "
+                f"({counter.objects_per_second:.1f} obj/s busy, "
+                f"{counter.objects / elapsed if elapsed > 0 else 0.0:.1f} obj/s wall)"
+                for name, counter in self.stages.items()
+            ]
+        return f"[{label}] {elapsed:.2f}s wall | " + " | ".join(parts)
@@ -1,18 +1,24 @@
 
-from typing import List
+from pathlib import Path
+import threading
+from typing import Callable, List, Sequence
 
 from .met_data_model import ArtworkModel, ObjectResponse
 
-from .extract_data import get_object_ids_by_department, get_objects_by_object_id
-from .met_data_service import check_object_exists, db_batch_insert_artwork
+from .checkpoint import IngestionCheckpoint, checkpoint_path_for
+from .met_data_service import db_batch_insert_artwork, fetch_existing_object_ids
+from .met_fetcher import MetObjectFetcher, TokenBucket
+from .staged_pipeline import StagedPipeline, StageSpec
 
-import time
-from utils.embeddings import encode_text
-from utils.config import INGESTION
+from utils.embedding_cache import describe_embedding_cache
+from utils.embeddings import encode_batch
+from utils.embedding_versions import EmbeddingVersion, get_writable_embedding_versions
+from utils.config import INGESTION, THUMBNAILS
+from utils.thumbnail_cache import ThumbnailCache, ThumbnailPrefetcher
 
  
-DELAY_SECONDS = INGESTION.artwork_delay_seconds
 BATCH_SIZE = INGESTION.artwork_batch_size
+EMBED_BATCH_SIZE = INGESTION.embed_batch_size
 
 
 
@@ -62,55 +68,211 @@ def transform_object_to_artwork(object_response:ObjectResponse)->ArtworkModel:
 
 
 
-"""
-limit: Number of column in the database could differ in the db
-"""
-def save_batched_list_of_artworks(dept_id:int, limit:int = 3000):
-    
-    object_ids: List[int] = get_object_ids_by_department(department_id=dept_id)
+def embed_artworks(list_of_artworks:List[ArtworkModel], batch_size:int = EMBED_BATCH_SIZE,
+                   encoder:Callable[..., List[List[float]]] = encode_batch,
+                   versions:Sequence[EmbeddingVersion] | None = None):
+    """
+    Fill `embeddings` (column -> vector) for a flush batch with one `encode_batch`
+    call per writable embedding version; `embedding` keeps the active one.
+    """
+    if not list_of_artworks:
+        return
+
+    texts = [artwork['searchable_text'] for artwork in list_of_artworks]
+    for version in versions or get_writable_embedding_versions():
+        embeddings = encoder(texts, batch_size=batch_size, model_name=version.model_name)
+        for artwork, embedding in zip(list_of_artworks, embeddings):
+            artwork.setdefault('embeddings', {})[version.column] = embedding
+            if version.status == "active":
+                artwork['embedding'] = embedding
+
+
+def prepare_artwork(object_response:ObjectResponse)->ArtworkModel | None:
+    """Transform + validate stage: returns None for objects that should not be stored."""
+    artwork_response:ArtworkModel = transform_object_to_artwork(object_response)
+
+    current_img = artwork_response.get('primaryImageSmall')
+    artwork_response['primaryImageSmall'] = current_img or f"https://collectionapi.metmuseum.org/api/collection/v1/iiif/{artwork_response['objectID']}/thumbnail/restricted"
+
+    if not validate_object_response(artwork_response):
+        return None
+    return artwork_response
+
+
+def open_thumbnail_prefetcher()->ThumbnailPrefetcher | None:
+    """Background thumbnail warm-up for /api/thumb, or None when THUMBNAIL_PREFETCH is off."""
+    if not THUMBNAILS.prefetch:
+        return None
+    limiter = TokenBucket(THUMBNAILS.downloads_per_second)
+    cache = ThumbnailCache(max_connections=THUMBNAILS.prefetch_workers, before_request=limiter.acquire)
+    return ThumbnailPrefetcher(cache)
+
+
+class ArtworkIngestionRun:
+    """
+    Wires fetch -> transform/validate -> embed -> write into a StagedPipeline.
+
+    Every id is resolved in the checkpoint as written, skipped or failed, and
+    the manifest is saved after each committed write batch. At most the
+    checkpoint's remaining budget is admitted past transform; fetched objects
+    beyond it stay unresolved and are picked up again on resume.
+    """
+
+    def __init__(self, fetcher:MetObjectFetcher, checkpoint:IngestionCheckpoint, *, fetch_workers:int,
+                 embed_batch_size:int = EMBED_BATCH_SIZE, batch_size:int = BATCH_SIZE,
+                 encoder:Callable[..., List[List[float]]] = encode_batch,
+                 prefetcher:ThumbnailPrefetcher | None = None,
+                 label:str = "ingestion"):
+        self.fetcher = fetcher
+        self.prefetcher = prefetcher
+        self.checkpoint = checkpoint
+        self.embed_batch_size = embed_batch_size
+        self.encoder = encoder
+        self._admitted = 0
+        self._admit_lock = threading.Lock()
+
+        self.pipeline = StagedPipeline(
+            [
+                StageSpec("fetch", self._fetch, workers=fetch_workers, queue_size=INGESTION.pipeline_queue_size),
+                StageSpec("transform", self._transform, workers=INGESTION.transform_workers, queue_size=INGESTION.pipeline_queue_size),
+                StageSpec("embed", self._embed, workers=INGESTION.embed_workers, batch_size=embed_batch_size, queue_size=INGESTION.pipeline_queue_size),
+                StageSpec("write", self._write, workers=INGESTION.write_workers, batch_size=batch_size, queue_size=INGESTION.pipeline_queue_size),
+            ],
+            batch_wait_seconds=INGESTION.pipeline_batch_wait_seconds,
+            report_interval_seconds=INGESTION.pipeline_report_interval_seconds,
+            label=label,
+        )
+
+    @property
+    def failed_ids(self)->List[int]:
+        return self.checkpoint.failed_ids
+
+    def run(self):
+        if self.checkpoint.remaining_budget <= 0:
+            print("Limit already reached for", self.checkpoint.summary())
+            return
+        try:
+            self.pipeline.run(self.checkpoint.object_ids[self.checkpoint.cursor:])
+        finally:
+            self.checkpoint.save()
+            print(self.checkpoint.summary())
+
+    def _fetch(self, object_ids:List[int]):
+        for object_id in object_ids:
+            object_response = self.fetcher.fetch_object(object_id)
+            if not object_response:
+                self.checkpoint.mark_failed([object_id])
+                continue
+            yield object_response
+
+    def _transform(self, object_responses:List[ObjectResponse]):
+        for object_response in object_responses:
+            artwork = prepare_artwork(object_response)
+            if artwork is None:
+                self.checkpoint.mark_skipped([object_response['objectID']])
+                continue
+            if not self._admit():
+                continue  # over the limit: left unresolved for the next run
+            yield artwork
+
+    def _admit(self)->bool:
+        # Cap what reaches embed/write at the budget, however far fetch ran ahead.
+        with self._admit_lock:
+            if self._admitted >= self.checkpoint.remaining_budget:
+                self.pipeline.stop()
+                return False
+            self._admitted += 1
+            return True
+
+    def _embed(self, list_of_artworks:List[ArtworkModel]):
+        embed_artworks(list_of_artworks, batch_size=self.embed_batch_size, encoder=self.encoder)
+        return list_of_artworks
+
+    def _write(self, list_of_artworks:List[ArtworkModel]):
+        db_batch_insert_artwork(list_of_artworks)
+        if self.prefetcher is not None:
+            self.prefetcher.submit(artwork.get('primaryImageSmall') for artwork in list_of_artworks)
+        with self._admit_lock:
+            self.checkpoint.mark_written(artwork['objectID'] for artwork in list_of_artworks)
+            self._admitted -= len(list_of_artworks)
+        self.checkpoint.save()
+        if self.checkpoint.remaining_budget <= 0:
+            self.pipeline.stop()
+        return ()
+
+
+def list_pending_object_ids(dept_id:int, fetcher:MetObjectFetcher)->List[int]:
+    object_ids: List[int] = fetcher.get_object_ids_by_department(department_id=dept_id)
 
     if(len(object_ids) == 0):
         print("No Object Ids found for", object_ids)
 
+    existing_ids = fetch_existing_object_ids(object_ids)
+    pending_ids = [object_id for object_id in object_ids if object_id not in existing_ids]
+    print(f"{len(existing_ids)} objects already ingested, {len(pending_ids)} pending for dept id {dept_id}")
+    return pending_ids
 
-    list_of_artworks: List[ArtworkModel] = []
-    dept_objects_in_db = 0
-
-    for object_id in object_ids:
-
-        if check_object_exists(object_id):
-            continue
-        
-        time.sleep(DELAY_SECONDS)
-        
-
-        object_response:ObjectResponse = get_objects_by_object_id(object_id)
-        if not object_response:
-            db_batch_insert_artwork(list_of_artworks)
-            print("Failed to complete collection, try again later")
-            break
 
+def prepare_department_checkpoint(dept_id:int, limit:int, fetcher:MetObjectFetcher, *, resume:bool = False,
+                                  checkpoint_path:Path | None = None, persist:bool = True)->IngestionCheckpoint:
+    """
+    Load and resume the department's manifest, or snapshot its pending ids into
+    a new one. With persist=False nothing is written to disk (dry runs).
+    """
+    checkpoint_path = checkpoint_path or checkpoint_path_for(dept_id)
 
-        artwork_response:ArtworkModel = transform_object_to_artwork(object_response)
+    if resume and checkpoint_path.exists():
+        checkpoint = IngestionCheckpoint.load(checkpoint_path)
+        if not persist:
+            checkpoint.path = None
+        checkpoint = checkpoint.resume(limit=limit)
+        print(f"Resuming from {checkpoint_path}: {len(checkpoint.object_ids)} ids left "
+              f"(failed ids first), {checkpoint.written} already written")
+        return checkpoint
 
-        current_img = artwork_response.get('primaryImageSmall')
-        artwork_response['primaryImageSmall'] = current_img or f"https://collectionapi.metmuseum.org/api/collection/v1/iiif/{artwork_response['objectID']}/thumbnail/restricted"
+    if resume:
+        print(f"No checkpoint at {checkpoint_path}, starting a fresh run")
 
-        
-        if validate_object_response(artwork_response):
-            artwork_response['embedding'] = encode_text(artwork_response['searchable_text'])
-            list_of_artworks.append(artwork_response) 
-        
-        
-        if len(list_of_artworks) == BATCH_SIZE:
+    pending_ids = list_pending_object_ids(dept_id, fetcher)
+    return IngestionCheckpoint.start(dept_id, pending_ids, limit=limit, path=checkpoint_path if persist else None)
 
-            print('STARTING WITH BATCH PROCESS...')
-            db_batch_insert_artwork(list_of_artworks)
-            dept_objects_in_db+=len(list_of_artworks)
-            list_of_artworks:List[ArtworkModel] = [] 
-        
-        if dept_objects_in_db >= limit:
-            break
 
-    db_batch_insert_artwork(list_of_artworks)
-    print("Data Collection from dept id", dept_id, " is completed!")
\ No newline at end of file
+"""
+limit: Number of column in the database could differ in the db
+resume: continue from the department's checkpoint manifest instead of starting over
+"""
+def save_batched_list_of_artworks(dept_id:int, limit:int = 3000, fetcher:MetObjectFetcher | None = None,
+                                  fetch_workers:int | None = None, embed_batch_size:int = EMBED_BATCH_SIZE,
+                                  batch_size:int = BATCH_SIZE, resume:bool = False,
+                                  checkpoint_path:Path | None = None):
+
+    if fetcher is None:
+        with MetObjectFetcher() as owned_fetcher:
+            return save_batched_list_of_artworks(dept_id, limit, fetcher=owned_fetcher, fetch_workers=fetch_workers,
+                                                 embed_batch_size=embed_batch_size, batch_size=batch_size,
+                                                 resume=resume, checkpoint_path=checkpoint_path)
+
+    checkpoint = prepare_department_checkpoint(dept_id, limit, fetcher, resume=resume, checkpoint_path=checkpoint_path)
+
+    prefetcher = open_thumbnail_prefetcher()
+    run = ArtworkIngestionRun(
+        fetcher=fetcher,
+        checkpoint=checkpoint,
+        fetch_workers=fetch_workers or fetcher.max_in_flight,
+        embed_batch_size=embed_batch_size,
+        batch_size=batch_size,
+        prefetcher=prefetcher,
+        label=f"dept {dept_id}",
+    )
+    try:
+        run.run()
+    finally:
+        if prefetcher is not None:
+            prefetcher.close()
+            print(prefetcher.report())
+
+    if run.failed_ids:
+        print(f"{len(run.failed_ids)} objects could not be fetched; rerun with --resume to retry them:", run.failed_ids[:20])
+    print(fetcher.cache.stats)
+    print(describe_embedding_cache())
+    print("Data Collection from dept id", dept_id, " is completed!")
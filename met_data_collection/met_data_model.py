@@ -23,4 +23,5 @@ class ObjectResponse(TypedDict):
 class ArtworkModel(ObjectResponse):
     searchable_text:str
     embedding:list
+    embeddings:dict  # embedding column -> vector, one per writable embedding version
 
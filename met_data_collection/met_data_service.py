@@ -1,5 +1,5 @@
 
-from typing import List
+from typing import Iterable, List
 
 from .load_data import ArtworkModel
 
@@ -19,20 +19,22 @@ def db_batch_insert_artwork(list_of_artworks:List[ArtworkModel]):
         "title", 
         "department", 
         "searchable_text", 
-        "embedding"
     ]    
 
 
+    if not list_of_artworks:
+        print("No artworks to insert.")
+        return
+
+    # One column per writable embedding version (just "embedding" outside a re-embed).
+    EMBEDDING_COLUMNS = list(list_of_artworks[0].get('embeddings') or {"embedding": None})
+    COLUMNS = COLUMNS + EMBEDDING_COLUMNS
+
     INSERT_SQL = f"""
         INSERT INTO {TABLE_NAME} ({', '.join(COLUMNS)})
         VALUES ({', '.join(['%s'] * len(COLUMNS))})
         ON CONFLICT (met_object_id) DO NOTHING;
     """
-
-
-    if not list_of_artworks:
-        print("No artworks to insert.")
-        return
     
     data_to_insert = []
     
@@ -49,7 +51,10 @@ def db_batch_insert_artwork(list_of_artworks:List[ArtworkModel]):
             artwork.get('title'),
             artwork.get('department'),
             artwork['searchable_text'],
-            artwork['embedding'] 
+            *(
+                (artwork.get('embeddings') or {}).get(column, artwork.get('embedding'))
+                for column in EMBEDDING_COLUMNS
+            ),
         )
         data_to_insert.append(row_tuple)
 
@@ -90,4 +95,29 @@ def check_object_exists(object_id: int) -> bool:
             
     except psycopg.Error as e:
         print(f"Database error occurred: {e}")
-        return False
\ No newline at end of file
+        return False
+
+
+def fetch_existing_object_ids(object_ids: Iterable[int], chunk_size: int = 10000) -> frozenset[int]:
+    """
+    Return the subset of `object_ids` already stored in `artwork`.
+
+    Replaces one `check_object_exists` round trip per object with one
+    `= ANY(...)` lookup per chunk, all on a single pooled connection.
+    """
+    sql = """
+    SELECT met_object_id
+    FROM artwork
+    WHERE met_object_id = ANY(%s)
+    """
+
+    candidates = list(object_ids)
+    existing: set[int] = set()
+
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            for start in range(0, len(candidates), chunk_size):
+                cur.execute(sql, (candidates[start : start + chunk_size],))
+                existing.update(row[0] for row in cur.fetchall())
+
+    return frozenset(existing)
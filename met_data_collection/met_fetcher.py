@@ -0,0 +1,203 @@
+"""Concurrent, rate-limited fetcher for Met collection objects."""
+
+from __future__ import annotations
+
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+import random
+import threading
+import time
+from typing import Iterable, Iterator
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils.config import INGESTION
+from utils.http_cache import CacheMissError, HttpCache, get_http_cache
+
+from .met_data_model import ObjectResponse
+
+THROTTLED_STATUS_CODES = {403, 429}
+RETRYABLE_STATUS_CODES = THROTTLED_STATUS_CODES | {500, 502, 503, 504}
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket whose refill rate adapts to server pushback.
+
+    `penalize` halves the rate (never below `min_rate`) whenever the API
+    answers 403/429; `reward` creeps back towards `max_rate` on success.
+    """
+
+    def __init__(self, rate: float, *, capacity: float | None = None, min_rate: float = 0.2) -> None:
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.max_rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                wait = (1.0 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def penalize(self) -> None:
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._tokens = 0.0
+
+    def reward(self) -> None:
+        with self._lock:
+            if self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate * 1.05)
+
+
+class MetObjectFetcher:
+    """
+    Keeps up to `max_in_flight` object requests running on a thread pool that
+    shares one keep-alive HTTP session and one token bucket.
+    """
+
+    def __init__(
+        self,
+        *,
+        base_url: str = INGESTION.met_api_base_url,
+        max_in_flight: int = INGESTION.fetch_max_in_flight,
+        requests_per_second: float = INGESTION.fetch_requests_per_second,
+        max_retries: int = INGESTION.fetch_max_retries,
+        backoff_base_seconds: float = INGESTION.fetch_backoff_base_seconds,
+        backoff_max_seconds: float = INGESTION.fetch_backoff_max_seconds,
+        timeout_seconds: float = 30.0,
+        cache: HttpCache | None = None,
+    ) -> None:
+        if max_in_flight <= 0:
+            raise ValueError("max_in_flight must be positive")
+        self.base_url = base_url.rstrip("/")
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.backoff_base_seconds = backoff_base_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self.timeout_seconds = timeout_seconds
+        self.limiter = TokenBucket(requests_per_second)
+        self.cache = cache or get_http_cache()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_in_flight)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def __enter__(self) -> "MetObjectFetcher":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.session.close()
+
+    def get_object_ids_by_department(self, department_id: int) -> list[int]:
+        response = self._get(f"{self.base_url}/objects", params={"departmentIds": department_id})
+        if response is None:
+            return []
+        return response.json().get("objectIDs") or []
+
+    def object_url(self, object_id: int) -> str:
+        return f"{self.base_url}/objects/{object_id}"
+
+    def is_cached(self, object_id: int) -> bool:
+        return self.cache.contains(self.object_url(object_id))
+
+    def fetch_object(self, object_id: int) -> ObjectResponse:
+        """Fetch one object, retrying throttled/transient failures. Returns {} on failure."""
+        response = self._get(self.object_url(object_id))
+        if response is None:
+            return {}
+
+        result = response.json()
+        object_response: ObjectResponse = dict(
+            (k, result.get(k)) for k in ObjectResponse.__annotations__
+        )
+        return object_response
+
+    def fetch_many(self, object_ids: Iterable[int]) -> Iterator[tuple[int, ObjectResponse]]:
+        """
+        Yield (object_id, object_response) in input order while keeping the
+        request window full. Closing the generator cancels queued requests.
+        """
+        ids = iter(object_ids)
+        window: deque[tuple[int, Future]] = deque()
+
+        with ThreadPoolExecutor(
+            max_workers=self.max_in_flight, thread_name_prefix="met-fetch"
+        ) as executor:
+            try:
+                for object_id in ids:
+                    window.append((object_id, executor.submit(self.fetch_object, object_id)))
+                    if len(window) >= self.max_in_flight:
+                        break
+
+                while window:
+                    object_id, future = window.popleft()
+                    next_id = next(ids, None)
+                    if next_id is not None:
+                        window.append((next_id, executor.submit(self.fetch_object, next_id)))
+                    yield object_id, future.result()
+            finally:
+                for _, future in window:
+                    future.cancel()
+
+    def _get(self, url: str, params: dict | None = None) -> requests.Response | None:
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.cache.get(
+                    url,
+                    params=params,
+                    session=self.session,
+                    timeout=self.timeout_seconds,
+                    before_request=self.limiter.acquire,
+                )
+            except CacheMissError as exc:
+                print(exc)
+                return None
+            except requests.RequestException as exc:
+                print(f"Request to {url} failed ({exc}); attempt {attempt + 1}")
+                self._sleep_backoff(attempt)
+                continue
+
+            if response.status_code == 200:
+                self.limiter.reward()
+                return response
+
+            if response.status_code in THROTTLED_STATUS_CODES:
+                self.limiter.penalize()
+
+            if response.status_code not in RETRYABLE_STATUS_CODES:
+                break
+
+            print(f"RETRYING {url} after HTTP {response.status_code} ...")
+            self._sleep_backoff(attempt, retry_after=response.headers.get("Retry-After"))
+
+        print("Failed to process the request for", url)
+        return None
+
+    def _sleep_backoff(self, attempt: int, *, retry_after: str | None = None) -> None:
+        delay = min(self.backoff_max_seconds, self.backoff_base_seconds * (2 ** attempt))
+        delay = random.uniform(delay / 2, delay)  # jitter so workers do not retry in lockstep
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, float(retry_after))
+        time.sleep(delay)
@@ -0,0 +1,361 @@
+"""
+Ingest several Met departments in one process.
+
+Every department runs its own ArtworkIngestionRun (and checkpoint), but all
+of them share one MetObjectFetcher (so one token bucket is the global API
+rate budget), one SharedEmbedder (one model, flush batches from different
+departments coalesced into a single encode_batch call) and the process-wide
+connection pool for writes.
+"""
+
+from __future__ import annotations
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+import queue
+import threading
+import time
+from typing import Callable, List
+
+from utils.config import INGESTION
+from utils.embedding_cache import describe_embedding_cache
+from utils.embeddings import encode_batch
+from utils.thumbnail_cache import ThumbnailPrefetcher
+
+from .checkpoint import IngestionCheckpoint
+from .load_data import (
+    BATCH_SIZE,
+    EMBED_BATCH_SIZE,
+    ArtworkIngestionRun,
+    open_thumbnail_prefetcher,
+    prepare_department_checkpoint,
+)
+from .met_fetcher import MetObjectFetcher
+
+_CLOSE = object()
+
+
+@dataclass(frozen=True)
+class DepartmentJob:
+    dept_id: int
+    limit: int
+
+    @classmethod
+    def parse(cls, spec: str, default_limit: int) -> "DepartmentJob":
+        """Parse "11" or "11:500" (dept id, optional limit)."""
+        dept_id, _, limit = spec.partition(":")
+        try:
+            return cls(dept_id=int(dept_id), limit=int(limit) if limit else default_limit)
+        except ValueError:
+            raise ValueError(f"Invalid department spec '{spec}', expected <dept_id>[:<limit>]") from None
+
+
+class SharedEmbedder:
+    """
+    One embedding worker for every department in the process.
+
+    `encode` has the same signature as `encode_batch` and blocks until its
+    texts are embedded. Requests that arrive while the worker is busy are
+    merged into the next model call, up to `batch_size` texts.
+    """
+
+    def __init__(
+        self,
+        *,
+        batch_size: int = EMBED_BATCH_SIZE,
+        max_wait_seconds: float = 0.05,
+        encoder: Callable[..., List[List[float]]] = encode_batch,
+    ) -> None:
+        self.batch_size = batch_size
+        self.max_wait_seconds = max_wait_seconds
+        self.encoder = encoder
+        self.calls = 0
+        self.texts = 0
+        self.seconds = 0.0
+        self._requests: queue.Queue = queue.Queue()
+        self._thread = threading.Thread(target=self._serve, name="shared-embedder", daemon=True)
+        self._thread.start()
+
+    def encode(self, texts: List[str], batch_size: int | None = None,
+               model_name: str | None = None) -> List[List[float]]:
+        future: Future = Future()
+        self._requests.put((list(texts), model_name, future))
+        return future.result()
+
+    def close(self) -> None:
+        self._requests.put(_CLOSE)
+        self._thread.join()
+
+    def report(self) -> str:
+        rate = self.texts / self.seconds if self.seconds > 0 else 0.0
+        return f"embedder: {self.texts} texts in {self.calls} calls, {self.seconds:.2f}s busy ({rate:.1f} texts/s)"
+
+    def _serve(self) -> None:
+        closing = False
+        carry = None
+        while carry is not None or not closing:
+            request = carry if carry is not None else self._requests.get()
+            carry = None
+            if request is _CLOSE:
+                return
+
+            pending = [request]
+            size = len(request[0])
+            deadline = time.monotonic() + self.max_wait_seconds
+            while size < self.batch_size and not closing:
+                try:
+                    request = self._requests.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if request is _CLOSE:
+                    closing = True
+                    break
+                if size + len(request[0]) > self.batch_size:
+                    carry = request  # would overflow this call; it starts the next one
+                    break
+                pending.append(request)
+                size += len(request[0])
+
+            self._encode(pending)
+
+    def _encode(self, pending: list[tuple[List[str], str | None, Future]]) -> None:
+        # Only requests for the same model can share a call (several models coexist during a re-embed).
+        by_model: dict[str | None, list[tuple[List[str], Future]]] = {}
+        for request_texts, model_name, future in pending:
+            by_model.setdefault(model_name, []).append((request_texts, future))
+
+        for model_name, requests in by_model.items():
+            texts = [text for request_texts, _ in requests for text in request_texts]
+            started = time.perf_counter()
+            try:
+                embeddings = self.encoder(texts, batch_size=self.batch_size, model_name=model_name)
+            except BaseException as exc:
+                for _, future in requests:
+                    future.set_exception(exc)
+                continue
+            self.seconds += time.perf_counter() - started
+            self.calls += 1
+            self.texts += len(texts)
+
+            offset = 0
+            for request_texts, future in requests:
+                future.set_result(embeddings[offset : offset + len(request_texts)])
+                offset += len(request_texts)
+
+
+@dataclass
+class DepartmentProgress:
+    job: DepartmentJob
+    status: str = "queued"
+    checkpoint: IngestionCheckpoint | None = None
+    written_at_start: int = 0
+    started: float | None = None
+    finished: float | None = None
+    error: BaseException | None = None
+
+    @property
+    def written(self) -> int:
+        return self.checkpoint.written if self.checkpoint else 0
+
+    @property
+    def written_this_run(self) -> int:
+        return self.written - self.written_at_start
+
+    def objects_per_second(self, now: float) -> float:
+        if self.started is None:
+            return 0.0
+        elapsed = (self.finished or now) - self.started
+        return self.written_this_run / elapsed if elapsed > 0 else 0.0
+
+    def line(self, now: float) -> str:
+        return (
+            f"dept {self.job.dept_id}: {self.status}, {self.written}/{self.job.limit} written "
+            f"({self.objects_per_second(now):.1f} obj/s)"
+        )
+
+
+@dataclass
+class DepartmentEstimate:
+    dept_id: int
+    limit: int
+    already_written: int
+    pending: int
+    to_fetch: int
+    cached: int
+
+    @property
+    def network_requests(self) -> int:
+        return self.to_fetch - self.cached
+
+
+@dataclass
+class IngestionPlan:
+    estimates: list[DepartmentEstimate] = field(default_factory=list)
+    requests_per_second: float = 0.0
+
+    @property
+    def network_requests(self) -> int:
+        return sum(estimate.network_requests for estimate in self.estimates)
+
+    @property
+    def eta_seconds(self) -> float:
+        return self.network_requests / self.requests_per_second if self.requests_per_second > 0 else 0.0
+
+    def report(self) -> str:
+        lines = [
+            f"dept {e.dept_id}: limit {e.limit}, {e.already_written} written, {e.pending} pending, "
+            f"~{e.to_fetch} to fetch ({e.cached} cached, {e.network_requests} from the API)"
+            for e in self.estimates
+        ]
+        lines.append(
+            f"total: ~{self.network_requests} API requests at {self.requests_per_second:g} req/s "
+            f"-> at least {self.eta_seconds / 60:.1f} min (fetch-bound; retries and invalid objects add more)"
+        )
+        return "\n".join(lines)
+
+
+class MultiDepartmentIngestion:
+    """
+    Schedules department runs on `parallel` threads. Fetching is I/O bound and
+    the one embedding model already uses every core, so threads in a single
+    process share the rate budget, the model and the pool without any IPC.
+    """
+
+    def __init__(
+        self,
+        jobs: list[DepartmentJob],
+        *,
+        parallel: int = 2,
+        fetch_workers: int | None = None,
+        embed_batch_size: int = EMBED_BATCH_SIZE,
+        batch_size: int = BATCH_SIZE,
+        resume: bool = False,
+        fetcher: MetObjectFetcher | None = None,
+        encoder: Callable[..., List[List[float]]] = encode_batch,
+        report_interval_seconds: float = INGESTION.pipeline_report_interval_seconds,
+    ) -> None:
+        if not jobs:
+            raise ValueError("at least one department is required")
+        if len({job.dept_id for job in jobs}) != len(jobs):
+            raise ValueError("each department may only be listed once")
+        if parallel <= 0:
+            raise ValueError("parallel must be positive")
+
+        self.jobs = jobs
+        self.parallel = min(parallel, len(jobs))
+        self.fetch_workers = fetch_workers or INGESTION.fetch_max_in_flight
+        self.embed_batch_size = embed_batch_size
+        self.batch_size = batch_size
+        self.resume = resume
+        self.encoder = encoder
+        self.report_interval_seconds = report_interval_seconds
+        self.progress = {job.dept_id: DepartmentProgress(job) for job in jobs}
+
+        self._owns_fetcher = fetcher is None
+        self.fetcher = fetcher or MetObjectFetcher(max_in_flight=self.parallel * self.fetch_workers)
+        self._done = threading.Event()
+
+    def estimate(self) -> IngestionPlan:
+        """Dry run: snapshot pending ids per department without writing anything."""
+        plan = IngestionPlan(requests_per_second=self.fetcher.limiter.max_rate)
+        for job in self.jobs:
+            checkpoint = prepare_department_checkpoint(job.dept_id, job.limit, self.fetcher,
+                                                       resume=self.resume, persist=False)
+            pending = checkpoint.object_ids[checkpoint.cursor:]
+            to_fetch = pending[: checkpoint.remaining_budget]
+            plan.estimates.append(
+                DepartmentEstimate(
+                    dept_id=job.dept_id,
+                    limit=job.limit,
+                    already_written=checkpoint.written,
+                    pending=len(pending),
+                    to_fetch=len(to_fetch),
+                    cached=sum(1 for object_id in to_fetch if self.fetcher.is_cached(object_id)),
+                )
+            )
+        return plan
+
+    def run(self) -> dict[int, DepartmentProgress]:
+        embedder = SharedEmbedder(batch_size=self.embed_batch_size, encoder=self.encoder)
+        prefetcher = open_thumbnail_prefetcher()
+        monitor = threading.Thread(target=self._monitor, name="orchestrator-monitor", daemon=True)
+        started = time.perf_counter()
+        monitor.start()
+        try:
+            with ThreadPoolExecutor(max_workers=self.parallel, thread_name_prefix="dept") as executor:
+                futures = [executor.submit(self._run_department, job, embedder, prefetcher) for job in self.jobs]
+                for future in futures:
+                    future.result()
+        finally:
+            self._done.set()
+            monitor.join()
+            embedder.close()
+            if prefetcher is not None:
+                prefetcher.close()
+            if self._owns_fetcher:
+                self.fetcher.close()
+
+        print(self.report())
+        print(embedder.report())
+        print(self.fetcher.cache.stats)
+        print(describe_embedding_cache())
+        if prefetcher is not None:
+            print(prefetcher.report())
+        print(f"Ingested {self._total_written_this_run()} artworks from {len(self.jobs)} departments "
+              f"in {time.perf_counter() - started:.2f}s")
+
+        failed = [p for p in self.progress.values() if p.error is not None]
+        if failed:
+            raise RuntimeError(
+                "Ingestion failed for departments "
+                + ", ".join(f"{p.job.dept_id} ({p.error})" for p in failed)
+                + "; rerun with --resume"
+            ) from failed[0].error
+        return self.progress
+
+    def report(self) -> str:
+        now = time.monotonic()
+        active = [p for p in self.progress.values() if p.started is not None]
+        elapsed = max((p.finished or now) for p in active) - min(p.started for p in active) if active else 0.0
+        total_written = sum(p.written for p in self.progress.values())
+        total_limit = sum(job.limit for job in self.jobs)
+        rate = self._total_written_this_run() / elapsed if elapsed > 0 else 0.0
+        lines = [f"[orchestrator] {total_written}/{total_limit} written ({rate:.1f} obj/s overall)"]
+        lines.extend(f"  {self.progress[job.dept_id].line(now)}" for job in self.jobs)
+        return "\n".join(lines)
+
+    def _run_department(self, job: DepartmentJob, embedder: SharedEmbedder,
+                        prefetcher: ThumbnailPrefetcher | None = None) -> None:
+        progress = self.progress[job.dept_id]
+        progress.status = "preparing"
+        try:
+            checkpoint = prepare_department_checkpoint(job.dept_id, job.limit, self.fetcher, resume=self.resume)
+            progress.checkpoint = checkpoint
+            progress.written_at_start = checkpoint.written
+            progress.started = time.monotonic()
+            progress.status = "running"
+
+            ArtworkIngestionRun(
+                fetcher=self.fetcher,
+                checkpoint=checkpoint,
+                fetch_workers=self.fetch_workers,
+                embed_batch_size=self.embed_batch_size,
+                batch_size=self.batch_size,
+                encoder=embedder.encode,
+                prefetcher=prefetcher,
+                label=f"dept {job.dept_id}",
+            ).run()
+            progress.status = "done"
+        except Exception as exc:
+            print(f"Department {job.dept_id} failed: {exc}")
+            progress.status = "failed"
+            progress.error = exc
+        finally:
+            progress.finished = time.monotonic()
+
+    def _total_written_this_run(self) -> int:
+        return sum(p.written_this_run for p in self.progress.values())
+
+    def _monitor(self) -> None:
+        while not self._done.wait(timeout=self.report_interval_seconds):
+            print(self.report())
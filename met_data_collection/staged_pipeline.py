@@ -0,0 +1,211 @@
+"""
+Small threaded pipeline: stages connected by bounded queues.
+
+Every stage pulls items from its input queue, groups them into batches of up
+to `batch_size`, hands each batch to its handler and pushes whatever the
+handler yields onto the next stage's queue. Queues are bounded, so a slow
+stage blocks its producers instead of letting memory grow (backpressure).
+
+Shutdown is sentinel based: once the source is exhausted (or `stop()` is
+called) every worker flushes its partial batch, and the last worker of a
+stage forwards one sentinel per downstream worker. After `stop()` the first
+stage discards raw source items still queued; anything past it is flushed.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+import queue
+import threading
+import time
+from typing import Any, Callable, Iterable
+
+from .ingestion_stats import IngestionStats
+
+_SENTINEL = object()
+
+
+@dataclass(frozen=True)
+class StageSpec:
+    name: str
+    handler: Callable[[list[Any]], Iterable[Any]]
+    workers: int = 1
+    batch_size: int = 1
+    queue_size: int = 64
+
+
+@dataclass
+class QueueDepth:
+    samples: int = 0
+    total: int = 0
+    peak: int = 0
+
+    def observe(self, depth: int) -> None:
+        self.samples += 1
+        self.total += depth
+        self.peak = max(self.peak, depth)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.samples if self.samples else 0.0
+
+
+class StagedPipeline:
+    def __init__(
+        self,
+        stages: list[StageSpec],
+        *,
+        stats: IngestionStats | None = None,
+        batch_wait_seconds: float = 1.0,
+        report_interval_seconds: float = 10.0,
+        label: str = "pipeline",
+    ) -> None:
+        if not stages:
+            raise ValueError("pipeline needs at least one stage")
+        for spec in stages:
+            if spec.workers <= 0 or spec.batch_size <= 0 or spec.queue_size <= 0:
+                raise ValueError(f"stage '{spec.name}' needs positive workers, batch_size and queue_size")
+
+        self.stages = stages
+        self.stats = stats or IngestionStats()
+        self.batch_wait_seconds = batch_wait_seconds
+        self.report_interval_seconds = report_interval_seconds
+        self.label = label
+
+        self.queues = [queue.Queue(maxsize=spec.queue_size) for spec in stages]
+        self.queue_depths = {spec.name: QueueDepth() for spec in stages}
+
+        self._stop = threading.Event()
+        self._done = threading.Event()
+        self._errors: list[BaseException] = []
+        self._lock = threading.Lock()
+        self._remaining_workers = [spec.workers for spec in stages]
+
+    def stop(self) -> None:
+        """Stop feeding new source items; everything already queued is still processed."""
+        self._stop.set()
+
+    @property
+    def stopped(self) -> bool:
+        return self._stop.is_set()
+
+    def run(self, source: Iterable[Any]) -> None:
+        threads = [threading.Thread(target=self._feed, args=(source,), name=f"{self.label}-source")]
+        for index, spec in enumerate(self.stages):
+            threads.extend(
+                threading.Thread(target=self._work, args=(index,), name=f"{self.label}-{spec.name}-{n}")
+                for n in range(spec.workers)
+            )
+        monitor = threading.Thread(target=self._monitor, name=f"{self.label}-monitor", daemon=True)
+
+        for thread in threads:
+            thread.start()
+        monitor.start()
+
+        for thread in threads:
+            thread.join()
+        self._done.set()
+        monitor.join()
+
+        print(self.report())
+        if self._errors:
+            raise self._errors[0]
+
+    def report(self) -> str:
+        depths = ", ".join(
+            f"{name} q(mean {depth.mean:.1f}, peak {depth.peak}/{spec.queue_size})"
+            for spec, (name, depth) in zip(self.stages, self.queue_depths.items())
+        )
+        return f"{self.stats.report(self.label)} | {depths}"
+
+    def _feed(self, source: Iterable[Any]) -> None:
+        first = self.queues[0]
+        iterator = iter(source)
+        try:
+            for item in iterator:
+                if self._stop.is_set():
+                    break
+                self._put(first, item)
+        except BaseException as exc:
+            self._fail(exc)
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+            for _ in range(self.stages[0].workers):
+                first.put(_SENTINEL)
+
+    def _put(self, target: queue.Queue, item: Any) -> None:
+        # Blocking put with a timeout so a stop/failure never wedges a producer forever.
+        while True:
+            try:
+                target.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                if self._errors:
+                    return
+
+    def _work(self, index: int) -> None:
+        spec = self.stages[index]
+        inbox = self.queues[index]
+        outbox = self.queues[index + 1] if index + 1 < len(self.stages) else None
+        batch: list[Any] = []
+        deadline: float | None = None
+
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = inbox.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            else:
+                if item is _SENTINEL:
+                    break
+                if index == 0 and self._stop.is_set():
+                    continue
+                batch.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.batch_wait_seconds
+
+            if batch and (len(batch) >= spec.batch_size or time.monotonic() >= (deadline or 0)):
+                self._process(spec, batch, outbox)
+                batch, deadline = [], None
+
+        if batch:
+            self._process(spec, batch, outbox)
+
+        with self._lock:
+            self._remaining_workers[index] -= 1
+            last_worker = self._remaining_workers[index] == 0
+        if last_worker and outbox is not None:
+            for _ in range(self.stages[index + 1].workers):
+                outbox.put(_SENTINEL)
+
+    def _process(self, spec: StageSpec, batch: list[Any], outbox: queue.Queue | None) -> None:
+        if self._errors:
+            return  # keep draining so upstream never blocks, but do no more work
+
+        try:
+            with self.stats.stage(spec.name, len(batch)):
+                outputs = list(spec.handler(batch))
+        except BaseException as exc:
+            self._fail(exc)
+            return
+
+        if outbox is not None:
+            for output in outputs:
+                self._put(outbox, output)
+
+    def _fail(self, exc: BaseException) -> None:
+        with self._lock:
+            self._errors.append(exc)
+        self._stop.set()
+
+    def _monitor(self) -> None:
+        next_report = time.monotonic() + self.report_interval_seconds
+        while not self._done.wait(timeout=0.25):
+            for spec, inbox in zip(self.stages, self.queues):
+                self.queue_depths[spec.name].observe(inbox.qsize())
+            if time.monotonic() >= next_report:
+                print(self.report())
+                next_report += self.report_interval_seconds
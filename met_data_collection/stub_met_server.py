@@ -0,0 +1,138 @@
+"""
+Local stand-in for the Met collection API, for exercising the fetcher offline.
+
+    python -m met_data_collection.stub_met_server --port 8765 --objects 500 --throttle-every 50
+    MET_API_BASE_URL=http://127.0.0.1:8765/public/collection/v1 python fetch_met_museum_data.py 11 -l 100
+"""
+
+from __future__ import annotations
+
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import itertools
+import json
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+
+API_PREFIX = "/public/collection/v1"
+
+
+def build_stub_object(object_id: int, department_id: int = 11) -> dict:
+    return {
+        "objectID": object_id,
+        "primaryImageSmall": f"https://images.example.invalid/{object_id}.jpg",
+        "artistDisplayName": f"Stub Artist {object_id % 37}",
+        "objectDate": str(1600 + object_id % 300),
+        "medium": "Oil on canvas",
+        "culture": "Dutch",
+        "objectURL": f"https://www.metmuseum.org/art/collection/search/{object_id}",
+        "title": f"Stub Artwork {object_id}",
+        "department": f"Department {department_id}",
+        "tags": [{"term": "Still Life"}],
+    }
+
+
+class StubMetHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+
+    def do_GET(self) -> None:
+        server: StubMetServer = self.server  # type: ignore[assignment]
+        parsed = urlparse(self.path)
+
+        if server.latency_seconds:
+            time.sleep(server.latency_seconds)
+
+        if server.should_throttle():
+            self._send_json({"message": "Too many requests"}, status=server.throttle_status)
+            return
+
+        if parsed.path == f"{API_PREFIX}/objects":
+            ids = list(range(1, server.object_count + 1))
+            self._send_json({"total": len(ids), "objectIDs": ids})
+            return
+
+        if parsed.path.startswith(f"{API_PREFIX}/objects/"):
+            try:
+                object_id = int(parsed.path.rsplit("/", 1)[-1])
+            except ValueError:
+                self._send_json({"message": "Not a valid object"}, status=404)
+                return
+            if not 1 <= object_id <= server.object_count:
+                self._send_json({"message": "ObjectID not found"}, status=404)
+                return
+            department = parse_qs(parsed.query).get("departmentIds", ["11"])[0]
+            self._send_json(build_stub_object(object_id, int(department)))
+            return
+
+        self._send_json({"message": "Not found"}, status=404)
+
+    def _send_json(self, payload: dict, *, status: int = 200) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if status in {403, 429}:
+            self.send_header("Retry-After", "1")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        return
+
+
+class StubMetServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: tuple[str, int],
+        *,
+        object_count: int = 500,
+        throttle_every: int = 0,
+        throttle_status: int = 429,
+        latency_seconds: float = 0.0,
+    ) -> None:
+        super().__init__(address, StubMetHandler)
+        self.object_count = object_count
+        self.throttle_every = throttle_every
+        self.throttle_status = throttle_status
+        self.latency_seconds = latency_seconds
+        self._counter = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def should_throttle(self) -> bool:
+        if self.throttle_every <= 0:
+            return False
+        with self._lock:
+            return next(self._counter) % self.throttle_every == 0
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}{API_PREFIX}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve a local stub of the Met collection API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--objects", type=int, default=500, help="Number of object ids to expose.")
+    parser.add_argument("--throttle-every", type=int, default=0, help="Reject every Nth request (0 = never).")
+    parser.add_argument("--throttle-status", type=int, default=429, choices=(403, 429))
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds of latency per request.")
+    args = parser.parse_args()
+
+    server = StubMetServer(
+        (args.host, args.port),
+        object_count=args.objects,
+        throttle_every=args.throttle_every,
+        throttle_status=args.throttle_status,
+        latency_seconds=args.latency,
+    )
+    print(f"Stub Met API listening on {server.base_url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
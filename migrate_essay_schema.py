@@ -0,0 +1,27 @@
+import argparse
+import psycopg
+from db.db_pool import get_connection
+from essay_scraper.essay_db_service import ensure_essay_chunk_keys, ensure_essay_sentence_spans
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="One-time migration of the essay table: chunk keys (content_hash + unique index), "
+                    "folding duplicate chunks and their concept mappings into one row;\n"
+                    "then the sentence_spans column search snippets read, backfilled for stored chunks.",
+        formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.parse_args()
+
+    with get_connection() as conn:
+        try:
+            ensure_essay_chunk_keys(conn)
+            backfilled = ensure_essay_sentence_spans(conn)
+            conn.commit()
+        except psycopg.Error:
+            conn.rollback()
+            raise
+
+    print(f"essay table migrated: chunk keys in place, sentence_spans backfilled for {backfilled} chunks.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+import argparse
+from concept_data_pipeline.artwork_concept.similarity import refresh_artwork_concept_similarities
+from utils.config import INGESTION
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Refresh the materialized artwork/concept similarities used by explanations.",
+        formatter_class=argparse.RawTextHelpFormatter
+    )
+
+    parser.add_argument(
+        "--floor",
+        type=float,
+        default=INGESTION.similarity_floor,
+        help=f"Keep similarities at or above this value; changing it rebuilds the table. (Default: {INGESTION.similarity_floor})"
+    )
+
+    parser.add_argument(
+        "--fetch-size",
+        type=int,
+        default=INGESTION.affinity_fetch_size,
+        help=f"Artworks streamed and scored per block. (Default: {INGESTION.affinity_fetch_size})"
+    )
+
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Rescore everything instead of only changed concepts and new artworks."
+    )
+
+    args = parser.parse_args()
+
+    refresh_artwork_concept_similarities(
+        floor=args.floor,
+        fetch_size=args.fetch_size,
+        full=args.full,
+    )
+
+if __name__ == "__main__":
+    main()
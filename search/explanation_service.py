@@ -0,0 +1,288 @@
+"""
+Explanation graphs, off the search critical path.
+
+A deferred search answers with its results and an opaque handle instead of
+the graph. The handle carries what the graph is built from (query, detected
+concepts, artwork ids in result order) and is signed with
+EXPLANATION_HANDLE_SECRET, so any API process sharing that secret can build
+the graph from it via /api/explain/<handle>. Concept names and the prototype
+version are resolved on the server at that point, never taken from the handle. Graphs
+are computed at most once per handle: by a background prefetch started when
+the search returns, or by the first explain request, which later ones then
+share. Below the query node, graphs are shared across handles through the
+explanation graph cache (explanation/graph/graph_cache.py).
+"""
+
+from __future__ import annotations
+
+import base64
+from collections import OrderedDict
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+from dataclasses import dataclass
+import hashlib
+import hmac
+import json
+import threading
+import zlib
+
+from concept_data_pipeline.artwork_concept.generation import get_mapping_generation
+from concept_data_pipeline.artwork_concept.prototypes import ConceptMatch
+from explanation.evidence.evidence_builder import build_evidence_bundle
+from explanation.graph.build_explanation_graph import build_explanation_graph
+from explanation.graph.graph_cache import CachedSubgraph, SubgraphKey, get_graph_cache
+from explanation.graph.graph_validation import (
+    get_background_validator,
+    query_layer_errors,
+    should_validate,
+    validate_graph_objects,
+)
+from utils.config import EXPLANATIONS, HYBRID_SEARCH
+
+from .search_concept_service import MAX_QUERY_CONCEPTS, resolve_detected_concepts
+from .search_model import SearchContext
+
+EXPLANATION_MODES = ("deferred", "inline")
+# A handle only ever names the artworks of one result list; anything longer was not issued by us.
+MAX_HANDLE_LENGTH = 8192
+# Upper bound on the decompressed payload, so a small handle cannot inflate into a large allocation.
+MAX_HANDLE_PAYLOAD_BYTES = 16384
+HANDLE_TAG_BYTES = 16
+_HANDLE_KEY = EXPLANATIONS.handle_secret.encode("utf-8")
+
+if EXPLANATIONS.mode == "deferred" and not _HANDLE_KEY:
+    print("EXPLANATION_HANDLE_SECRET is not set; explanation graphs are served inline instead of deferred.")
+
+
+def resolve_explanation_mode(explanation_mode: str) -> str:
+    """
+    "deferred" only works when every API process verifies handles with the
+    same key; without EXPLANATION_HANDLE_SECRET the graph is served inline.
+    """
+    if explanation_mode == "deferred" and not _HANDLE_KEY:
+        return "inline"
+    return explanation_mode
+
+
+def _handle_tag(raw: bytes) -> bytes:
+    return hmac.new(_HANDLE_KEY, raw, hashlib.sha256).digest()[:HANDLE_TAG_BYTES]
+
+
+@dataclass(frozen=True)
+class ExplanationHandle:
+    query: str
+    detected_concepts: tuple[ConceptMatch, ...]
+    artwork_ids: tuple[int, ...]
+
+    def encode(self) -> str:
+        if not _HANDLE_KEY:
+            raise RuntimeError("EXPLANATION_HANDLE_SECRET is not set; explanation handles are disabled")
+        payload = {
+            "q": self.query,
+            "c": [
+                [c.concept_id, c.concept_name, c.confidence_score, c.normalized_score, c.similarity,
+                 c.concept_type, c.used_for_expansion]
+                for c in self.detected_concepts
+            ],
+            "a": list(self.artwork_ids),
+        }
+        raw = zlib.compress(json.dumps(payload, separators=(",", ":")).encode("utf-8"), 9)
+        return base64.urlsafe_b64encode(_handle_tag(raw) + raw).decode("ascii").rstrip("=")
+
+    @classmethod
+    def decode(cls, handle: str) -> "ExplanationHandle":
+        """Raises ValueError for anything that is not a handle issued by `encode`."""
+        if not _HANDLE_KEY or not handle or len(handle) > MAX_HANDLE_LENGTH:
+            raise ValueError("Invalid explanation handle")
+        try:
+            signed = base64.urlsafe_b64decode(handle + "=" * (-len(handle) % 4))
+            tag, raw = signed[:HANDLE_TAG_BYTES], signed[HANDLE_TAG_BYTES:]
+            if not hmac.compare_digest(tag, _handle_tag(raw)):
+                raise ValueError("unsigned handle")
+            inflater = zlib.decompressobj()
+            decompressed = inflater.decompress(raw, MAX_HANDLE_PAYLOAD_BYTES)
+            if inflater.unconsumed_tail or not inflater.eof:
+                raise ValueError("handle payload too large or truncated")
+            payload = json.loads(decompressed)
+            if len(payload["c"]) > MAX_QUERY_CONCEPTS or len(payload["a"]) > HYBRID_SEARCH.artwork_vector_limit:
+                raise ValueError("handle names more concepts or artworks than a search returns")
+            return cls(
+                query=str(payload["q"]),
+                detected_concepts=tuple(
+                    ConceptMatch(
+                        concept_id=int(concept_id),
+                        concept_name=name,
+                        confidence_score=float(confidence),
+                        normalized_score=float(normalized),
+                        similarity=float(similarity),
+                        concept_type=str(concept_type),
+                        used_for_expansion=bool(used_for_expansion),
+                    )
+                    for concept_id, name, confidence, normalized, similarity, concept_type, used_for_expansion
+                    in payload["c"]
+                ),
+                artwork_ids=tuple(int(artwork_id) for artwork_id in payload["a"]),
+            )
+        except (ValueError, TypeError, KeyError, zlib.error) as exc:
+            raise ValueError("Invalid explanation handle") from exc
+
+
+def explanation_graph_for_context(query: str, search_context: SearchContext) -> dict:
+    """
+    Evidence bundles -> graph -> validation per GRAPH_VALIDATION. Inline
+    validation reports an invalid graph as empty; with GRAPH_VALIDATION_ASYNC
+    the graph is served as built and violations are only logged.
+
+    With the server's ConceptPrototypeSet on the context, everything below the
+    query node comes from the graph cache.
+    """
+    prototype_version = search_context.concept_prototypes.version if search_context.concept_prototypes else None
+    graph_cache = get_graph_cache()
+    if not prototype_version or not graph_cache.enabled:
+        list_of_evidence_bundles = build_evidence_bundle(search_context)
+        nodes, edges = build_explanation_graph(query=query, detected_concepts=search_context.detected_concepts,
+                                               evidence_bundles=list_of_evidence_bundles)
+        return _validated_graph(query, list(nodes.values()), edges)
+
+    artwork_ids = [artwork["id"] for artwork in search_context.artworks]
+    key = SubgraphKey.of([c.concept_id for c in search_context.detected_concepts], artwork_ids, prototype_version)
+    generation = (prototype_version, get_mapping_generation())
+    subgraph = graph_cache.get(key, generation)
+    if subgraph is None:
+        list_of_evidence_bundles = build_evidence_bundle(search_context)
+        nodes, edges = build_explanation_graph(query=query, detected_concepts=search_context.detected_concepts,
+                                               evidence_bundles=list_of_evidence_bundles)
+        subgraph = CachedSubgraph.from_graph(nodes, edges)
+        graph_cache.put(key, generation, subgraph)
+
+    graph_nodes, edges, query_edges = subgraph.attach_query(query, search_context.detected_concepts, artwork_ids)
+    if subgraph.valid is None:
+        if not should_validate(EXPLANATIONS.validation, EXPLANATIONS.validation_sample_rate):
+            return {"nodes": graph_nodes, "edges": edges}
+        if EXPLANATIONS.validation_async:
+            get_background_validator().submit(graph_nodes, edges, label=query)
+            return {"nodes": graph_nodes, "edges": edges}
+        # The shared layers are judged on their own, so this request's query edges cannot condemn the entry.
+        below_query = validate_graph_objects(*subgraph.anchored_graph())
+        subgraph.valid = below_query.ok
+        if below_query.errors:
+            print("Graph Errors: ", below_query.errors)
+    # The layers below the query were validated once for this entry; only this request's edges are new.
+    errors = query_layer_errors(query_edges) if subgraph.valid else ["cached subgraph failed validation"]
+    if errors:
+        print("Graph Errors: ", errors)
+        return {"nodes": [], "edges": None}
+    return {"nodes": graph_nodes, "edges": edges}
+
+
+def _validated_graph(query: str, graph_nodes: list, edges: list) -> dict:
+    if should_validate(EXPLANATIONS.validation, EXPLANATIONS.validation_sample_rate):
+        if EXPLANATIONS.validation_async:
+            get_background_validator().submit(graph_nodes, edges, label=query)
+        else:
+            validation_result = validate_graph_objects(nodes=graph_nodes, edges=edges)
+            if validation_result.errors:
+                print("Graph Errors: " , validation_result.errors)
+                return {"nodes": [], "edges": None}
+
+    return {
+        "nodes": graph_nodes,
+        "edges": edges,
+    }
+
+
+def explanation_graph_for_handle(handle: ExplanationHandle) -> dict:
+    # Labels and the cache generation must come from this server's prototypes, not from the client.
+    detected_concepts, concept_prototypes = resolve_detected_concepts(handle.detected_concepts)
+    search_context = SearchContext(
+        artworks=[{"id": artwork_id} for artwork_id in handle.artwork_ids],
+        essays=[],
+        detected_concepts=detected_concepts,
+        concept_prototypes=concept_prototypes,
+    )
+    return explanation_graph_for_context(handle.query, search_context)
+
+
+def graph_cache_metrics() -> dict:
+    return get_graph_cache().snapshot().as_dict()
+
+
+class ExplanationCache:
+    """
+    Bounded LRU of handle -> Future, so concurrent requests for one handle
+    share a single build. Prefetches never queue up: once `max_pending`
+    builds are waiting or running, further ones are skipped and built on
+    the first /api/explain instead.
+    """
+
+    def __init__(self, max_entries: int = EXPLANATIONS.cache_size, workers: int = EXPLANATIONS.workers,
+                 max_pending: int = EXPLANATIONS.prefetch_max_pending) -> None:
+        self.max_entries = max_entries
+        self.max_pending = max_pending
+        self.skipped = 0
+        self._pending = 0
+        self._entries: OrderedDict[str, Future] = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="explain")
+
+    def prefetch(self, handle: str, context: SearchContext | None = None) -> None:
+        """Start building in the background; `context` lets the build reuse the search's own vectors."""
+        with self._lock:
+            if handle not in self._entries and self._pending >= self.max_pending:
+                self.skipped += 1
+                return
+        self._future(handle, context)
+
+    def get(self, handle: str) -> dict:
+        while True:
+            future = self._future(handle, None)
+            try:
+                return future.result()
+            except CancelledError:
+                continue  # evicted before a worker picked it up; queue it again
+            except Exception:
+                with self._lock:
+                    if self._entries.get(handle) is future:
+                        del self._entries[handle]
+                raise
+
+    def _future(self, handle: str, context: SearchContext | None) -> Future:
+        evicted: list[Future] = []
+        with self._lock:
+            future = self._entries.get(handle)
+            if future is not None:
+                self._entries.move_to_end(handle)
+                return future
+            future = self._executor.submit(self._build, handle, context)
+            self._pending += 1
+            self._entries[handle] = future
+            while len(self._entries) > self.max_entries:
+                evicted.append(self._entries.popitem(last=False)[1])
+        # Outside the lock: both may run `_finished` right here.
+        future.add_done_callback(self._finished)
+        for stale in evicted:
+            # A build nobody can look up any more should not hold a worker.
+            stale.cancel()
+        return future
+
+    def _finished(self, future: Future) -> None:
+        with self._lock:
+            self._pending -= 1
+
+    @staticmethod
+    def _build(handle: str, context: SearchContext | None) -> dict:
+        decoded = ExplanationHandle.decode(handle)
+        if context is None:
+            return explanation_graph_for_handle(decoded)
+        return explanation_graph_for_context(decoded.query, context)
+
+
+_explanation_cache: ExplanationCache | None = None
+_explanation_cache_lock = threading.Lock()
+
+
+def get_explanation_cache() -> ExplanationCache:
+    global _explanation_cache
+    with _explanation_cache_lock:
+        if _explanation_cache is None:
+            _explanation_cache = ExplanationCache()
+        return _explanation_cache
@@ -2,12 +2,16 @@
 
 from __future__ import annotations
 
+from contextlib import nullcontext
 from dataclasses import dataclass
 from typing import Sequence
 
-from utils.config import HYBRID_SEARCH
+import numpy as np
+
+from utils.config import HYBRID_SEARCH, IMAGE_EMBEDDINGS
 from db.db_pool import get_connection
-from utils.embeddings import encode_text
+from utils.embeddings import encode_batch, encode_text
+from utils.embedding_versions import EmbeddingVersion, get_active_embedding_version
 
 
 @dataclass
@@ -15,6 +19,30 @@ class SearchWeights:
     lexical_weight: float = HYBRID_SEARCH.lexical_weight
     semantic_weight: float = HYBRID_SEARCH.semantic_weight
     fallback_penalty: float = HYBRID_SEARCH.fallback_penalty
+    image_weight: float = HYBRID_SEARCH.image_weight
+
+
+@dataclass(frozen=True)
+class CandidateEmbeddings:
+    """Text embeddings of the rows a search returned, row-aligned with `ids`."""
+
+    ids: np.ndarray  # (n,) int64
+    vectors: np.ndarray  # (n, dim) float32
+    embedding_column: str
+
+    def rows_for(self, ids: Sequence[int]) -> tuple[list[int], np.ndarray]:
+        """Subset of the block for `ids`, in that order; ids without a vector are dropped."""
+        position = {int(record_id): row for row, record_id in enumerate(self.ids)}
+        found = [int(record_id) for record_id in ids if int(record_id) in position]
+        return found, self.vectors[[position[record_id] for record_id in found]]
+
+
+@dataclass(frozen=True)
+class QueryVectors:
+    """A query's text embedding, and its image-model text embedding when the retriever blends images."""
+
+    text: list[float]
+    image: list[float] | None = None
 
 
 class HybridRetriever:
@@ -23,7 +51,8 @@ class HybridRetriever:
     def __init__(self, table_name: str, select_columns: str, limit_lexical: int, limit_vector: int,
                  weights: SearchWeights | None = None,
                  lexical_fields: dict[str, str] | None = None,
-                 lexical_field_weights: dict[str, float] | None = None) -> None:
+                 lexical_field_weights: dict[str, float] | None = None,
+                 image_embedding_column: str | None = None) -> None:
         self.table = table_name
         self.columns = select_columns
         self.lexical_limit = limit_lexical
@@ -31,6 +60,10 @@ class HybridRetriever:
         self.weights = weights or SearchWeights()
         self.lexical_fields = lexical_fields or {}
         self.lexical_field_weights = lexical_field_weights or {}
+        self.image_embedding_column = image_embedding_column
+
+    def _blends_images(self) -> bool:
+        return self.image_embedding_column is not None and self.weights.image_weight > 0
 
     def _lexical_sql(self) -> str:
         field_selects = ""
@@ -92,18 +125,51 @@ class HybridRetriever:
         FROM search_results;
         """
 
-    def _vector_sql(self, filtered: bool) -> str:
+    def _vector_sql(self, filtered: bool, embedding_column: str = "embedding", with_embeddings: bool = False) -> str:
         filter_clause = "WHERE id = ANY(%s)" if filtered else ""
         return f"""
             SELECT {self.columns},
-                   1 - (embedding <=> %s::vector) AS semantic_score
+                   1 - ({embedding_column} <=> %s::vector) AS semantic_score
+                   {self._embedding_select(embedding_column, with_embeddings)}
             FROM {self.table}
             {filter_clause}
-            ORDER BY embedding <=> %s::vector
+            ORDER BY {embedding_column} <=> %s::vector
+            LIMIT {self.vector_limit};
+        """
+
+    def _blended_vector_sql(self, embedding_column: str, with_embeddings: bool = False) -> str:
+        # Candidates come from the lexical pass and both ANN indexes, so this ordering only ranks a few rows.
+        image_weight = float(self.weights.image_weight)
+        return f"""
+            SELECT {self.columns},
+                   1 - ({embedding_column} <=> %s::vector) AS semantic_score,
+                   coalesce(1 - ({self.image_embedding_column} <=> %s::vector), 0) AS image_score
+                   {self._embedding_select(embedding_column, with_embeddings)}
+            FROM {self.table}
+            WHERE id = ANY(%s)
+            ORDER BY {1 - image_weight} * ({embedding_column} <=> %s::vector)
+                   + {image_weight} * coalesce({self.image_embedding_column} <=> %s::vector, 1)
             LIMIT {self.vector_limit};
         """
 
-    def _score(self, semantic_score: float, lexical_score: float) -> float:
+    @staticmethod
+    def _embedding_select(embedding_column: str, with_embeddings: bool) -> str:
+        # The vector pass already reads this column to rank; returning it spares callers a second lookup.
+        return f", {embedding_column}::float4[] AS candidate_embedding" if with_embeddings else ""
+
+    def _ann_ids_sql(self, column: str) -> str:
+        return f"""
+            SELECT id
+            FROM {self.table}
+            WHERE {column} IS NOT NULL
+            ORDER BY {column} <=> %s::vector
+            LIMIT {self.vector_limit};
+        """
+
+    def _score(self, semantic_score: float, lexical_score: float, image_score: float | None = None) -> float:
+        if image_score is not None:
+            # Image similarity takes `image_weight` of the semantic share; the lexical share is untouched.
+            semantic_score = (1 - self.weights.image_weight) * semantic_score + self.weights.image_weight * image_score
         final_score = (
             self.weights.lexical_weight * lexical_score +
             self.weights.semantic_weight * semantic_score
@@ -112,8 +178,12 @@ class HybridRetriever:
             final_score *= self.weights.fallback_penalty
         return final_score
 
-    def _format_result(self, row: Sequence, lexical_score_map: dict[int, dict]) -> dict:
-        *fields, semantic_score = row
+    def _format_result(self, row: Sequence, lexical_score_map: dict[int, dict], with_image: bool = False) -> dict:
+        image_score = None
+        if with_image:
+            *fields, semantic_score, image_score = row
+        else:
+            *fields, semantic_score = row
         record_id = fields[0]
         lexical_info = lexical_score_map.get(
             record_id, {"score": 0.0, "matched_terms": [], "matched_fields": []}
@@ -121,9 +191,10 @@ class HybridRetriever:
         lexical_score = lexical_info.get("score", 0.0)
         matched_terms = lexical_info.get("matched_terms", [])
         matched_fields = lexical_info.get("matched_fields", [])
-        final_score = self._score(semantic_score, lexical_score)
+        final_score = self._score(semantic_score, lexical_score, image_score)
         return self._build_payload(
-            fields, semantic_score, lexical_score, final_score, matched_terms, matched_fields
+            fields, semantic_score, lexical_score, final_score, matched_terms, matched_fields,
+            image_score=image_score,
         )
 
     def _build_payload(self, fields: Sequence,
@@ -131,12 +202,57 @@ class HybridRetriever:
                        lexical_score: float,
                        final_score: float,
                        matched_terms: Sequence[str] | None = None,
-                       matched_fields: Sequence[str] | None = None) -> dict:
+                       matched_fields: Sequence[str] | None = None,
+                       image_score: float | None = None) -> dict:
         raise NotImplementedError
 
     def search(self, query: str) -> list[dict]:
-        query_vector = encode_text(query)
-        with get_connection() as conn, conn.cursor() as cur:
+        results, _ = self._search(query, with_embeddings=False)
+        return results
+
+    def search_with_embeddings(self, query: str) -> tuple[list[dict], CandidateEmbeddings]:
+        """`search`, plus the text embeddings of the returned rows as one float32 block."""
+        return self._search(query, with_embeddings=True)
+
+    def encode_queries(self, queries: Sequence[str], version: EmbeddingVersion,
+                       known: dict[str, list[float]] | None = None,
+                       batch_size: int = 32) -> list[QueryVectors]:
+        """
+        Vectors for many queries: one `encode_batch` call per model, skipping
+        the text vectors already in `known` (query -> vector for `version`).
+        Like encode_text, this bypasses the persistent embedding cache.
+        """
+        known = dict(known or {})
+        missing = list(dict.fromkeys(query for query in queries if query not in known))
+        if missing:
+            known.update(zip(missing, encode_batch(missing, batch_size=batch_size, model_name=version.model_name,
+                                                   use_cache=False)))
+        images = [None] * len(queries)
+        if self._blends_images() and queries:
+            images = encode_batch(list(queries), batch_size=batch_size, model_name=IMAGE_EMBEDDINGS.model_name,
+                                  use_cache=False)
+        return [QueryVectors(text=known[query], image=image) for query, image in zip(queries, images)]
+
+    def search_encoded(self, query: str, vectors: QueryVectors, version: EmbeddingVersion, *,
+                       with_embeddings: bool = False, conn=None) -> tuple[list[dict], CandidateEmbeddings | None]:
+        """`_search` for a query encoded up front, on `conn` when the caller already holds one."""
+        with (nullcontext(conn) if conn is not None else get_connection()) as conn:
+            return self._search_on(conn, query, vectors, version, with_embeddings)
+
+    def _search(self, query: str, with_embeddings: bool) -> tuple[list[dict], CandidateEmbeddings | None]:
+        # Resolve the version once so the query vector and the scanned column always match.
+        version = get_active_embedding_version()
+        vectors = QueryVectors(
+            text=encode_text(query, model_name=version.model_name),
+            # The image model's text tower puts the query in the same space as the thumbnails.
+            image=encode_text(query, model_name=IMAGE_EMBEDDINGS.model_name) if self._blends_images() else None,
+        )
+        return self.search_encoded(query, vectors, version, with_embeddings=with_embeddings)
+
+    def _search_on(self, conn, query: str, vectors: QueryVectors, version: EmbeddingVersion,
+                   with_embeddings: bool) -> tuple[list[dict], CandidateEmbeddings | None]:
+        query_vector, image_vector = vectors.text, vectors.image
+        with conn.cursor() as cur:
             cur.execute(self._lexical_sql(), (query,query))
             lexical_rows = cur.fetchall()
             lexical_score_map = {
@@ -145,12 +261,44 @@ class HybridRetriever:
             }
             lexical_ids = list(lexical_score_map.keys())
 
-            if lexical_ids:
+            if image_vector is not None:
+                candidate_ids = list(lexical_ids)
+                if not candidate_ids:
+                    cur.execute(self._ann_ids_sql(version.column), (query_vector,))
+                    candidate_ids = [row[0] for row in cur.fetchall()]
+                cur.execute(self._ann_ids_sql(self.image_embedding_column), (image_vector,))
+                seen = set(candidate_ids)
+                candidate_ids += [row[0] for row in cur.fetchall() if row[0] not in seen]
+                cur.execute(self._blended_vector_sql(version.column, with_embeddings),
+                            (query_vector, image_vector, candidate_ids, query_vector, image_vector))
+            elif lexical_ids:
                 id_array = f"{{{', '.join(map(str, lexical_ids))}}}"
-                cur.execute(self._vector_sql(filtered=True), (query_vector, id_array, query_vector))
+                cur.execute(self._vector_sql(filtered=True, embedding_column=version.column,
+                                             with_embeddings=with_embeddings),
+                            (query_vector, id_array, query_vector))
             else:
-                cur.execute(self._vector_sql(filtered=False), (query_vector, query_vector))
+                cur.execute(self._vector_sql(filtered=False, embedding_column=version.column,
+                                             with_embeddings=with_embeddings),
+                            (query_vector, query_vector))
 
             vector_rows = cur.fetchall()
 
-        return [self._format_result(row, lexical_score_map) for row in vector_rows]
+        embeddings = None
+        if with_embeddings:
+            embeddings = _candidate_embeddings(vector_rows, version.column)
+            vector_rows = [row[:-1] for row in vector_rows]
+        results = [self._format_result(row, lexical_score_map, with_image=image_vector is not None)
+                   for row in vector_rows]
+        return results, embeddings
+
+
+def _candidate_embeddings(rows: Sequence[Sequence], embedding_column: str) -> CandidateEmbeddings:
+    kept = [row for row in rows if row[-1]]
+    vectors = np.asarray([row[-1] for row in kept], dtype=np.float32)
+    if not kept:
+        vectors = vectors.reshape(0, 0)
+    return CandidateEmbeddings(
+        ids=np.asarray([row[0] for row in kept], dtype=np.int64),
+        vectors=vectors,
+        embedding_column=embedding_column,
+    )
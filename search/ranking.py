@@ -27,6 +27,7 @@ def apply_concept_scores(
     essay_retriever: EssayRetriever,
     weights: ConceptWeights,
     essay_boost: float,
+    conn=None,
 ) -> None:
     if not query_concepts:
         return
@@ -39,7 +40,7 @@ def apply_concept_scores(
 
         if result["result_type"] == "artwork":
             artwork_concepts = artwork_retriever.get_concept_score(
-                result["id"], concept_ids
+                result["id"], concept_ids, conn=conn
             )
             matches = [
                 qc.confidence_score * ac.confidence_score
@@ -54,7 +55,7 @@ def apply_concept_scores(
                 concept_score = matches[0]
 
         elif result["result_type"] == "essay" and essay_retriever.check_if_essay_concept_exists(
-            result["id"], concept_ids
+            result["id"], concept_ids, conn=conn
         ):
             concept_score = essay_boost
 
@@ -0,0 +1,144 @@
+"""
+JSON response bodies for the API.
+
+Bodies are serialized with orjson when it is installed (dataclasses and
+numpy scalars natively, several times faster than the stdlib), otherwise
+with the app's own JSON provider. Bodies of at least
+RESPONSE_COMPRESS_MIN_BYTES are compressed with whatever the client's
+Accept-Encoding prefers: brotli when the `brotli` package is installed,
+else gzip.
+
+`shape_payload` trims a search payload before it is encoded: `fields`
+keeps only the named keys of every result (dotted paths reach into nested
+dicts, e.g. "score.final_score"), `omit` drops keys such as an essay's
+full text, `float_digits` rounds every float.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import gzip
+from typing import Any
+
+from flask import Response, current_app, request
+import numpy as np
+
+from utils.config import API_RESPONSES
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+_ORJSON_OPTIONS = (orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS) if orjson is not None else 0
+MAX_FLOAT_DIGITS = 15
+
+
+def dumps(payload: Any) -> bytes:
+    if orjson is not None:
+        # Types orjson does not know (dates, decimals, ...) go through the app provider's fallback.
+        return orjson.dumps(payload, default=current_app.json.default, option=_ORJSON_OPTIONS)
+    return current_app.json.dumps(payload).encode("utf-8")
+
+
+def negotiate_encoding() -> str | None:
+    """The encoding to use for the current request: "br", "gzip" or None."""
+    accepted = request.accept_encodings
+    gzip_quality = accepted["gzip"]
+    if brotli is not None and accepted["br"] and accepted["br"] >= gzip_quality:
+        return "br"
+    return "gzip" if gzip_quality else None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=API_RESPONSES.brotli_quality)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=API_RESPONSES.gzip_level, mtime=0)
+    raise ValueError(f"Unsupported content encoding '{encoding}'")
+
+
+def json_response(payload: Any, status: int = 200) -> Response:
+    body = dumps(payload)
+    response = Response(body, status=status, mimetype="application/json")
+    response.vary.add("Accept-Encoding")
+    if len(body) >= API_RESPONSES.compress_min_bytes:
+        encoding = negotiate_encoding()
+        if encoding is not None:
+            response.set_data(compress(body, encoding))
+            response.headers["Content-Encoding"] = encoding
+    return response
+
+
+def parse_fields(fields: str | None) -> dict | None:
+    """'id,score.final_score' -> {"id": {}, "score": {"final_score": {}}}; an empty subtree keeps the whole value."""
+    if not fields:
+        return None
+    tree: dict = {}
+    for path in fields.split(","):
+        parts = [part for part in path.strip().split(".") if part]
+        if not parts:
+            continue
+        node = tree
+        for part in parts[:-1]:
+            if part in node and not node[part]:
+                break  # the whole value is already selected
+            node = node.setdefault(part, {})
+        else:
+            node[parts[-1]] = {}
+    return tree or None
+
+
+def parse_float_digits(value: str | None) -> int | None:
+    """Raises ValueError unless `value` is empty or a digit count the encoder can honor."""
+    if value is None or value == "":
+        return None
+    if not value.isdigit() or not 0 <= (digits := int(value)) <= MAX_FLOAT_DIGITS:
+        raise ValueError(f"round must be between 0 and {MAX_FLOAT_DIGITS}")
+    return digits
+
+
+def shape_payload(payload: dict, *, fields: dict | None = None, float_digits: int | None = None,
+                  omit: tuple[str, ...] = ()) -> dict:
+    """
+    A copy of `payload` with its results projected onto `fields` (or
+    stripped of the `omit` keys when no projection is given) and its floats
+    rounded.
+    """
+    if isinstance(payload.get("results"), list):
+        if fields is not None:
+            payload = {**payload, "results": [_project(result, fields) for result in payload["results"]]}
+        elif omit:
+            payload = {**payload, "results": [_omit(result, omit) for result in payload["results"]]}
+    if float_digits is not None:
+        payload = _round_floats(payload, float_digits)
+    return payload
+
+
+def _project(value: Any, tree: dict) -> Any:
+    if not tree or not isinstance(value, dict):
+        return value
+    return {key: _project(value[key], subtree) for key, subtree in tree.items() if key in value}
+
+
+def _omit(value: Any, keys: tuple[str, ...]) -> Any:
+    if not isinstance(value, dict) or not any(key in value for key in keys):
+        return value
+    return {key: item for key, item in value.items() if key not in keys}
+
+
+def _round_floats(value: Any, digits: int) -> Any:
+    if isinstance(value, (float, np.floating)):
+        return round(float(value), digits)
+    if isinstance(value, dict):
+        return {key: _round_floats(item, digits) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_round_floats(item, digits) for item in value]
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return {field.name: _round_floats(getattr(value, field.name), digits) for field in dataclasses.fields(value)}
+    return value
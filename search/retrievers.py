@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+from contextlib import nullcontext
+from dataclasses import asdict
 from typing import Literal, Sequence
 
 from concept_data_pipeline.artwork_concept.affinity import ArtworkConceptRecord
@@ -8,8 +10,10 @@ from utils.config import (
     ESSAY_LEXICAL_FIELD_WEIGHTS,
     FIELD_AWARE_LEXICAL,
     HYBRID_SEARCH,
+    IMAGE_EMBEDDINGS,
 )
 from search.hybrid_retriever import HybridRetriever
+from search.snippets import build_snippet
 from db.db_pool import get_connection
 
 
@@ -57,6 +61,7 @@ class ArtworkRetriever(HybridRetriever):
                 "department": "department",
             },
             lexical_field_weights=ARTWORK_LEXICAL_FIELD_WEIGHTS if FIELD_AWARE_LEXICAL else None,
+            image_embedding_column=IMAGE_EMBEDDINGS.column,
         )
 
 
@@ -65,7 +70,8 @@ class ArtworkRetriever(HybridRetriever):
                        lexical_score: float,
                        final_score: float,
                        matched_terms=None,
-                       matched_fields=None) -> dict:
+                       matched_fields=None,
+                       image_score=None) -> dict:
         artwork_id, title, artist, image_url = fields
 
         retrieval_trace:dict = compute_retrieval_trace(
@@ -75,6 +81,17 @@ class ArtworkRetriever(HybridRetriever):
             semantic_score,
             'artwork_embedding',
         )
+        score = {
+            "lexical_score": lexical_score,
+            "semantic_score": semantic_score,
+            "final_score": final_score,
+        }
+        if image_score is not None:
+            score["image_score"] = image_score
+            retrieval_trace["image_match"] = {
+                "similarity": image_score,
+                "source": "artwork_image_embedding",
+            }
 
         return {
             "result_type": "artwork",
@@ -82,11 +99,7 @@ class ArtworkRetriever(HybridRetriever):
             "title": title,
             "artist": artist,
             "image_url": image_url,
-            "score": {
-                "lexical_score": lexical_score,
-                "semantic_score": semantic_score,
-                "final_score": final_score,
-            },
+            "score": score,
             "retrieval_trace" : retrieval_trace
         }
 
@@ -94,7 +107,7 @@ class ArtworkRetriever(HybridRetriever):
         artwork_id, concept_id, confidence_score = artwork_concepts_row
         return ArtworkConceptRecord(artwork_id, concept_id, confidence_score)
     
-    def get_concept_score(self, artwork_id: int, concept_ids: list[int] = ()) -> list[ArtworkConceptRecord]:
+    def get_concept_score(self, artwork_id: int, concept_ids: list[int] = (), conn=None) -> list[ArtworkConceptRecord]:
         if not concept_ids:
             return []
         placeholders = ", ".join(["%s"] * len(concept_ids))
@@ -105,19 +118,23 @@ class ArtworkRetriever(HybridRetriever):
               AND concept_id IN ({placeholders})
         """
 
-        with get_connection() as conn, conn.cursor() as cur:
+        with (nullcontext(conn) if conn is not None else get_connection()) as conn, conn.cursor() as cur:
             cur.execute(sql, (artwork_id, *concept_ids))
             rows = cur.fetchall()
 
         return [self._format_to_artwork_concept_record(row) for row in rows]
 
 
+ESSAY_COLUMNS = "id, essay_title, chunk_text, chunk_index, source, sentence_spans"
+# Before migrate_essay_schema.py has run; snippets then split sentences at query time.
+ESSAY_COLUMNS_WITHOUT_SPANS = "id, essay_title, chunk_text, chunk_index, source, NULL::int[] AS sentence_spans"
+
+
 class EssayRetriever(HybridRetriever):
-    def __init__(self) -> None:
-        columns = "id, essay_title, chunk_text, chunk_index, source"
+    def __init__(self, with_sentence_spans: bool = True) -> None:
         super().__init__(
             table_name="essay",
-            select_columns=columns,
+            select_columns=ESSAY_COLUMNS if with_sentence_spans else ESSAY_COLUMNS_WITHOUT_SPANS,
             limit_lexical=HYBRID_SEARCH.essay_lexical_limit,
             limit_vector=HYBRID_SEARCH.essay_vector_limit,
             lexical_fields={
@@ -132,8 +149,9 @@ class EssayRetriever(HybridRetriever):
                        lexical_score: float,
                        final_score: float,
                        matched_terms=None,
-                       matched_fields=None) -> dict:
-        essay_id, essay_title, chunk_text, chunk_index, source = fields
+                       matched_fields=None,
+                       image_score=None) -> dict:
+        essay_id, essay_title, chunk_text, chunk_index, source, sentence_spans = fields
 
         retrieval_trace:dict = compute_retrieval_trace(
             matched_terms or [],
@@ -148,6 +166,7 @@ class EssayRetriever(HybridRetriever):
             "id": essay_id,
             "title": essay_title,
             "text": chunk_text,
+            "snippet": asdict(build_snippet(chunk_text, sentence_spans, matched_terms or [])),
             "chunk_index": chunk_index,
             "source": source,
             "score": {
@@ -158,7 +177,7 @@ class EssayRetriever(HybridRetriever):
             "retrieval_trace" : retrieval_trace
         }
 
-    def check_if_essay_concept_exists(self, essay_id:int, essay_concept_ids:list[int]):
+    def check_if_essay_concept_exists(self, essay_id:int, essay_concept_ids:list[int], conn=None):
         if not essay_concept_ids:
             return []
 
@@ -173,7 +192,7 @@ class EssayRetriever(HybridRetriever):
                 """
         result:bool = False
 
-        with get_connection() as conn, conn.cursor() as cur:
+        with (nullcontext(conn) if conn is not None else get_connection()) as conn, conn.cursor() as cur:
             cur.execute(sql, (essay_id, *essay_concept_ids))
             temp = cur.fetchone()
             if temp:
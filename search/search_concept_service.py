@@ -1,25 +1,86 @@
+from contextlib import nullcontext
+from dataclasses import replace
+from typing import Sequence
+
+import numpy as np
+
 from utils.embeddings import encode_text
+from utils.embedding_versions import EmbeddingVersion, get_active_embedding_version
 from concept_data_pipeline.artwork_concept.prototypes import (
     ConceptMatch,
+    ConceptPrototypeSet,
+    build_prototype_matrix,
+    concept_matches_for_matrix,
     get_concept_prototypes,
+    prototype_set_version,
     score_concepts_for_vector,
 )
 
 
 from db.db_pool import get_connection
 
+MAX_QUERY_CONCEPTS = 2
+
 
 def detect_concept_from_query(query: str) -> tuple[ConceptMatch, ...]:
-    encoded_query_text = encode_text(query)
-    prototypes = get_concept_prototypes()
-    concept_lookup = {proto.concept_id: proto.concept_name for proto in prototypes}
+    concept_scores, _ = detect_concepts_with_prototypes(query)
+    return concept_scores
+
+
+def detect_concepts_with_prototypes(query: str) -> tuple[tuple[ConceptMatch, ...], ConceptPrototypeSet]:
+    """Concept detection that also hands back the prototypes it scored against, for reuse downstream."""
+    version = get_active_embedding_version()
+    encoded_query_text = encode_text(query, model_name=version.model_name)
+    prototype_set = _prototype_set(version)
     concept_scores = score_concepts_for_vector(
         vector=encoded_query_text,
+        prototypes=prototype_set.prototypes,
+        max_concepts=MAX_QUERY_CONCEPTS,
+        concept_lookup=_concept_lookup(prototype_set),
+    )
+    return concept_scores, prototype_set
+
+
+def detect_concepts_for_vectors(
+    vectors: Sequence[Sequence[float]], version: EmbeddingVersion
+) -> tuple[list[tuple[ConceptMatch, ...]], ConceptPrototypeSet]:
+    """Concept detection for many query vectors (encoded with `version`) in one matrix product."""
+    prototype_set = _prototype_set(version)
+    concept_scores = concept_matches_for_matrix(
+        vectors=np.asarray(vectors, dtype=np.float32).reshape(len(vectors), -1),
+        matrix=prototype_set.matrix,
+        max_concepts=MAX_QUERY_CONCEPTS,
+        concept_lookup=_concept_lookup(prototype_set),
+    )
+    return concept_scores, prototype_set
+
+
+def resolve_detected_concepts(
+    concepts: Sequence[ConceptMatch],
+) -> tuple[tuple[ConceptMatch, ...], ConceptPrototypeSet]:
+    """Concepts named by a client re-read against the active prototypes: server-side names, unknown ids dropped."""
+    prototype_set = _prototype_set(get_active_embedding_version())
+    concept_lookup = _concept_lookup(prototype_set)
+    resolved = tuple(
+        replace(concept, concept_name=concept_lookup[concept.concept_id])
+        for concept in concepts
+        if concept.concept_id in concept_lookup
+    )
+    return resolved, prototype_set
+
+
+def _prototype_set(version: EmbeddingVersion) -> ConceptPrototypeSet:
+    prototypes = get_concept_prototypes(embedding_column=version.column)
+    return ConceptPrototypeSet(
         prototypes=prototypes,
-        max_concepts=2,
-        concept_lookup=concept_lookup,
+        matrix=build_prototype_matrix(prototypes),
+        embedding_column=version.column,
+        version=prototype_set_version(prototypes, version.column),
     )
-    return concept_scores
+
+
+def _concept_lookup(prototype_set: ConceptPrototypeSet) -> dict[int, str]:
+    return {proto.concept_id: proto.concept_name for proto in prototype_set.prototypes}
 
 
 def concept_has_artwork_mappings(concept_id: int) -> bool:
@@ -39,4 +100,14 @@ def concept_has_artwork_mappings(concept_id: int) -> bool:
         
 
 
-    return result
\ No newline at end of file
+    return result
+
+
+def concepts_with_artwork_mappings(concept_ids: Sequence[int], conn=None) -> set[int]:
+    """The subset of `concept_ids` `concept_has_artwork_mappings` holds for, in one query."""
+    if not concept_ids:
+        return set()
+    sql = "SELECT DISTINCT concept_id FROM artwork_concept WHERE concept_id = ANY(%s)"
+    with (nullcontext(conn) if conn is not None else get_connection()) as conn, conn.cursor() as cur:
+        cur.execute(sql, (list(concept_ids),))
+        return {row[0] for row in cur.fetchall()}
@@ -1,24 +1,207 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request, send_file, stream_with_context
 from flask_cors import CORS
-from .search_service import find_top_relevant_results
+import requests
+from explanation.graph.graph_wire import GRAPH_FORMATS, graph_for_wire
+from utils.config import API_RESPONSES, THUMBNAILS
+from .explanation_service import EXPLANATION_MODES, ExplanationHandle, graph_cache_metrics
+from .response_encoding import dumps, json_response, parse_fields, parse_float_digits, shape_payload
+from .search_service import (
+    BATCH_EXPLANATION_MODES,
+    explain_search,
+    find_top_relevant_results,
+    find_top_relevant_results_batch,
+    iter_search_events,
+)
+from .thumbnail_service import get_artwork_thumbnail
 
 app = Flask(__name__)
 
 CORS(app, resources={r"/api/*": {"origins": "http://localhost:5173"}})
 
+STREAM_FORMATS = {"ndjson": "application/x-ndjson", "sse": "text/event-stream"}
+
+
+def _requested_stream_format() -> str | None:
+    stream_format = request.args.get('stream')
+    if stream_format:
+        return stream_format
+    accepted = request.accept_mimetypes
+    for name, mimetype in STREAM_FORMATS.items():
+        # Only an explicit Accept opts in; "*/*" keeps the plain JSON response for existing clients.
+        if accepted[mimetype] and accepted[mimetype] > accepted['application/json']:
+            return name
+    return None
+
+
+def _requested_graph_format() -> str:
+    # "compact" sends explanation_graph as parallel arrays (explanation/graph/graph_wire.py).
+    return request.args.get('graph', API_RESPONSES.graph_format)
+
+
+def _invalid_graph_format_response():
+    return jsonify({"message": f"graph must be one of {', '.join(GRAPH_FORMATS)}", "results": []}), 400
+
+
+ESSAY_TEXT_MODES = ("snippet", "full")
+
+
+def _requested_shape() -> dict:
+    """
+    `fields` projection, float rounding and whether essay hits keep their
+    full text; raises ValueError for a bad ?round= or ?text=.
+    """
+    float_digits = parse_float_digits(request.args.get('round'))
+    # Essay hits always carry a snippet with highlight offsets; the whole chunk only with ?text=full.
+    essay_text = request.args.get('text', API_RESPONSES.essay_text)
+    if essay_text not in ESSAY_TEXT_MODES:
+        raise ValueError(f"text must be one of {', '.join(ESSAY_TEXT_MODES)}")
+    return {
+        "fields": parse_fields(request.args.get('fields')),
+        "float_digits": float_digits if float_digits is not None else API_RESPONSES.float_digits,
+        "omit": ("text",) if essay_text == "snippet" else (),
+    }
+
+
+def _stream_search(query:str, stream_format:str, graph_format:str, shape:dict) -> Response:
+    def generate():
+        for event in iter_search_events(query):
+            if event["event"] == "explanation":
+                event["data"]["explanation_graph"] = graph_for_wire(event["data"]["explanation_graph"], graph_format)
+            event["data"] = shape_payload(event["data"], **shape)
+            payload = dumps(event).decode("utf-8")
+            if stream_format == "sse":
+                yield f"event: {event['event']}\ndata: {payload}\n\n"
+            else:
+                yield payload + "\n"
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype=STREAM_FORMATS[stream_format],
+        # Keep proxies from buffering the stream into one late response.
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 
 @app.route('/api/search', methods=['GET'] )
 def get_relevant_search_response():
 
     query:str = request.args.get('q')
-    
-    response = find_top_relevant_results(query)
 
-    if len(response['results']) == 0:
-        return jsonify(response), 404
+    graph_format = _requested_graph_format()
+    if graph_format not in GRAPH_FORMATS:
+        return _invalid_graph_format_response()
+
+    try:
+        shape = _requested_shape()
+    except ValueError as e:
+        return jsonify({"message": str(e), "results": []}), 400
+
+    stream_format = _requested_stream_format()
+    if stream_format is not None:
+        if stream_format not in STREAM_FORMATS:
+            return jsonify({"message": f"stream must be one of {', '.join(STREAM_FORMATS)}", "results": []}), 400
+        return _stream_search(query, stream_format, graph_format, shape)
+
+    # "inline" keeps the explanation graph in this response; "deferred" returns a handle for /api/explain.
+    explanation_mode:str | None = request.args.get('explain')
+
+    if explanation_mode is not None and explanation_mode not in EXPLANATION_MODES:
+        return jsonify({"message": f"explain must be one of {', '.join(EXPLANATION_MODES)}", "results": []}), 400
+
+    response = find_top_relevant_results(query, explanation_mode=explanation_mode)
+    if "explanation_graph" in response:
+        response["explanation_graph"] = graph_for_wire(response["explanation_graph"], graph_format)
+
+    status = 404 if len(response['results']) == 0 else 200
+
+    # orjson + gzip/brotli per Accept-Encoding; ?fields= and ?round= trim the body first.
+    return json_response(shape_payload(response, **shape), status=status)
+
+
+@app.route('/api/search/batch', methods=['POST'])
+def get_batch_search_response():
+    """
+    Body: {"queries": ["...", ...], "explain": "none" | "inline" | "deferred"}.
+    Responses come back in query order, each shaped like /api/search's; the
+    graph, fields, round and text query parameters apply to every one.
+    """
+    body = request.get_json(silent=True) or {}
+    queries = body.get('queries')
+    if not isinstance(queries, list) or not all(isinstance(query, str) for query in queries):
+        return jsonify({"message": "queries must be a list of strings", "responses": []}), 400
+
+    explanation_mode = body.get('explain')
+    if explanation_mode is not None and explanation_mode not in BATCH_EXPLANATION_MODES:
+        return jsonify({"message": f"explain must be one of {', '.join(BATCH_EXPLANATION_MODES)}",
+                        "responses": []}), 400
+
+    graph_format = _requested_graph_format()
+    if graph_format not in GRAPH_FORMATS:
+        return _invalid_graph_format_response()
+
+    try:
+        shape = _requested_shape()
+        responses = find_top_relevant_results_batch(queries, explanation_mode=explanation_mode)
+    except ValueError as e:
+        return jsonify({"message": str(e), "responses": []}), 400
+
+    for response in responses:
+        if "explanation_graph" in response:
+            response["explanation_graph"] = graph_for_wire(response["explanation_graph"], graph_format)
+
+    return json_response({
+        "message": "Search Successful",
+        "count": len(responses),
+        "responses": [shape_payload(response, **shape) for response in responses],
+    })
+
+
+@app.route('/api/explain/<handle>', methods=['GET'])
+def get_explanation_response(handle:str):
+
+    try:
+        ExplanationHandle.decode(handle)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+    graph_format = _requested_graph_format()
+    if graph_format not in GRAPH_FORMATS:
+        return _invalid_graph_format_response()
+
+    try:
+        shape = _requested_shape()
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+    response = explain_search(handle)
+    response["explanation_graph"] = graph_for_wire(response["explanation_graph"], graph_format)
+    # Graphs are the largest bodies the API sends: fast encoder, compressed per Accept-Encoding.
+    return json_response(shape_payload(response, float_digits=shape["float_digits"]))
+
+
+@app.route('/api/metrics/explanation-cache', methods=['GET'])
+def get_explanation_cache_metrics():
+    return jsonify(graph_cache_metrics())
+
+
+@app.route('/api/thumb/<int:artwork_id>', methods=['GET'])
+def get_artwork_thumbnail_response(artwork_id:int):
 
+    try:
+        thumbnail = get_artwork_thumbnail(artwork_id)
+    except LookupError as e:
+        return jsonify({"message": str(e)}), 404
+    except (requests.RequestException, OSError, ValueError) as e:
+        return jsonify({"message": f"Thumbnail unavailable: {e}"}), 502
 
-    return jsonify(response)
+    # conditional=True answers If-None-Match / If-Modified-Since with 304 and Range with 206.
+    return send_file(
+        thumbnail.path,
+        mimetype=thumbnail.mimetype,
+        conditional=True,
+        etag=thumbnail.etag,
+        max_age=THUMBNAILS.max_age_seconds,
+    )
 
 
 if __name__ == '__main__':
@@ -1,7 +1,8 @@
 from dataclasses import dataclass
 from typing import TypedDict
 
-from concept_data_pipeline.artwork_concept.prototypes import ConceptMatch
+from concept_data_pipeline.artwork_concept.prototypes import ConceptMatch, ConceptPrototypeSet
+from search.hybrid_retriever import CandidateEmbeddings
 
 
 
@@ -16,4 +17,7 @@ Used as an input for Evidenvce Bundle and Explanation Graph logic
 class SearchContext:
     artworks:list[dict]
     essays: list[dict]
-    detected_concepts: tuple[ConceptMatch]
\ No newline at end of file
+    detected_concepts: tuple[ConceptMatch]
+    # Optional: when both are present the evidence builder scores artworks without touching the database.
+    artwork_embeddings: CandidateEmbeddings | None = None
+    concept_prototypes: ConceptPrototypeSet | None = None
\ No newline at end of file
@@ -1,17 +1,43 @@
-from explanation.graph.graph_validation import validate_graph_objects
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import time
+from typing import Iterator, Sequence
+
+import psycopg
+
+from db.db_pool import get_connection
+from db.schema import column_exists
+from search.hybrid_retriever import QueryVectors
 from search.retrievers import ArtworkRetriever, EssayRetriever
 from search.ranking import ConceptWeights, apply_concept_scores, merge_results
 from search.search_concept_service import (
     concept_has_artwork_mappings,
-    detect_concept_from_query,
+    concepts_with_artwork_mappings,
+    detect_concepts_for_vectors,
+    detect_concepts_with_prototypes,
 )
+from utils.embeddings import encode_batch
+from utils.embedding_versions import EmbeddingVersion, get_active_embedding_version
 from .search_model import SearchContext, SearchResponse
+from .explanation_service import (
+    EXPLANATION_MODES,
+    ExplanationHandle,
+    explanation_graph_for_context,
+    get_explanation_cache,
+    resolve_explanation_mode,
+)
+from utils.config import EXPLANATIONS, SEARCH_BATCH
+
+def _essay_sentence_spans_ready() -> bool:
+    # Checked once at startup: restart the API after migrate_essay_schema.py adds the column.
+    try:
+        return column_exists("essay", "sentence_spans")
+    except psycopg.Error as e:
+        print("Could not check essay.sentence_spans; snippets will split sentences at query time: ", e)
+        return False
 
-from explanation.evidence.evidence_builder import build_evidence_bundle
-from explanation.graph.build_explanation_graph import build_explanation_graph
 
 artwork_retriever = ArtworkRetriever()
-essay_retriever = EssayRetriever()
+essay_retriever = EssayRetriever(with_sentence_spans=_essay_sentence_spans_ready())
 
 ESSAY_CONCEPT_BOOST = 0.3
 CONCEPT_WEIGHTS: ConceptWeights = (0.20, 0.65, 0.15)
@@ -27,13 +53,15 @@ def _is_primary(concept_id: int) -> bool:
 
 
 def _expand_query_with_concepts(
-    query: str, query_concepts
+    query: str, query_concepts, mapped_concept_ids: set[int] | None = None
 ) -> str:
+    """`mapped_concept_ids`, when given, answers concept_has_artwork_mappings without a query per concept."""
     expanded = query
 
     for concept in query_concepts:
-        if _is_primary(concept.concept_id) and concept_has_artwork_mappings(
-            concept.concept_id
+        if _is_primary(concept.concept_id) and (
+            concept.concept_id in mapped_concept_ids if mapped_concept_ids is not None
+            else concept_has_artwork_mappings(concept.concept_id)
         ):
             expanded += f" OR {concept.concept_name}"
             concept.used_for_expansion = True
@@ -41,22 +69,27 @@ def _expand_query_with_concepts(
     return expanded
 
 
-def find_top_relevant_results(query: str) -> SearchResponse:
-    if not query or len(query.replace(" ", "")) == 0:
-        return {"message": "InAppropriate Query", "results": []}
+def _is_valid_query(query: str | None) -> bool:
+    return bool(query) and len(query.replace(" ", "")) > 0
+
 
-    query_concepts = detect_concept_from_query(query)
+def _retrieve_artworks(query: str):
+    """Concept detection, concept-expanded artwork retrieval, and what both loaded along the way."""
+    query_concepts, concept_prototypes = detect_concepts_with_prototypes(query)
     for concept in query_concepts:
         concept.concept_type = "primary" if _is_primary(concept.concept_id) else "secondary"
-    essay_results = essay_retriever.search(query)
 
     if query_concepts:
         artwork_query = _expand_query_with_concepts(query, query_concepts)
     else:
         artwork_query = query
 
-    artwork_results = artwork_retriever.search(artwork_query)
+    artwork_results, artwork_embeddings = artwork_retriever.search_with_embeddings(artwork_query)
+    return query_concepts, concept_prototypes, artwork_results, artwork_embeddings
 
+
+def _rank_results(query: str, essay_results: list[dict], artwork_results: list[dict], query_concepts,
+                  conn=None) -> list[dict]:
     combined_results = merge_results(essay_results, artwork_results)
 
     if query_concepts:
@@ -67,25 +100,16 @@ def find_top_relevant_results(query: str) -> SearchResponse:
             essay_retriever=essay_retriever,
             weights=CONCEPT_WEIGHTS,
             essay_boost=ESSAY_CONCEPT_BOOST,
+            conn=conn,
         )
     else:
         print("No concept relations were found while querying ", query)
 
-    search_context = SearchContext(artworks=artwork_results, essays=essay_results, detected_concepts=query_concepts)
-    list_of_evidence_bundles = build_evidence_bundle(search_context)
-
-    nodes, edges = build_explanation_graph(query=query, detected_concepts=query_concepts, evidence_bundles=list_of_evidence_bundles)
-
-    graph_nodes = list(nodes.values())
-    validation_result = validate_graph_objects(nodes=graph_nodes, edges=edges)
-
-    if validation_result.errors:
-        print("Graph Errors: " , validation_result.errors)
-        nodes = None 
-        edges= None
-
     combined_results.sort(key=lambda x: x["score"]["final_score"], reverse=True)
+    return combined_results
+
 
+def _search_response(query: str, combined_results: list[dict], essay_results: list[dict], artwork_results: list[dict]) -> dict:
     return {
         "query": query,
         "message": "Search Successful",
@@ -95,8 +119,217 @@ def find_top_relevant_results(query: str) -> SearchResponse:
             "essay_results": len(essay_results),
         },
         "results": combined_results,
-        "explanation_graph": {
-            "nodes": list(graph_nodes if nodes else {}),
-            "edges": edges,
+    }
+
+
+def find_top_relevant_results(query: str, explanation_mode: str | None = None) -> SearchResponse:
+    """
+    `explanation_mode` "inline" builds the explanation graph into the response
+    (the original all-in-one behavior); "deferred" returns a handle for
+    /api/explain instead (inline when EXPLANATION_HANDLE_SECRET is unset).
+    Defaults to EXPLANATION_MODE.
+    """
+    explanation_mode = explanation_mode or EXPLANATIONS.mode
+    if explanation_mode not in EXPLANATION_MODES:
+        raise ValueError(f"explanation_mode must be one of {EXPLANATION_MODES}")
+    explanation_mode = resolve_explanation_mode(explanation_mode)
+
+    if not _is_valid_query(query):
+        return {"message": "InAppropriate Query", "results": []}
+
+    query_concepts, concept_prototypes, artwork_results, artwork_embeddings = _retrieve_artworks(query)
+    essay_results = essay_retriever.search(query)
+
+    combined_results = _rank_results(query, essay_results, artwork_results, query_concepts)
+
+    search_context = SearchContext(artworks=artwork_results, essays=essay_results, detected_concepts=query_concepts,
+                                   artwork_embeddings=artwork_embeddings, concept_prototypes=concept_prototypes)
+
+    response = _search_response(query, combined_results, essay_results, artwork_results)
+    _attach_explanation(response, query, search_context, explanation_mode)
+    return response
+
+
+def _attach_explanation(response: dict, query: str, search_context: SearchContext, explanation_mode: str,
+                        prefetch: bool = EXPLANATIONS.prefetch) -> None:
+    if explanation_mode == "none":
+        return
+
+    if explanation_mode == "inline":
+        response["explanation_graph"] = explanation_graph_for_context(query, search_context)
+        return
+
+    handle = ExplanationHandle(
+        query=query,
+        detected_concepts=tuple(search_context.detected_concepts),
+        artwork_ids=tuple(artwork["id"] for artwork in search_context.artworks),
+    ).encode()
+    if prefetch:
+        get_explanation_cache().prefetch(handle, search_context)
+    response["explanation"] = {"handle": handle}
+
+
+BATCH_EXPLANATION_MODES = ("none", *EXPLANATION_MODES)
+
+
+def find_top_relevant_results_batch(queries: Sequence[str], explanation_mode: str | None = None,
+                                    workers: int = SEARCH_BATCH.workers) -> list[SearchResponse]:
+    """
+    `find_top_relevant_results` for every query, in input order. Defaults to
+    SEARCH_BATCH_EXPLANATION_MODE, whose "none" skips the explanation graph.
+    A query that fails gets {"message": "Search failed"} without failing the
+    rest of the batch.
+
+    Every valid query is embedded in one `encode_batch` call and scored
+    against the concept prototypes in one matrix product; the concept-expanded
+    artwork queries that differ from their original take one more
+    `encode_batch` call. Retrieval and ranking then run on `workers` threads,
+    each holding a single pooled connection for its whole share of the batch,
+    so a batch costs the embedding work plus the SQL and none of the
+    per-request setup.
+    """
+    explanation_mode = explanation_mode or SEARCH_BATCH.explanation_mode
+    if explanation_mode not in BATCH_EXPLANATION_MODES:
+        raise ValueError(f"explanation_mode must be one of {BATCH_EXPLANATION_MODES}")
+    explanation_mode = resolve_explanation_mode(explanation_mode)
+    if len(queries) > SEARCH_BATCH.max_queries:
+        raise ValueError(f"A batch holds at most {SEARCH_BATCH.max_queries} queries; got {len(queries)}")
+
+    responses: list[SearchResponse] = [{"message": "InAppropriate Query", "results": []} for _ in queries]
+    positions = [position for position, query in enumerate(queries) if _is_valid_query(query)]
+    if not positions:
+        return responses
+    texts = [queries[position] for position in positions]
+
+    # One version for the whole batch, so every vector matches the columns it is compared against.
+    version = get_active_embedding_version()
+    distinct_texts = list(dict.fromkeys(texts))
+    known = dict(zip(distinct_texts, encode_batch(distinct_texts, batch_size=SEARCH_BATCH.encode_batch_size,
+                                                  model_name=version.model_name, use_cache=False)))
+    concepts_per_query, concept_prototypes = detect_concepts_for_vectors([known[text] for text in texts], version)
+
+    mapped_concept_ids = concepts_with_artwork_mappings(sorted({
+        concept.concept_id for query_concepts in concepts_per_query for concept in query_concepts
+        if _is_primary(concept.concept_id)
+    }))
+    artwork_queries = []
+    for query, query_concepts in zip(texts, concepts_per_query):
+        for concept in query_concepts:
+            concept.concept_type = "primary" if _is_primary(concept.concept_id) else "secondary"
+        artwork_queries.append(_expand_query_with_concepts(query, query_concepts, mapped_concept_ids))
+
+    essay_vectors = essay_retriever.encode_queries(texts, version, known, batch_size=SEARCH_BATCH.encode_batch_size)
+    artwork_vectors = artwork_retriever.encode_queries(artwork_queries, version, known,
+                                                       batch_size=SEARCH_BATCH.encode_batch_size)
+
+    def search_share(indexes: range) -> None:
+        with get_connection() as conn:
+            for index in indexes:
+                try:
+                    responses[positions[index]] = _search_encoded(
+                        texts[index], artwork_queries[index], concepts_per_query[index], concept_prototypes,
+                        essay_vectors[index], artwork_vectors[index], version, explanation_mode, conn,
+                    )
+                except Exception as e:
+                    conn.rollback()
+                    print(f"Batch search failed for query {texts[index]!r}: ", e)
+                    responses[positions[index]] = {"message": "Search failed", "results": []}
+
+    workers = max(1, min(workers, len(texts)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="search-batch") as executor:
+        shares = [executor.submit(search_share, range(worker, len(texts), workers)) for worker in range(workers)]
+        for share in shares:
+            share.result()
+    return responses
+
+
+def _search_encoded(query: str, artwork_query: str, query_concepts, concept_prototypes,
+                    essay_vectors: QueryVectors, artwork_vectors: QueryVectors, version: EmbeddingVersion,
+                    explanation_mode: str, conn) -> SearchResponse:
+    # Candidate embeddings only feed the explanation graph.
+    artwork_results, artwork_embeddings = artwork_retriever.search_encoded(
+        artwork_query, artwork_vectors, version, with_embeddings=explanation_mode != "none", conn=conn,
+    )
+    essay_results, _ = essay_retriever.search_encoded(query, essay_vectors, version, conn=conn)
+
+    combined_results = _rank_results(query, essay_results, artwork_results, query_concepts, conn=conn)
+    response = _search_response(query, combined_results, essay_results, artwork_results)
+
+    search_context = SearchContext(artworks=artwork_results, essays=essay_results, detected_concepts=query_concepts,
+                                   artwork_embeddings=artwork_embeddings, concept_prototypes=concept_prototypes)
+    # A batch would queue one build per query; its handles are built when explained.
+    _attach_explanation(response, query, search_context, explanation_mode, prefetch=False)
+    return response
+
+
+def iter_search_events(query: str) -> Iterator[dict]:
+    """
+    Streaming search. Events come out as each stage finishes: "essays" and
+    "artworks" in whichever order their retrievers complete (they run
+    concurrently), then "ranking" (the merged, concept-rescored list: the
+    non-streaming response without the graph), then "explanation", then
+    "done". Every event carries its own stage time and the time since the
+    request started.
+    """
+    started = time.perf_counter()
+
+    def event(name: str, stage_seconds: float, data: dict) -> dict:
+        return {
+            "event": name,
+            "timing": {
+                "stage_ms": round(stage_seconds * 1000, 1),
+                "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+            },
+            "data": data,
         }
+
+    if not _is_valid_query(query):
+        yield event("error", 0.0, {"message": "InAppropriate Query", "results": []})
+        return
+
+    try:
+        with ThreadPoolExecutor(max_workers=2, thread_name_prefix="search") as retrievers:
+            essay_future = retrievers.submit(_timed, essay_retriever.search, query)
+            artwork_future = retrievers.submit(_timed, _retrieve_artworks, query)
+            for future in as_completed((essay_future, artwork_future)):
+                result, seconds = future.result()
+                if future is essay_future:
+                    yield event("essays", seconds, {"results": result})
+                else:
+                    query_concepts, _, artwork_results, _ = result
+                    yield event("artworks", seconds, {"results": artwork_results, "detected_concepts": query_concepts})
+
+        essay_results, _ = essay_future.result()
+        query_concepts, concept_prototypes, artwork_results, artwork_embeddings = artwork_future.result()[0]
+
+        stage_started = time.perf_counter()
+        combined_results = _rank_results(query, essay_results, artwork_results, query_concepts)
+        response = _search_response(query, combined_results, essay_results, artwork_results)
+        yield event("ranking", time.perf_counter() - stage_started, response)
+
+        stage_started = time.perf_counter()
+        search_context = SearchContext(artworks=artwork_results, essays=essay_results, detected_concepts=query_concepts,
+                                       artwork_embeddings=artwork_embeddings, concept_prototypes=concept_prototypes)
+        explanation_graph = explanation_graph_for_context(query, search_context)
+        yield event("explanation", time.perf_counter() - stage_started, {"explanation_graph": explanation_graph})
+    except Exception as e:
+        print("Streaming search failed: ", e)
+        yield event("error", 0.0, {"message": "Search failed"})
+        return
+
+    yield event("done", time.perf_counter() - started, {})
+
+
+def _timed(fn, *args):
+    stage_started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - stage_started
+
+
+def explain_search(handle: str) -> dict:
+    """Explanation graph for a handle from a deferred search, built once and then served from the cache."""
+    explanation_handle = ExplanationHandle.decode(handle)
+    return {
+        "query": explanation_handle.query,
+        "explanation_graph": get_explanation_cache().get(handle),
     }
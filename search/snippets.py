@@ -0,0 +1,142 @@
+"""
+Query-time snippets for essay hits.
+
+A snippet is the run of whole sentences (cut along the offsets stored in
+`essay.sentence_spans` at ingestion) that covers the most distinct matched
+lexemes within `max_chars`, with the offsets of every matched word in it.
+Nothing is re-tokenized in the database: the lexemes come from the lexical
+pass the retriever already runs. A word matches a lexeme when it is the
+lexeme plus one of the endings Snowball strips ("paintings" -> "paint",
+"running" -> "run", with its y -> i rewrite: "gallery" -> "galleri"), so
+"artist", "article" and "Arthur" are not highlighted for "art".
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+import re
+from typing import Sequence
+
+from essay_scraper.chunker import sentence_spans as compute_sentence_spans
+from utils.config import HYBRID_SEARCH
+
+_WORD = re.compile(r"\w+")
+# Endings the English Snowball stemmer removes (singly or chained), so a word and its lexeme differ by one of these.
+_SUFFIXES = frozenset({
+    "", "s", "es", "e", "ed", "d", "ing", "ings", "er", "ers", "est", "ly", "ful", "ness",
+    "al", "ally", "ic", "ical", "ically", "ion", "ions", "ation", "ations", "ional",
+    "ive", "ives", "ous", "ously", "ism", "isms", "ity", "ities", "ize", "ized", "izes", "izing",
+    "ment", "ments", "ance", "ence", "able", "ible",
+})
+# "running" -> "run": a doubled final consonant before these endings.
+_DOUBLING_SUFFIXES = frozenset({"ing", "ings", "ed", "er", "ers", "est"})
+_VOWELS = frozenset("aeiouy")
+
+
+@dataclass(frozen=True)
+class Snippet:
+    text: str
+    start: int  # offset of `text` in the full chunk text
+    end: int
+    highlights: tuple[tuple[int, int], ...]  # (start, end) offsets in `text`
+    truncated_start: bool
+    truncated_end: bool
+
+
+def build_snippet(
+    text: str,
+    flat_sentence_spans: Sequence[int] | None,
+    matched_terms: Sequence[str],
+    max_chars: int = HYBRID_SEARCH.snippet_max_chars,
+) -> Snippet:
+    spans = _pairs(flat_sentence_spans) if flat_sentence_spans else compute_sentence_spans(text)
+    if not spans:
+        spans = ((0, len(text)),)
+    matches = _match_words(text, matched_terms)
+
+    window_start, window_end = _best_window(spans, matches, max_chars)
+    if window_end - window_start > max_chars:
+        window_start, window_end = _cut_long_window(text, window_start, window_end, matches, max_chars)
+
+    return Snippet(
+        text=text[window_start:window_end],
+        start=window_start,
+        end=window_end,
+        highlights=tuple(
+            (start - window_start, end - window_start)
+            for start, end, _ in matches
+            if start >= window_start and end <= window_end
+        ),
+        truncated_start=window_start > 0,
+        truncated_end=window_end < len(text.rstrip()),
+    )
+
+
+def _pairs(flat: Sequence[int]) -> tuple[tuple[int, int], ...]:
+    return tuple((int(flat[i]), int(flat[i + 1])) for i in range(0, len(flat) - 1, 2))
+
+
+def _match_words(text: str, matched_terms: Sequence[str]) -> list[tuple[int, int, str]]:
+    """(start, end, lexeme) of every word in `text` one of the lexemes was stemmed from."""
+    lexemes = sorted({term.lower() for term in matched_terms if term}, key=len, reverse=True)
+    if not lexemes:
+        return []
+    matches = []
+    for word in _WORD.finditer(text):
+        lowered = word.group().lower()
+        for lexeme in lexemes:
+            if _stemmed_from(lowered, lexeme):
+                matches.append((word.start(), word.end(), lexeme))
+                break
+    return matches
+
+
+def _stemmed_from(word: str, lexeme: str) -> bool:
+    if word.startswith(lexeme):
+        rest = word[len(lexeme):]
+        return rest in _SUFFIXES or (
+            rest[:1] == lexeme[-1:] and lexeme[-1] not in _VOWELS and rest[1:] in _DOUBLING_SUFFIXES
+        )
+    # Snowball's y -> i: "gallery" is stored as "galleri".
+    return lexeme.endswith("i") and word == lexeme[:-1] + "y"
+
+
+def _best_window(spans: Sequence[tuple[int, int]], matches: Sequence[tuple[int, int, str]],
+                 max_chars: int) -> tuple[int, int]:
+    """Sentences [i, j] within `max_chars` with the most distinct lexemes, then the most matches, earliest first."""
+    if not matches:
+        end_index = 0
+        while end_index + 1 < len(spans) and spans[end_index + 1][1] - spans[0][0] <= max_chars:
+            end_index += 1
+        return spans[0][0], spans[end_index][1]
+
+    best, best_score = (spans[0][0], spans[0][1]), (-1, -1)
+    match_index = 0
+    for i, (first_start, _) in enumerate(spans):
+        while match_index < len(matches) and matches[match_index][0] < first_start:
+            match_index += 1
+        j = i
+        while j + 1 < len(spans) and spans[j + 1][1] - first_start <= max_chars:
+            j += 1
+        window_end = spans[j][1]
+        inside = [lexeme for start, end, lexeme in matches[match_index:] if end <= window_end]
+        score = (len(set(inside)), len(inside))
+        if score > best_score:
+            best, best_score = (first_start, window_end), score
+    return best
+
+
+def _cut_long_window(text: str, start: int, end: int, matches: Sequence[tuple[int, int, str]],
+                     max_chars: int) -> tuple[int, int]:
+    """One sentence longer than `max_chars`: center on its first match and cut at whitespace."""
+    inside = [match for match in matches if start <= match[0] < end]
+    if inside:
+        start = max(start, inside[0][0] - max_chars // 4)
+    end = min(end, start + max_chars)
+    if start > 0 and not text[start - 1].isspace():
+        space = text.find(" ", start, end)
+        start = space + 1 if space != -1 else start
+    if end < len(text) and not text[end].isspace():
+        space = text.rfind(" ", start, end)
+        end = space if space > start else end
+    return start, end
@@ -0,0 +1,31 @@
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+
+from db.db_pool import get_connection
+from utils.thumbnail_cache import get_thumbnail_cache, image_mimetype
+
+
+@dataclass(frozen=True)
+class Thumbnail:
+    path: Path
+    etag: str        # sha256 of the image bytes: stable for as long as the image is
+    mimetype: str
+
+
+@lru_cache(maxsize=4096)
+def get_artwork_image_url(artwork_id: int) -> str:
+    """Raises LookupError (never cached) when the artwork is unknown or has no image."""
+    with get_connection() as conn, conn.cursor() as cur:
+        cur.execute("SELECT image_url FROM artwork WHERE id = %s", (artwork_id,))
+        row = cur.fetchone()
+
+    if row is None or not row[0]:
+        raise LookupError(f"No image for artwork {artwork_id}")
+    return row[0]
+
+
+def get_artwork_thumbnail(artwork_id: int) -> Thumbnail:
+    """Serve from the local cache, fetching the Met image once on a miss."""
+    path = get_thumbnail_cache().fetch(get_artwork_image_url(artwork_id))
+    return Thumbnail(path=path, etag=path.name, mimetype=image_mimetype(path))
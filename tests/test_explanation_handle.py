@@ -0,0 +1,71 @@
+import base64
+import json
+import zlib
+
+import pytest
+
+from concept_data_pipeline.artwork_concept.prototypes import ConceptMatch
+import search.explanation_service as explanation_service
+from search.explanation_service import ExplanationHandle
+
+
+@pytest.fixture(autouse=True)
+def handle_key(monkeypatch):
+    monkeypatch.setattr(explanation_service, "_HANDLE_KEY", b"test-secret")
+
+
+HANDLE = ExplanationHandle(
+    query="woman with a lute",
+    detected_concepts=(ConceptMatch(31, "Portrait", 0.9, 1.0, 0.62, "primary", True),),
+    artwork_ids=(7, 9),
+)
+
+
+def _signed(payload: dict) -> str:
+    raw = zlib.compress(json.dumps(payload).encode("utf-8"), 9)
+    return base64.urlsafe_b64encode(explanation_service._handle_tag(raw) + raw).decode("ascii").rstrip("=")
+
+
+def test_round_trip():
+    assert ExplanationHandle.decode(HANDLE.encode()) == HANDLE
+
+
+def test_rejects_a_flipped_byte():
+    signed = bytearray(base64.urlsafe_b64decode(HANDLE.encode() + "=="))
+    signed[-1] ^= 0x01
+    with pytest.raises(ValueError):
+        ExplanationHandle.decode(base64.urlsafe_b64encode(bytes(signed)).decode("ascii").rstrip("="))
+
+
+def test_rejects_a_handle_signed_with_another_key(monkeypatch):
+    handle = HANDLE.encode()
+    monkeypatch.setattr(explanation_service, "_HANDLE_KEY", b"another-secret")
+    with pytest.raises(ValueError):
+        ExplanationHandle.decode(handle)
+
+
+def test_rejects_an_oversize_handle():
+    with pytest.raises(ValueError):
+        ExplanationHandle.decode("A" * (explanation_service.MAX_HANDLE_LENGTH + 1))
+
+
+def test_rejects_a_signed_payload_that_inflates_past_the_limit():
+    handle = _signed({"q": "x" * 1_000_000, "c": [], "a": []})  # about 1 KB, 1 MB once inflated
+    assert len(handle) <= explanation_service.MAX_HANDLE_LENGTH
+    with pytest.raises(ValueError):
+        ExplanationHandle.decode(handle)
+
+
+def test_rejects_more_artworks_than_a_search_returns():
+    too_many = explanation_service.HYBRID_SEARCH.artwork_vector_limit + 1
+    with pytest.raises(ValueError):
+        ExplanationHandle.decode(_signed({"q": "q", "c": [], "a": list(range(too_many))}))
+
+
+def test_no_handles_without_a_secret(monkeypatch):
+    handle = HANDLE.encode()
+    monkeypatch.setattr(explanation_service, "_HANDLE_KEY", b"")
+    with pytest.raises(ValueError):
+        ExplanationHandle.decode(handle)
+    with pytest.raises(RuntimeError):
+        HANDLE.encode()
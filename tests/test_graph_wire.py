@@ -0,0 +1,47 @@
+from dataclasses import asdict
+
+from explanation.graph.graph_model import BundleGraphNode, GraphEdge, GraphNode, LabeledGraphNode
+from explanation.graph.graph_wire import decode_columnar_graph, encode_columnar_graph, graph_for_wire
+
+
+def _objects(nodes, edges):
+    """The default format, with the None label/confidence fields the columnar decoder leaves out."""
+    return {
+        "nodes": [{key: value for key, value in asdict(node).items() if value is not None or key == "ref_id"}
+                  for node in nodes],
+        "edges": [asdict(edge) for edge in edges],
+    }
+
+
+NODES = [
+    LabeledGraphNode(node_id="q:0", node_type="query", ref_id=None, label="woman with a lute"),
+    LabeledGraphNode(node_id="c:31", node_type="concept", ref_id=31, label="Portrait"),
+    BundleGraphNode(node_id="b:bundle__concept__31", node_type="bundle", ref_id="bundle__concept__31",
+                    confidence=0.82),
+    GraphNode(node_id="a:7", node_type="artwork", ref_id=7),
+    GraphNode(node_id="a:9", node_type="artwork", ref_id=9),
+]
+EDGES = [
+    GraphEdge(from_node="q:0", to_node="c:31", edge_type="query_supports_concept", confidence=None,
+              provenance="v2_detected_concepts"),
+    GraphEdge(from_node="c:31", to_node="b:bundle__concept__31", edge_type="concept_forms_bundle",
+              confidence=1.0, provenance="bundle_construction"),
+    GraphEdge(from_node="b:bundle__concept__31", to_node="a:7", edge_type="bundle_supported_by_artwork",
+              confidence=0.91, provenance="embedding_similarity"),
+    GraphEdge(from_node="b:bundle__concept__31", to_node="a:9", edge_type="bundle_supported_by_artwork",
+              confidence=0.73, provenance="embedding_similarity"),
+]
+
+
+def test_columnar_round_trip_keeps_nulls_and_optional_fields():
+    assert decode_columnar_graph(encode_columnar_graph(NODES, EDGES)) == _objects(NODES, EDGES)
+
+
+def test_columnar_graph_without_edges():
+    assert decode_columnar_graph(encode_columnar_graph(NODES[:1], None)) == _objects(NODES[:1], [])
+
+
+def test_compact_wire_format_decodes_to_the_objects_graph():
+    wire = graph_for_wire({"nodes": NODES, "edges": EDGES}, "compact")
+    assert wire["strings"].count("b:bundle__concept__31") == 1
+    assert decode_columnar_graph(wire) == _objects(NODES, EDGES)
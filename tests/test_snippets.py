@@ -0,0 +1,25 @@
+from search.snippets import build_snippet
+
+
+def _highlighted(text, terms):
+    snippet = build_snippet(text, None, terms, max_chars=500)
+    return [snippet.text[start:end] for start, end in snippet.highlights]
+
+
+def test_stem_does_not_highlight_longer_words_it_only_prefixes():
+    text = "Arthur, an artist, wrote an article on Dutch art and the arts of Delft."
+    assert _highlighted(text, ["art"]) == ["art", "arts"]
+
+
+def test_inflections_of_the_stem_are_highlighted():
+    text = "She was painting; her paintings were painted while running past galleries and a gallery."
+    assert _highlighted(text, ["paint", "run", "galleri"]) == [
+        "painting", "paintings", "painted", "running", "galleries", "gallery",
+    ]
+
+
+def test_highlights_stay_inside_the_snippet():
+    text = "Nothing here. The art of the period. More filler text follows."
+    snippet = build_snippet(text, None, ["art"], max_chars=30)
+    assert snippet.text == "The art of the period."
+    assert [snippet.text[start:end] for start, end in snippet.highlights] == ["art"]
@@ -24,6 +24,10 @@ class HybridSearchConfig:
     essay_vector_limit: int = int(os.getenv("ESSAY_VECTOR_LIMIT", "3"))
     artwork_lexical_limit: int = int(os.getenv("ARTWORK_LEXICAL_LIMIT", "50"))
     artwork_vector_limit: int = int(os.getenv("ARTWORK_VECTOR_LIMIT", "5"))
+    # Share of the semantic score taken by query-to-image similarity (0 disables image blending).
+    image_weight: float = float(os.getenv("IMAGE_WEIGHT", "0"))
+    # Essay hits carry a snippet of whole sentences up to this long around the matched terms.
+    snippet_max_chars: int = int(os.getenv("SNIPPET_MAX_CHARS", "240"))
 
 
 @dataclass(frozen=True)
@@ -31,11 +35,153 @@ class IngestionConfig:
     """Batching settings for offline ingestion jobs."""
 
     artwork_batch_size: int = int(os.getenv("ARTWORK_BATCH_SIZE", "25"))
-    artwork_delay_seconds: float = float(os.getenv("ARTWORK_DELAY_SECONDS", "0.5"))
+    embed_batch_size: int = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+    transform_workers: int = int(os.getenv("TRANSFORM_WORKERS", "1"))
+    embed_workers: int = int(os.getenv("EMBED_WORKERS", "1"))
+    write_workers: int = int(os.getenv("WRITE_WORKERS", "1"))
+    pipeline_queue_size: int = int(os.getenv("PIPELINE_QUEUE_SIZE", "256"))
+    pipeline_batch_wait_seconds: float = float(os.getenv("PIPELINE_BATCH_WAIT_SECONDS", "2"))
+    pipeline_report_interval_seconds: float = float(os.getenv("PIPELINE_REPORT_INTERVAL_SECONDS", "15"))
+    met_api_base_url: str = os.getenv(
+        "MET_API_BASE_URL", "https://collectionapi.metmuseum.org/public/collection/v1"
+    )
+    fetch_max_in_flight: int = int(os.getenv("FETCH_MAX_IN_FLIGHT", "8"))
+    fetch_requests_per_second: float = float(os.getenv("FETCH_REQUESTS_PER_SECOND", "20"))
+    fetch_max_retries: int = int(os.getenv("FETCH_MAX_RETRIES", "5"))
+    fetch_backoff_base_seconds: float = float(os.getenv("FETCH_BACKOFF_BASE_SECONDS", "2"))
+    fetch_backoff_max_seconds: float = float(os.getenv("FETCH_BACKOFF_MAX_SECONDS", "150"))
+    checkpoint_dir: str = os.getenv("INGESTION_CHECKPOINT_DIR", ".ingestion_checkpoints")
+    affinity_workers: int = int(os.getenv("AFFINITY_WORKERS", "1"))
+    affinity_range_size: int = int(os.getenv("AFFINITY_RANGE_SIZE", "20000"))
+    affinity_fetch_size: int = int(os.getenv("AFFINITY_FETCH_SIZE", "2000"))
+    similarity_floor: float = float(os.getenv("ARTWORK_CONCEPT_SIMILARITY_FLOOR", "0.5"))
+    essay_fetch_workers: int = int(os.getenv("ESSAY_FETCH_WORKERS", "8"))
+    wikidata_workers: int = int(os.getenv("WIKIDATA_WORKERS", "4"))
+    wikidata_batch_lines: int = int(os.getenv("WIKIDATA_BATCH_LINES", "2000"))
+    wikidata_flush_rows: int = int(os.getenv("WIKIDATA_FLUSH_ROWS", "5000"))
+
+
+@dataclass(frozen=True)
+class HttpCacheConfig:
+    """On-disk response cache for Met API and essay source requests."""
+
+    cache_dir: str = os.getenv("HTTP_CACHE_DIR", ".http_cache")
+    mode: str = os.getenv("HTTP_CACHE_MODE", "online")  # off | online | offline
+    max_age_seconds: float = float(os.getenv("HTTP_CACHE_MAX_AGE_SECONDS", "86400"))
+
+
+@dataclass(frozen=True)
+class EmbeddingCacheConfig:
+    """Persistent text -> embedding cache consulted by encode_batch in ingestion and backfills (not by search)."""
+
+    enabled: bool = _env_bool("EMBEDDING_CACHE", default="1")
+    path: str = os.getenv("EMBEDDING_CACHE_PATH", ".embedding_cache/embeddings.sqlite3")
+    max_entries: int = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "500000"))
+
+
+@dataclass(frozen=True)
+class EmbeddingVersionConfig:
+    """Embedding version registry and the throttled re-embedding backfill."""
+
+    legacy_version: str = os.getenv("EMBEDDING_LEGACY_VERSION", "v1")
+    legacy_dimensions: int = int(os.getenv("EMBEDDING_LEGACY_DIMENSIONS", "384"))
+    cache_seconds: float = float(os.getenv("EMBEDDING_VERSION_CACHE_SECONDS", "30"))
+    reembed_batch_size: int = int(os.getenv("REEMBED_BATCH_SIZE", "64"))
+    reembed_rows_per_second: float = float(os.getenv("REEMBED_ROWS_PER_SECOND", "50"))
+    reembed_report_interval_seconds: float = float(os.getenv("REEMBED_REPORT_INTERVAL_SECONDS", "15"))
+
+
+@dataclass(frozen=True)
+class ImageEmbeddingConfig:
+    """CPU image-embedding pipeline over the local thumbnail cache."""
+
+    model_name: str = os.getenv("IMAGE_EMBEDDING_MODEL", "clip-ViT-B-32")
+    dimensions: int = int(os.getenv("IMAGE_EMBEDDING_DIMENSIONS", "512"))
+    column: str = "image_embedding"
+    image_size: int = int(os.getenv("IMAGE_EMBEDDING_SIZE", "224"))
+    batch_size: int = int(os.getenv("IMAGE_EMBED_BATCH_SIZE", "64"))
+    decode_workers: int = int(os.getenv("IMAGE_DECODE_WORKERS", "2"))
+    download_workers: int = int(os.getenv("IMAGE_DOWNLOAD_WORKERS", "8"))
+
+
+@dataclass(frozen=True)
+class ThumbnailConfig:
+    """Local thumbnail store behind /api/thumb and the image-embedding pipeline."""
+
+    cache_dir: str = os.getenv("THUMBNAIL_CACHE_DIR", ".thumbnail_cache")
+    max_bytes: int = int(os.getenv("THUMBNAIL_CACHE_MAX_BYTES", str(2 * 1024**3)))
+    downloads_per_second: float = float(os.getenv("THUMBNAIL_DOWNLOADS_PER_SECOND", "20"))
+    max_age_seconds: int = int(os.getenv("THUMBNAIL_MAX_AGE_SECONDS", "604800"))
+    prefetch: bool = _env_bool("THUMBNAIL_PREFETCH", default="1")
+    prefetch_workers: int = int(os.getenv("THUMBNAIL_PREFETCH_WORKERS", "4"))
+    prefetch_max_pending: int = int(os.getenv("THUMBNAIL_PREFETCH_MAX_PENDING", "1000"))
+    # Largest image body a fetch reads before giving up.
+    max_image_bytes: int = int(os.getenv("THUMBNAIL_MAX_IMAGE_BYTES", str(20 * 1024**2)))
+    # Hosts (and their subdomains) thumbnails may be downloaded from; empty allows any http(s) host.
+    allowed_hosts: tuple[str, ...] = tuple(
+        host.strip() for host in os.getenv("THUMBNAIL_ALLOWED_HOSTS", "metmuseum.org").split(",") if host.strip()
+    )
+
+
+@dataclass(frozen=True)
+class ExplanationConfig:
+    """How /api/search hands out the explanation graph."""
+
+    mode: str = os.getenv("EXPLANATION_MODE", "deferred")  # deferred | inline
+    cache_size: int = int(os.getenv("EXPLANATION_CACHE_SIZE", "256"))
+    prefetch: bool = _env_bool("EXPLANATION_PREFETCH", default="1")
+    # Background builds queued at once; past this, searches skip the prefetch and /api/explain builds on demand.
+    prefetch_max_pending: int = int(os.getenv("EXPLANATION_PREFETCH_MAX_PENDING", "16"))
+    workers: int = int(os.getenv("EXPLANATION_WORKERS", "2"))
+    validation: str = os.getenv("GRAPH_VALIDATION", "always")  # off | sampled | always
+    validation_sample_rate: float = float(os.getenv("GRAPH_VALIDATION_SAMPLE_RATE", "0.1"))
+    # Validate after the response is out and only log violations, instead of dropping invalid graphs inline.
+    validation_async: bool = _env_bool("GRAPH_VALIDATION_ASYNC", default="0")
+    # Evidence subgraphs keyed by (concept set, artwork set, prototype version); 0 disables the cache.
+    graph_cache_size: int = int(os.getenv("EXPLANATION_GRAPH_CACHE_SIZE", "1024"))
+    # How stale this process's view of concept_mapping_generation may get before cached subgraphs are dropped.
+    mapping_check_seconds: float = float(os.getenv("EXPLANATION_MAPPING_CHECK_SECONDS", "30"))
+    # HMAC key for explanation handles; set the same value on every API process. Deferred mode needs it:
+    # unset, searches fall back to inline graphs.
+    handle_secret: str = os.getenv("EXPLANATION_HANDLE_SECRET", "")
+
+
+@dataclass(frozen=True)
+class ApiResponseConfig:
+    """How API responses are put on the wire."""
+
+    graph_format: str = os.getenv("EXPLANATION_GRAPH_FORMAT", "objects")  # objects | compact
+    # Bodies smaller than this go out uncompressed; compression would cost more than it saves.
+    compress_min_bytes: int = int(os.getenv("RESPONSE_COMPRESS_MIN_BYTES", "1024"))
+    gzip_level: int = int(os.getenv("RESPONSE_GZIP_LEVEL", "6"))
+    brotli_quality: int = int(os.getenv("RESPONSE_BROTLI_QUALITY", "5"))
+    # Default for /api/search's ?round=; unset sends floats at full precision.
+    float_digits: int | None = int(os.environ["RESPONSE_FLOAT_DIGITS"]) if os.getenv("RESPONSE_FLOAT_DIGITS") else None
+    # "snippet" sends essay hits without their full chunk text unless ?text=full asks for it.
+    essay_text: str = os.getenv("ESSAY_TEXT", "snippet")  # snippet | full
+
+
+@dataclass(frozen=True)
+class SearchBatchConfig:
+    """Limits for /api/search/batch and find_top_relevant_results_batch."""
+
+    max_queries: int = int(os.getenv("SEARCH_BATCH_MAX_QUERIES", "1000"))
+    # Each worker holds one pooled connection for its share of the batch; keep below the pool's max_size.
+    workers: int = int(os.getenv("SEARCH_BATCH_WORKERS", "4"))
+    encode_batch_size: int = int(os.getenv("SEARCH_BATCH_ENCODE_SIZE", "64"))
+    explanation_mode: str = os.getenv("SEARCH_BATCH_EXPLANATION_MODE", "none")  # none | inline | deferred
 
 
 HYBRID_SEARCH = HybridSearchConfig()
 INGESTION = IngestionConfig()
+HTTP_CACHE = HttpCacheConfig()
+EMBEDDING_CACHE = EmbeddingCacheConfig()
+EMBEDDING_VERSIONS = EmbeddingVersionConfig()
+IMAGE_EMBEDDINGS = ImageEmbeddingConfig()
+THUMBNAILS = ThumbnailConfig()
+EXPLANATIONS = ExplanationConfig()
+API_RESPONSES = ApiResponseConfig()
+SEARCH_BATCH = SearchBatchConfig()
 
 # v3.3: field-aware lexical ordering (applies only to lexical score; semantic untouched).
 FIELD_AWARE_LEXICAL = _env_bool("FIELD_AWARE_LEXICAL", default="1")
@@ -0,0 +1,174 @@
+"""
+Persistent embedding cache keyed by sha256(model name, normalized text).
+
+Backed by a single SQLite file (WAL mode, so concurrent ingestion and
+backfill processes can share it). Search never uses it: query vectors are
+encoded with `use_cache=False`, so user queries are not written to disk
+and API workers do not queue on the SQLite writer. Vectors are stored as float32 blobs, which is exactly what the
+model returns. Size is bounded by `max_entries`; when it is exceeded the least
+recently used tenth is evicted.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+import hashlib
+from pathlib import Path
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Sequence
+
+import numpy as np
+
+from utils.config import EMBEDDING_CACHE
+
+_WHITESPACE = re.compile(r"\s+")
+_SQLITE_MAX_PARAMS = 900
+
+
+def normalize_text(text: str) -> str:
+    """NFC, trimmed, runs of whitespace collapsed (the tokenizer ignores the difference)."""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def embedding_key(model_name: str, normalized_text: str) -> str:
+    return hashlib.sha256(f"{model_name}\x00{normalized_text}".encode("utf-8")).hexdigest()
+
+
+@dataclass
+class EmbeddingCacheStats:
+    hits: int = 0
+    misses: int = 0
+    stored: int = 0
+    evicted: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"embedding cache: {self.hits} hits, {self.misses} misses "
+            f"({self.hit_rate:.1%} hit rate), {self.stored} stored, {self.evicted} evicted"
+        )
+
+
+class EmbeddingCache:
+    def __init__(self, path: str | Path, *, max_entries: int = 500_000) -> None:
+        if max_entries <= 0:
+            raise ValueError("max_entries must be positive")
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.stats = EmbeddingCacheStats()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = self._connection()
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embedding (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS embedding_last_used_idx ON embedding (last_used)")
+        conn.commit()
+        self._entries = conn.execute("SELECT COUNT(*) FROM embedding").fetchone()[0]
+
+    def get_many(self, keys: Sequence[str]) -> dict[str, list[float]]:
+        """Bulk lookup; hits are marked as recently used."""
+        unique = list(dict.fromkeys(keys))
+        found: dict[str, list[float]] = {}
+        conn = self._connection()
+        for start in range(0, len(unique), _SQLITE_MAX_PARAMS):
+            chunk = unique[start : start + _SQLITE_MAX_PARAMS]
+            placeholders = ",".join("?" * len(chunk))
+            rows = conn.execute(
+                f"SELECT key, vector FROM embedding WHERE key IN ({placeholders})", chunk
+            ).fetchall()
+            for key, blob in rows:
+                found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+            if rows:
+                conn.execute(
+                    f"UPDATE embedding SET last_used = ? WHERE key IN ({','.join('?' * len(rows))})",
+                    [time.time(), *(key for key, _ in rows)],
+                )
+        conn.commit()
+
+        with self._lock:
+            self.stats.hits += sum(1 for key in keys if key in found)
+            self.stats.misses += sum(1 for key in keys if key not in found)
+        return found
+
+    def put_many(self, model_name: str, items: dict[str, Sequence[float]]) -> None:
+        if not items:
+            return
+        now = time.time()
+        conn = self._connection()
+        cursor = conn.executemany(
+            "INSERT OR IGNORE INTO embedding (key, model, vector, last_used) VALUES (?, ?, ?, ?)",
+            [
+                (key, model_name, np.asarray(vector, dtype=np.float32).tobytes(), now)
+                for key, vector in items.items()
+            ],
+        )
+        conn.commit()
+
+        with self._lock:
+            self.stats.stored += max(cursor.rowcount, 0)
+            self._entries += max(cursor.rowcount, 0)
+            over_limit = self._entries > self.max_entries
+        if over_limit:
+            self.evict()
+
+    def evict(self) -> int:
+        """Drop least recently used rows down to 90% of `max_entries`."""
+        conn = self._connection()
+        total = conn.execute("SELECT COUNT(*) FROM embedding").fetchone()[0]
+        excess = total - int(self.max_entries * 0.9)
+        if excess > 0:
+            conn.execute(
+                "DELETE FROM embedding WHERE key IN "
+                "(SELECT key FROM embedding ORDER BY last_used LIMIT ?)",
+                (excess,),
+            )
+            conn.commit()
+        with self._lock:
+            self._entries = max(0, total - max(excess, 0))
+            self.stats.evicted += max(excess, 0)
+        return max(excess, 0)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+
+_embedding_cache: EmbeddingCache | None = None
+
+
+def get_embedding_cache() -> EmbeddingCache | None:
+    """Process-wide cache, or None when EMBEDDING_CACHE is disabled."""
+    global _embedding_cache
+    if not EMBEDDING_CACHE.enabled:
+        return None
+    if _embedding_cache is None:
+        _embedding_cache = EmbeddingCache(EMBEDDING_CACHE.path, max_entries=EMBEDDING_CACHE.max_entries)
+    return _embedding_cache
+
+
+def describe_embedding_cache() -> str:
+    cache = get_embedding_cache()
+    return str(cache.stats) if cache is not None else "embedding cache: disabled"
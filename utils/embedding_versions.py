@@ -0,0 +1,357 @@
+"""
+Registry of embedding versions.
+
+Every version names the model that produced its vectors and the column that
+holds them on both `artwork` and `essay`:
+
+    CREATE TABLE embedding_version (
+        version       TEXT PRIMARY KEY,      -- e.g. 'v1', 'v2'
+        model_name    TEXT NOT NULL,
+        dimensions    INT NOT NULL,
+        column_name   TEXT NOT NULL UNIQUE,  -- 'embedding', 'embedding_v2', ...
+        status        TEXT NOT NULL,         -- 'building' | 'active' | 'retired'
+        created_at    TIMESTAMPTZ NOT NULL DEFAULT now(),
+        activated_at  TIMESTAMPTZ
+    );
+
+Exactly one version is active. Search resolves the active version once per
+request and uses its model for the query vector and its column for the
+vector scan, so a request never mixes two versions. Ingestion writes every
+version that is `building` or `active`, so a backfill never falls behind.
+A version is only activated once every table has an HNSW index on its
+column (built by the backfill, or `ensure_embedding_version_index`).
+
+Without the registry table (older databases) everything resolves to the
+legacy version: EMBEDDING_MODEL_NAME stored in `embedding`.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+import re
+import threading
+import time
+from typing import Any
+
+import psycopg
+
+from db.db_pool import get_connection
+from utils.config import EMBEDDING_MODEL_NAME, EMBEDDING_VERSIONS
+
+# Table -> text column its vectors are computed from.
+EMBEDDED_TEXT_COLUMNS = {"artwork": "searchable_text", "essay": "chunk_text"}
+EMBEDDED_TABLES = tuple(EMBEDDED_TEXT_COLUMNS)
+LEGACY_COLUMN = "embedding"
+VERSION_STATUSES = ("building", "active", "retired")
+
+_VERSION_PATTERN = re.compile(r"^[a-z0-9_]{1,40}$")
+
+
+@dataclass(frozen=True)
+class EmbeddingVersion:
+    version: str
+    model_name: str
+    dimensions: int
+    column: str
+    status: str = "active"
+
+
+LEGACY_VERSION = EmbeddingVersion(
+    version=EMBEDDING_VERSIONS.legacy_version,
+    model_name=EMBEDDING_MODEL_NAME,
+    dimensions=EMBEDDING_VERSIONS.legacy_dimensions,
+    column=LEGACY_COLUMN,
+)
+
+
+def column_for_version(version: str) -> str:
+    if not _VERSION_PATTERN.match(version):
+        raise ValueError(f"Invalid embedding version '{version}'; use lowercase letters, digits and '_'")
+    return f"{LEGACY_COLUMN}_{version}"
+
+
+class _VersionCache:
+    """Per-process snapshot of the registry, refreshed every `max_age_seconds`."""
+
+    def __init__(self, max_age_seconds: float) -> None:
+        self.max_age_seconds = max_age_seconds
+        self._versions: tuple[EmbeddingVersion, ...] | None = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, db_pool: Any | None, refresh: bool) -> tuple[EmbeddingVersion, ...]:
+        with self._lock:
+            fresh = time.monotonic() - self._loaded_at < self.max_age_seconds
+            if self._versions is not None and fresh and not refresh:
+                return self._versions
+        versions = _load_versions(db_pool)
+        with self._lock:
+            self._versions = versions
+            self._loaded_at = time.monotonic()
+        return versions
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._versions = None
+
+
+_cache = _VersionCache(EMBEDDING_VERSIONS.cache_seconds)
+
+
+def list_embedding_versions(*, db_pool: Any | None = None, refresh: bool = False) -> tuple[EmbeddingVersion, ...]:
+    return _cache.get(db_pool, refresh)
+
+
+def get_active_embedding_version(*, db_pool: Any | None = None, refresh: bool = False) -> EmbeddingVersion:
+    for version in list_embedding_versions(db_pool=db_pool, refresh=refresh):
+        if version.status == "active":
+            return version
+    return LEGACY_VERSION
+
+
+def find_embedding_version(version: str, *, db_pool: Any | None = None) -> EmbeddingVersion:
+    for candidate in list_embedding_versions(db_pool=db_pool, refresh=True):
+        if candidate.version == version:
+            return candidate
+    raise ValueError(f"Unknown embedding version '{version}'")
+
+
+def get_writable_embedding_versions(*, db_pool: Any | None = None, refresh: bool = False) -> tuple[EmbeddingVersion, ...]:
+    """The active version first, then any version still being backfilled."""
+    versions = list_embedding_versions(db_pool=db_pool, refresh=refresh)
+    building = tuple(version for version in versions if version.status == "building")
+    return (get_active_embedding_version(db_pool=db_pool),) + building
+
+
+def ensure_embedding_registry(*, db_pool: Any | None = None) -> None:
+    """Create the registry and record the legacy column as the active version if none is."""
+    connection_factory = db_pool.connection if db_pool else get_connection
+
+    with connection_factory() as conn:
+        try:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS embedding_version (
+                        version       TEXT PRIMARY KEY,
+                        model_name    TEXT NOT NULL,
+                        dimensions    INT NOT NULL,
+                        column_name   TEXT NOT NULL UNIQUE,
+                        status        TEXT NOT NULL,
+                        created_at    TIMESTAMPTZ NOT NULL DEFAULT now(),
+                        activated_at  TIMESTAMPTZ
+                    )
+                    """
+                )
+                cur.execute(
+                    """
+                    INSERT INTO embedding_version (version, model_name, dimensions, column_name, status, activated_at)
+                    SELECT %s, %s, %s, %s, 'active', now()
+                    WHERE NOT EXISTS (SELECT 1 FROM embedding_version WHERE status = 'active')
+                    ON CONFLICT (version) DO NOTHING
+                    """,
+                    (LEGACY_VERSION.version, LEGACY_VERSION.model_name, LEGACY_VERSION.dimensions, LEGACY_VERSION.column),
+                )
+            conn.commit()
+        except psycopg.Error:
+            conn.rollback()
+            raise
+
+    _cache.invalidate()
+
+
+def register_embedding_version(
+    version: str,
+    model_name: str,
+    dimensions: int,
+    *,
+    db_pool: Any | None = None,
+) -> EmbeddingVersion:
+    """Add a `building` version and its (nullable) shadow column on every embedded table."""
+    ensure_embedding_registry(db_pool=db_pool)
+    column = column_for_version(version)
+    connection_factory = db_pool.connection if db_pool else get_connection
+
+    with connection_factory() as conn:
+        try:
+            with conn.cursor() as cur:
+                for table in EMBEDDED_TABLES:
+                    cur.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column} vector({int(dimensions)})")
+                cur.execute(
+                    """
+                    INSERT INTO embedding_version (version, model_name, dimensions, column_name, status)
+                    VALUES (%s, %s, %s, %s, 'building')
+                    """,
+                    (version, model_name, dimensions, column),
+                )
+            conn.commit()
+        except psycopg.Error:
+            conn.rollback()
+            raise
+
+    _cache.invalidate()
+    return EmbeddingVersion(version=version, model_name=model_name, dimensions=dimensions,
+                            column=column, status="building")
+
+
+def embedding_index_name(table: str, column: str) -> str:
+    return f"{table}_{column}_hnsw_idx"
+
+
+def ensure_embedding_version_index(version: EmbeddingVersion, *, db_pool: Any | None = None) -> None:
+    """
+    HNSW cosine index on the version's column of every embedded table, for
+    the vector scan search runs once the version is active. Built after the
+    backfill, CONCURRENTLY so ingestion writes and live search are not
+    blocked while it runs.
+    """
+    connection_factory = db_pool.connection if db_pool else get_connection
+
+    with connection_factory() as conn:
+        autocommit = conn.autocommit
+        conn.autocommit = True  # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+        try:
+            with conn.cursor() as cur:
+                for table in _tables_missing_index(cur, version.column):
+                    index_name = embedding_index_name(table, version.column)
+                    # A concurrent build that failed leaves an invalid index behind; IF NOT EXISTS would keep it.
+                    cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {index_name}")
+                    cur.execute(
+                        f"CREATE INDEX CONCURRENTLY {index_name} "
+                        f"ON {table} USING hnsw ({version.column} vector_cosine_ops)"
+                    )
+        finally:
+            conn.autocommit = autocommit
+
+
+def missing_embedding_indexes(version: EmbeddingVersion, *, db_pool: Any | None = None) -> tuple[str, ...]:
+    """Embedded tables with no valid ANN (hnsw or ivfflat) index on the version's column."""
+    connection_factory = db_pool.connection if db_pool else get_connection
+    with connection_factory() as conn, conn.cursor() as cur:
+        return _tables_missing_index(cur, version.column)
+
+
+def _tables_missing_index(cur, column: str) -> tuple[str, ...]:
+    missing = []
+    for table in EMBEDDED_TABLES:
+        cur.execute(
+            """
+            SELECT EXISTS (
+                SELECT 1
+                FROM pg_index i
+                JOIN pg_class c ON c.oid = i.indexrelid
+                JOIN pg_am am ON am.oid = c.relam
+                WHERE i.indrelid = %s::regclass
+                  AND i.indisvalid
+                  AND am.amname IN ('hnsw', 'ivfflat')
+                  AND pg_get_indexdef(i.indexrelid) LIKE %s
+            )
+            """,
+            (table, f"%({column} %"),
+        )
+        if not cur.fetchone()[0]:
+            missing.append(table)
+    return tuple(missing)
+
+
+def count_missing_embeddings(version: EmbeddingVersion, *, db_pool: Any | None = None) -> dict[str, int]:
+    connection_factory = db_pool.connection if db_pool else get_connection
+    with connection_factory() as conn, conn.cursor() as cur:
+        missing = {}
+        for table in EMBEDDED_TABLES:
+            cur.execute(f"SELECT count(*) FROM {table} WHERE {_missing_clause(table, version.column)}")
+            missing[table] = int(cur.fetchone()[0])
+    return missing
+
+
+def activate_embedding_version(
+    version: str,
+    *,
+    allow_incomplete: bool = False,
+    db_pool: Any | None = None,
+) -> EmbeddingVersion:
+    """
+    Flip search to `version` in one transaction. The previous active version
+    is retired (its column becomes nullable and is no longer written). Fails
+    while rows are still missing vectors unless `allow_incomplete`, and
+    always while the version's column has no ANN index (search would fall
+    back to a sequential scan).
+    """
+    ensure_embedding_registry(db_pool=db_pool)
+    connection_factory = db_pool.connection if db_pool else get_connection
+
+    with connection_factory() as conn:
+        try:
+            with conn.cursor() as cur:
+                cur.execute("LOCK TABLE embedding_version IN EXCLUSIVE MODE")
+                cur.execute(
+                    "SELECT version, model_name, dimensions, column_name, status FROM embedding_version WHERE version = %s",
+                    (version,),
+                )
+                row = cur.fetchone()
+                if row is None:
+                    raise ValueError(f"Unknown embedding version '{version}'")
+                target = EmbeddingVersion(*row)
+
+                if not allow_incomplete:
+                    for table in EMBEDDED_TABLES:
+                        cur.execute(f"SELECT count(*) FROM {table} WHERE {_missing_clause(table, target.column)}")
+                        missing = cur.fetchone()[0]
+                        if missing:
+                            raise ValueError(
+                                f"{missing} {table} rows have no '{version}' embedding yet; "
+                                "finish the backfill or pass allow_incomplete"
+                            )
+
+                unindexed = _tables_missing_index(cur, target.column)
+                if unindexed:
+                    raise ValueError(
+                        f"No ANN index on {target.column} for {', '.join(unindexed)}; "
+                        f"build it with `manage_embedding_versions.py index {version}` first"
+                    )
+
+                cur.execute(
+                    "SELECT column_name FROM embedding_version WHERE status = 'active' AND version <> %s",
+                    (version,),
+                )
+                for (previous_column,) in cur.fetchall():
+                    for table in EMBEDDED_TABLES:
+                        cur.execute(f"ALTER TABLE {table} ALTER COLUMN {previous_column} DROP NOT NULL")
+
+                cur.execute("UPDATE embedding_version SET status = 'retired' WHERE status = 'active' AND version <> %s", (version,))
+                cur.execute(
+                    "UPDATE embedding_version SET status = 'active', activated_at = now() WHERE version = %s",
+                    (version,),
+                )
+            conn.commit()
+        except (psycopg.Error, ValueError):
+            conn.rollback()
+            raise
+
+    _cache.invalidate()
+    return EmbeddingVersion(target.version, target.model_name, target.dimensions, target.column, "active")
+
+
+def _missing_clause(table: str, column: str) -> str:
+    return f"{column} IS NULL AND {EMBEDDED_TEXT_COLUMNS[table]} IS NOT NULL"
+
+
+def _load_versions(db_pool: Any | None) -> tuple[EmbeddingVersion, ...]:
+    connection_factory = db_pool.connection if db_pool else get_connection
+    with connection_factory() as conn:
+        try:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    SELECT version, model_name, dimensions, column_name, status
+                    FROM embedding_version
+                    ORDER BY created_at
+                    """
+                )
+                rows = cur.fetchall()
+            conn.commit()
+        except psycopg.errors.UndefinedTable:
+            conn.rollback()
+            return (LEGACY_VERSION,)
+
+    return tuple(EmbeddingVersion(*row) for row in rows) or (LEGACY_VERSION,)
@@ -2,27 +2,69 @@
 
 from __future__ import annotations
 
+import threading
+
 import torch
 from sentence_transformers import SentenceTransformer
 
-from utils.config import EMBEDDING_MODEL_NAME
+from utils.config import EMBEDDING_MODEL_NAME, IMAGE_EMBEDDINGS
+from utils.embedding_cache import embedding_key, get_embedding_cache, normalize_text
 
 _device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-_model: SentenceTransformer | None = None
+_models: dict[str, SentenceTransformer] = {}
+_models_lock = threading.Lock()
+
+
+def get_embedding_model(model_name: str | None = None) -> SentenceTransformer:
+    model_name = model_name or EMBEDDING_MODEL_NAME
+    with _models_lock:
+        if model_name not in _models:
+            _models[model_name] = SentenceTransformer(model_name).to(_device)
+        return _models[model_name]
+
+
+def encode_text(text: str, model_name: str | None = None) -> list[float]:
+    """Query-time encoding: never touches the persistent cache, which is for ingestion reruns and backfills."""
+    return encode_batch([text], batch_size=1, model_name=model_name, use_cache=False)[0]
+
+
+def encode_batch(texts: list[str], batch_size: int = 32, model_name: str | None = None,
+                 use_cache: bool = True) -> list[list[float]]:
+    """
+    Embed `texts` in order with `model_name` (default EMBEDDING_MODEL_NAME).
+    Cached vectors are looked up in one bulk query and only the distinct
+    misses go through the model, in a single encode call. Search passes
+    `use_cache=False` so user queries are neither read from nor written to
+    the cache file.
+    """
+    model_name = model_name or EMBEDDING_MODEL_NAME
+    cache = get_embedding_cache() if use_cache else None
+    if cache is None:
+        return get_embedding_model(model_name).encode(texts, batch_size=batch_size).tolist()
+
+    normalized = [normalize_text(text) for text in texts]
+    keys = [embedding_key(model_name, text) for text in normalized]
+    vectors = cache.get_many(keys)
 
+    misses = {key: text for key, text in zip(keys, normalized) if key not in vectors}
+    if misses:
+        encoded = get_embedding_model(model_name).encode(list(misses.values()), batch_size=batch_size).tolist()
+        computed = dict(zip(misses.keys(), encoded))
+        cache.put_many(model_name, computed)
+        vectors.update(computed)
 
-def get_embedding_model() -> SentenceTransformer:
-    global _model
-    if _model is None:
-        _model = SentenceTransformer(EMBEDDING_MODEL_NAME).to(_device)
-    return _model
+    return [vectors[key] for key in keys]
 
 
-def encode_text(text: str) -> list[float]:
-    model = get_embedding_model()
-    return model.encode(text).tolist()
+def encode_images(images: list, batch_size: int = 32, model_name: str | None = None) -> list[list[float]]:
+    """
+    Embed PIL images with an image-capable model (default IMAGE_EMBEDDING_MODEL,
+    a CLIP model whose text side embeds queries into the same space). Not
+    cached: the thumbnail cache already keeps the inputs.
+    """
+    model = get_embedding_model(model_name or IMAGE_EMBEDDINGS.model_name)
+    return model.encode(images, batch_size=batch_size).tolist()
 
 
-def encode_batch(texts: list[str]) -> list[list[float]]:
-    model = get_embedding_model()
-    return model.encode(texts).tolist()
+def embedding_dimensions(model_name: str | None = None) -> int:
+    return int(get_embedding_model(model_name).get_sentence_embedding_dimension())
@@ -0,0 +1,209 @@
+"""
+Content-addressed, compressed on-disk cache for outbound GET requests.
+
+Layout under the cache directory:
+
+    index/<k[:2]>/<k>.json   k = sha256(method, url, sorted params)
+                             -> status, headers, body digest, fetched_at
+    blobs/<d[:2]>/<d>.gz     d = sha256(body), gzip-compressed body
+
+Identical bodies are stored once. Modes:
+
+    off      every request goes to the network, nothing is stored
+    online   fresh entries (younger than max_age) are served from disk; stale
+             ones are revalidated with If-None-Match / If-Modified-Since
+    offline  replay only; a miss raises CacheMissError and never hits the network
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+import gzip
+import hashlib
+import json
+import os
+from pathlib import Path
+import threading
+import time
+from typing import Any, Callable
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from utils.config import HTTP_CACHE
+
+CACHE_MODES = {"off", "online", "offline"}
+CACHEABLE_STATUS_CODES = {200, 404}
+_STORED_HEADERS = ("Content-Type", "ETag", "Last-Modified", "Cache-Control")
+
+
+class CacheMissError(requests.ConnectionError):
+    """Raised in offline mode when a request has no cached response."""
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    revalidated: int = 0
+    misses: int = 0
+    stored: int = 0
+
+    def __str__(self) -> str:
+        return (
+            f"http cache: {self.hits} hits, {self.revalidated} revalidated, "
+            f"{self.misses} misses, {self.stored} stored"
+        )
+
+
+class HttpCache:
+    def __init__(self, cache_dir: str | Path, *, mode: str = "online", max_age_seconds: float = 86400) -> None:
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown http cache mode '{mode}'. Allowed: {sorted(CACHE_MODES)}")
+        self.root = Path(cache_dir)
+        self.mode = mode
+        self.max_age_seconds = max_age_seconds
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+
+    def get(
+        self,
+        url: str,
+        *,
+        params: dict[str, Any] | None = None,
+        session: requests.Session | None = None,
+        timeout: float | None = 30,
+        before_request: Callable[[], None] | None = None,
+    ) -> requests.Response:
+        """
+        GET through the cache. `before_request` runs only when the network is
+        actually used (e.g. a rate limiter), never for cache hits.
+        """
+        http = session or requests
+        if self.mode == "off":
+            if before_request is not None:
+                before_request()
+            return http.get(url, params=params, timeout=timeout)
+
+        key = self.cache_key(url, params)
+        entry = self._read_entry(key)
+
+        if self.mode == "offline":
+            if entry is None:
+                self._count("misses")
+                raise CacheMissError(f"No cached response for {url} {params or ''}")
+            self._count("hits")
+            return self._to_response(url, entry)
+
+        if entry is not None and time.time() - entry["fetched_at"] < self.max_age_seconds:
+            self._count("hits")
+            return self._to_response(url, entry)
+
+        headers = {}
+        if entry is not None:
+            if entry["headers"].get("ETag"):
+                headers["If-None-Match"] = entry["headers"]["ETag"]
+            if entry["headers"].get("Last-Modified"):
+                headers["If-Modified-Since"] = entry["headers"]["Last-Modified"]
+
+        if before_request is not None:
+            before_request()
+        response = http.get(url, params=params, headers=headers or None, timeout=timeout)
+
+        if response.status_code == 304 and entry is not None:
+            entry["fetched_at"] = time.time()
+            self._write_entry(key, entry)
+            self._count("revalidated")
+            return self._to_response(url, entry)
+
+        self._count("misses")
+        if response.status_code in CACHEABLE_STATUS_CODES:
+            self._store(key, response)
+        return response
+
+    def contains(self, url: str, params: dict[str, Any] | None = None) -> bool:
+        """True when a response for this request is stored (fresh or not)."""
+        return self.mode != "off" and self._read_entry(self.cache_key(url, params)) is not None
+
+    @staticmethod
+    def cache_key(url: str, params: dict[str, Any] | None = None, method: str = "GET") -> str:
+        canonical = json.dumps(
+            [method, url, sorted((str(k), str(v)) for k, v in (params or {}).items())],
+            separators=(",", ":"),
+        )
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def _store(self, key: str, response: requests.Response) -> None:
+        body = response.content
+        digest = hashlib.sha256(body).hexdigest()
+        blob_path = self._blob_path(digest)
+        if not blob_path.exists():
+            self._atomic_write(blob_path, gzip.compress(body))
+
+        entry = {
+            "url": response.url,
+            "status": response.status_code,
+            "headers": {name: response.headers[name] for name in _STORED_HEADERS if name in response.headers},
+            "body_sha256": digest,
+            "fetched_at": time.time(),
+        }
+        self._write_entry(key, entry)
+        self._count("stored")
+
+    def _read_entry(self, key: str) -> dict[str, Any] | None:
+        index_path = self._index_path(key)
+        try:
+            with open(index_path, encoding="utf-8") as fh:
+                entry = json.load(fh)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if not self._blob_path(entry["body_sha256"]).exists():
+            return None
+        return entry
+
+    def _write_entry(self, key: str, entry: dict[str, Any]) -> None:
+        self._atomic_write(self._index_path(key), json.dumps(entry).encode("utf-8"))
+
+    def _to_response(self, url: str, entry: dict[str, Any]) -> requests.Response:
+        with open(self._blob_path(entry["body_sha256"]), "rb") as fh:
+            body = gzip.decompress(fh.read())
+
+        response = requests.Response()
+        response.status_code = entry["status"]
+        response.headers = CaseInsensitiveDict(entry["headers"])
+        response._content = body
+        response.url = entry.get("url") or url
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers) or "utf-8"
+        response.from_cache = True  # type: ignore[attr-defined]
+        return response
+
+    def _index_path(self, key: str) -> Path:
+        return self.root / "index" / key[:2] / f"{key}.json"
+
+    def _blob_path(self, digest: str) -> Path:
+        return self.root / "blobs" / digest[:2] / f"{digest}.gz"
+
+    @staticmethod
+    def _atomic_write(path: Path, data: bytes) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp, "wb") as fh:
+            fh.write(data)
+        os.replace(tmp, path)
+
+    def _count(self, field_name: str) -> None:
+        with self._lock:
+            setattr(self.stats, field_name, getattr(self.stats, field_name) + 1)
+
+
+_http_cache: HttpCache | None = None
+
+
+def get_http_cache() -> HttpCache:
+    global _http_cache
+    if _http_cache is None:
+        _http_cache = HttpCache(
+            HTTP_CACHE.cache_dir,
+            mode=HTTP_CACHE.mode,
+            max_age_seconds=HTTP_CACHE.max_age_seconds,
+        )
+    return _http_cache
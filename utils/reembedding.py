@@ -0,0 +1,139 @@
+"""
+Throttled backfill that fills one embedding version's column.
+
+Rows are read in id order (keyset pagination on rows still missing the
+version's vector), embedded in one `encode_batch` call per batch and written
+in a short transaction, so live search only ever competes with one small
+UPDATE. A rows-per-second cap paces the loop. The job is restartable: a rerun
+picks up whatever is still NULL. It ends by building the column's ANN index,
+which activation requires.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+import time
+from typing import Any, Callable, List, Sequence
+
+import psycopg
+
+from db.db_pool import get_connection
+from utils.config import EMBEDDING_VERSIONS
+from utils.embedding_versions import (
+    EMBEDDED_TABLES,
+    EMBEDDED_TEXT_COLUMNS,
+    EmbeddingVersion,
+    count_missing_embeddings,
+    ensure_embedding_version_index,
+)
+from utils.embeddings import encode_batch
+
+
+@dataclass
+class ReembedProgress:
+    version: str
+    total: int
+    done: int = 0
+    per_table: dict[str, int] = field(default_factory=dict)
+    started: float = field(default_factory=time.perf_counter)
+
+    @property
+    def rows_per_second(self) -> float:
+        elapsed = time.perf_counter() - self.started
+        return self.done / elapsed if elapsed > 0 else 0.0
+
+    def report(self) -> str:
+        rate = self.rows_per_second
+        remaining = max(0, self.total - self.done)
+        eta = f"{remaining / rate / 60:.1f} min" if rate > 0 else "n/a"
+        tables = ", ".join(f"{table} {count}" for table, count in self.per_table.items())
+        return (
+            f"[re-embed {self.version}] {self.done}/{self.total} rows ({tables}), "
+            f"{rate:.1f} rows/s, ETA {eta}"
+        )
+
+
+def reembed_corpus(
+    version: EmbeddingVersion,
+    *,
+    batch_size: int = EMBEDDING_VERSIONS.reembed_batch_size,
+    rows_per_second: float = EMBEDDING_VERSIONS.reembed_rows_per_second,
+    report_interval_seconds: float = EMBEDDING_VERSIONS.reembed_report_interval_seconds,
+    tables: Sequence[str] = EMBEDDED_TABLES,
+    encoder: Callable[..., List[List[float]]] = encode_batch,
+    db_pool: Any | None = None,
+) -> ReembedProgress:
+    """Embed every row of `tables` that has no vector for `version` yet."""
+    if batch_size <= 0 or rows_per_second <= 0:
+        raise ValueError("batch_size and rows_per_second must be positive")
+
+    missing = count_missing_embeddings(version, db_pool=db_pool)
+    progress = ReembedProgress(version=version.version, total=sum(missing[table] for table in tables))
+    print(progress.report())
+    next_report = time.monotonic() + report_interval_seconds
+
+    for table in tables:
+        progress.per_table[table] = 0
+        last_id = 0
+        while True:
+            batch_started = time.monotonic()
+            rows = _fetch_missing_rows(table, version, after_id=last_id, limit=batch_size, db_pool=db_pool)
+            if not rows:
+                break
+
+            vectors = encoder([text for _, text in rows], batch_size=batch_size, model_name=version.model_name)
+            _write_vectors(table, version, [(vector, row_id) for (row_id, _), vector in zip(rows, vectors)],
+                           db_pool=db_pool)
+
+            last_id = rows[-1][0]
+            progress.done += len(rows)
+            progress.per_table[table] += len(rows)
+
+            if time.monotonic() >= next_report:
+                print(progress.report())
+                next_report += report_interval_seconds
+
+            # Throughput cap: never faster than rows_per_second, whatever the model manages.
+            pause = len(rows) / rows_per_second - (time.monotonic() - batch_started)
+            if pause > 0:
+                time.sleep(pause)
+
+    print(progress.report())
+    # Index once the column is filled rather than maintaining it through every UPDATE.
+    ensure_embedding_version_index(version, db_pool=db_pool)
+    return progress
+
+
+def _fetch_missing_rows(
+    table: str, version: EmbeddingVersion, *, after_id: int, limit: int, db_pool: Any | None
+) -> list[tuple[int, str]]:
+    text_column = EMBEDDED_TEXT_COLUMNS[table]
+    sql = f"""
+        SELECT id, {text_column}
+        FROM {table}
+        WHERE id > %s
+          AND {version.column} IS NULL
+          AND {text_column} IS NOT NULL
+        ORDER BY id
+        LIMIT %s
+    """
+    connection_factory = db_pool.connection if db_pool else get_connection
+    with connection_factory() as conn, conn.cursor() as cur:
+        cur.execute(sql, (after_id, limit))
+        return [(int(row_id), text) for row_id, text in cur.fetchall()]
+
+
+def _write_vectors(
+    table: str, version: EmbeddingVersion, payload: list[tuple[list[float], int]], *, db_pool: Any | None
+) -> None:
+    sql = f"UPDATE {table} SET {version.column} = %s::vector WHERE id = %s AND {version.column} IS NULL"
+    connection_factory = db_pool.connection if db_pool else get_connection
+
+    with connection_factory() as conn:
+        try:
+            with conn.cursor() as cur:
+                cur.executemany(sql, payload)
+            conn.commit()
+        except psycopg.Error:
+            conn.rollback()
+            raise
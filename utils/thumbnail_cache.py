@@ -0,0 +1,335 @@
+"""
+Content-addressed, size-bounded on-disk store for artwork thumbnails.
+
+Layout under the cache directory:
+
+    urls/<k[:2]>/<k>     k = sha256(image url) -> digest of the image bytes
+    blobs/<d[:2]>/<d>    d = sha256(bytes), the image exactly as fetched
+
+Images are stored as fetched (they are already compressed) and identical
+images behind different URLs are stored once. Only http(s) URLs on
+THUMBNAIL_ALLOWED_HOSTS are fetched, redirects included (each hop is checked
+before it is requested), and bodies over THUMBNAIL_MAX_IMAGE_BYTES are
+abandoned mid-download. A cache built with
+`allow_local_paths=True` (embed_artwork_images.py --allow-local-paths) also
+reads `image_url` values that are local paths or file:// URLs from disk, so
+a thumbnail folder can seed the cache without network access; the cache
+behind /api/thumb never does.
+
+Blobs are evicted least recently used first: every hit touches the blob's
+mtime, and once the store outgrows `max_bytes` the oldest blobs are removed
+until it is back under 90%. A URL whose blob was evicted is simply a miss.
+"""
+
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+import hashlib
+import os
+from pathlib import Path
+import threading
+from typing import Callable, Iterable
+from urllib.parse import unquote, urljoin, urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils.config import THUMBNAILS
+
+_MAGIC_MIMETYPES = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+)
+MAX_REDIRECTS = 5
+_CHUNK_BYTES = 64 * 1024
+
+
+class DisallowedImageSource(LookupError):
+    """The image URL is neither an http(s) URL on an allowed host nor, where permitted, a local file."""
+
+
+@dataclass
+class ThumbnailCacheStats:
+    hits: int = 0
+    fetched: int = 0
+    bytes_fetched: int = 0
+    evicted: int = 0
+
+    def __str__(self) -> str:
+        return (
+            f"thumbnail cache: {self.hits} hits, {self.fetched} fetched "
+            f"({self.bytes_fetched / 1e6:.1f} MB), {self.evicted} evicted"
+        )
+
+
+class ThumbnailCache:
+    def __init__(
+        self,
+        cache_dir: str | Path = THUMBNAILS.cache_dir,
+        *,
+        max_bytes: int | None = THUMBNAILS.max_bytes,
+        timeout: float = 30,
+        max_connections: int = 8,
+        before_request: Callable[[], None] | None = None,
+        allowed_hosts: tuple[str, ...] = THUMBNAILS.allowed_hosts,
+        allow_local_paths: bool = False,
+        max_image_bytes: int = THUMBNAILS.max_image_bytes,
+    ) -> None:
+        """
+        `before_request` runs before every network fetch (e.g. a rate limiter),
+        never for hits. `allowed_hosts` match a URL's host or any subdomain of
+        it; an empty tuple allows every host.
+        """
+        self.root = Path(cache_dir)
+        self.allowed_hosts = tuple(host.lower() for host in allowed_hosts)
+        self.allow_local_paths = allow_local_paths
+        self.max_image_bytes = max_image_bytes
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.before_request = before_request
+        self.stats = ThumbnailCacheStats()
+        self._lock = threading.Lock()
+        self._evict_lock = threading.Lock()
+        self._stored_bytes: int | None = None  # measured lazily, then kept up to date
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_connections, pool_maxsize=max_connections)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def cached_path(self, url: str) -> Path | None:
+        try:
+            digest = self._url_path(url).read_text(encoding="ascii").strip()
+        except FileNotFoundError:
+            return None
+        blob = self._blob_path(digest)
+        try:
+            os.utime(blob)  # LRU clock
+        except FileNotFoundError:
+            return None
+        return blob
+
+    def fetch(self, url: str) -> Path:
+        """Path of the cached image for `url`, fetching it on a miss. Raises DisallowedImageSource first."""
+        # Checked before the lookup too: a file seeded by an offline run must not be served for a local path.
+        self._check_source(url)
+        cached = self.cached_path(url)
+        if cached is not None:
+            self._count(hits=1)
+            return cached
+
+        body = self._read_source(url)
+        digest = hashlib.sha256(body).hexdigest()
+        blob = self._blob_path(digest)
+        if not blob.exists():
+            self._atomic_write(blob, body)
+            self._grow(len(body))
+        self._atomic_write(self._url_path(url), digest.encode("ascii"))
+        self._count(fetched=1, bytes_fetched=len(body))
+        return blob
+
+    def evict(self) -> int:
+        """Drop least recently used blobs until the store is under 90% of `max_bytes`."""
+        if self.max_bytes is None:
+            return 0
+        with self._evict_lock:
+            blobs = []
+            for path in self._iter_blobs():
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                blobs.append((stat.st_mtime, stat.st_size, path))
+            total = sum(size for _, size, _ in blobs)
+            target = int(self.max_bytes * 0.9)
+            removed = 0
+            for _, size, path in sorted(blobs):
+                if total <= target:
+                    break
+                path.unlink(missing_ok=True)
+                total -= size
+                removed += 1
+            with self._lock:
+                self._stored_bytes = total
+                self.stats.evicted += removed
+        return removed
+
+    def close(self) -> None:
+        self.session.close()
+
+    def _grow(self, size: int) -> None:
+        if self.max_bytes is None:
+            return
+        with self._lock:
+            if self._stored_bytes is None:
+                self._stored_bytes = sum(path.stat().st_size for path in self._iter_blobs())
+            else:
+                self._stored_bytes += size
+            over = self._stored_bytes > self.max_bytes
+        if over:
+            self.evict()
+
+    def _check_source(self, url: str) -> Path | None:
+        """The local file to read for `url`, or None for an allowed http(s) URL."""
+        local = _local_path(url)
+        if local is not None:
+            if not self.allow_local_paths:
+                raise DisallowedImageSource("Image URL is not an http(s) URL")
+            return local
+        if not self._host_allowed(url):
+            raise DisallowedImageSource("Image URL is not on an allowed host")
+        return None
+
+    def _host_allowed(self, url: str) -> bool:
+        host = (urlparse(url).hostname or "").lower()
+        if not host:
+            return False
+        return not self.allowed_hosts or any(
+            host == allowed or host.endswith(f".{allowed}") for allowed in self.allowed_hosts
+        )
+
+    def _read_source(self, url: str) -> bytes:
+        local = self._check_source(url)
+        if local is not None:
+            return local.read_bytes()
+
+        if self.before_request is not None:
+            self.before_request()
+        response = self._get_following_allowed_redirects(url)
+        with response:
+            response.raise_for_status()
+            content_type = response.headers.get("Content-Type", "image/")
+            if not content_type.startswith("image/"):
+                raise ValueError(f"{url} returned {content_type}, not an image")
+            if int(response.headers.get("Content-Length") or 0) > self.max_image_bytes:
+                raise ValueError(f"{url} is larger than {self.max_image_bytes} bytes")
+            body = bytearray()
+            for chunk in response.iter_content(_CHUNK_BYTES):
+                body += chunk
+                if len(body) > self.max_image_bytes:
+                    raise ValueError(f"{url} is larger than {self.max_image_bytes} bytes")
+        return bytes(body)
+
+    def _get_following_allowed_redirects(self, url: str) -> requests.Response:
+        """Redirects are followed by hand, so a hop to a disallowed host is refused before it is requested."""
+        for _ in range(MAX_REDIRECTS + 1):
+            response = self.session.get(url, timeout=self.timeout, allow_redirects=False, stream=True)
+            if not response.is_redirect:
+                return response
+            location = urljoin(url, response.headers["Location"])
+            response.close()
+            if _local_path(location) is not None or not self._host_allowed(location):
+                raise DisallowedImageSource("Image URL redirected to a host that is not allowed")
+            url = location
+        raise ValueError(f"{url} redirected more than {MAX_REDIRECTS} times")
+
+    def _iter_blobs(self) -> Iterable[Path]:
+        blobs = self.root / "blobs"
+        if not blobs.exists():
+            return ()
+        return (path for path in blobs.glob("*/*") if not path.name.endswith(".tmp"))
+
+    def _url_path(self, url: str) -> Path:
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return self.root / "urls" / key[:2] / key
+
+    def _blob_path(self, digest: str) -> Path:
+        return self.root / "blobs" / digest[:2] / digest
+
+    @staticmethod
+    def _atomic_write(path: Path, data: bytes) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp, "wb") as fh:
+            fh.write(data)
+        os.replace(tmp, path)
+
+    def _count(self, **increments: int) -> None:
+        with self._lock:
+            for name, amount in increments.items():
+                setattr(self.stats, name, getattr(self.stats, name) + amount)
+
+
+class ThumbnailPrefetcher:
+    """
+    Warms the cache in the background while artworks are ingested. Never
+    blocks the caller: once `max_pending` downloads are queued, further URLs
+    are skipped and fetched on first view instead.
+    """
+
+    def __init__(
+        self,
+        cache: ThumbnailCache,
+        *,
+        workers: int = THUMBNAILS.prefetch_workers,
+        max_pending: int = THUMBNAILS.prefetch_max_pending,
+    ) -> None:
+        self.cache = cache
+        self.max_pending = max_pending
+        self.skipped = 0
+        self.failed = 0
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="thumb-prefetch")
+
+    def submit(self, urls: Iterable[str | None]) -> None:
+        for url in urls:
+            if not url:
+                continue
+            with self._lock:
+                if self._pending >= self.max_pending:
+                    self.skipped += 1
+                    continue
+                self._pending += 1
+            self._executor.submit(self._prefetch, url)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+
+    def report(self) -> str:
+        return f"thumbnail prefetch: {self.failed} failed, {self.skipped} skipped (queue full); {self.cache.stats}"
+
+    def _prefetch(self, url: str) -> None:
+        try:
+            self.cache.fetch(url)
+        except (requests.RequestException, OSError, ValueError, DisallowedImageSource):
+            with self._lock:
+                self.failed += 1
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+
+def image_mimetype(path: str | Path) -> str:
+    with open(path, "rb") as fh:
+        head = fh.read(12)
+    for magic, mimetype in _MAGIC_MIMETYPES:
+        if head.startswith(magic):
+            return mimetype
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return "application/octet-stream"
+
+
+_thumbnail_cache: ThumbnailCache | None = None
+_thumbnail_cache_lock = threading.Lock()
+
+
+def get_thumbnail_cache() -> ThumbnailCache:
+    """Process-wide cache for serving thumbnails; misses are fetched on demand."""
+    global _thumbnail_cache
+    with _thumbnail_cache_lock:
+        if _thumbnail_cache is None:
+            _thumbnail_cache = ThumbnailCache()
+        return _thumbnail_cache
+
+
+def _local_path(url: str) -> Path | None:
+    parsed = urlparse(url)
+    if parsed.scheme == "file":
+        return Path(unquote(parsed.path))
+    if parsed.scheme in {"http", "https"}:
+        return None
+    return Path(url)